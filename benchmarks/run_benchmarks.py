@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Benchmarks of the Hurl kernel's start-up time and per-cell overhead.
+
+Every request goes to a local stand-in server (see server.py), so the suite
+runs offline and measures the kernel rather than the network. It needs hurl
+in PATH and the kernel installed in the current environment:
+
+    uv pip install -e .
+    python benchmarks/run_benchmarks.py --output benchmark-results.json
+    python benchmarks/run_benchmarks.py --compare benchmark-results.json
+
+Results are written as JSON, one record per benchmark with its unit and the
+summary statistics of its samples, together with the versions they were
+measured with.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from jupyter_client.kernelspec import KernelSpecManager
+from jupyter_client.manager import KernelManager
+from jupyter_client.session import Session
+
+from jupyter_hurl_kernel import __version__
+from jupyter_hurl_kernel.kernel import HurlKernel
+
+sys.path.insert(0, str(Path(__file__).parent))
+from server import StandInServer, parse_size  # noqa: E402
+
+# Benchmarks where a higher value is better; lower is better for the others
+_HIGHER_IS_BETTER = {"requests/s"}
+
+
+class _NullSocket:
+    """Stands in for the iopub socket, counting what the kernel sends."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def send_multipart(self, parts, copy=True):
+        self.messages += 1
+        self.bytes += sum(len(part) for part in parts)
+
+
+def make_kernel(**config):
+    """Build an in-process kernel whose messages are serialized, then dropped."""
+    kernel = HurlKernel(**config)
+    kernel.session = Session()
+    kernel.iopub_socket = _NullSocket()
+    return kernel
+
+
+def execute(kernel, code):
+    """Run a cell on an in-process kernel, raising if it fails."""
+    reply = asyncio.run(kernel.do_execute(code, False))
+    if reply["status"] != "ok":
+        raise RuntimeError(f"cell failed: {reply.get('evalue')}\n{code}")
+    return reply
+
+
+def timed(function, *args):
+    """Return the duration of function(*args) in seconds."""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+class Results:
+    """Collects benchmark samples and writes them to a file."""
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, name, unit, samples, description):
+        record = {
+            "name": name,
+            "unit": unit,
+            "description": description,
+            "n": len(samples),
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "mean": statistics.fmean(samples),
+            "max": max(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "samples": samples,
+        }
+        self.records.append(record)
+        print(f"  {name:<28} {record['median']:>10.2f} {unit:<10} (n={len(samples)})")
+
+    def write(self, path, hurl_version, options):
+        document = {
+            "kernel_version": __version__,
+            "hurl_version": hurl_version,
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "options": options,
+            "benchmarks": self.records,
+        }
+        Path(path).write_text(json.dumps(document, indent=2) + "\n")
+
+
+def bench_startup(results, repeat):
+    """Time the construction of the kernel and the hurl probe."""
+    constructs, cold, warm = [], [], []
+    with tempfile.TemporaryDirectory() as cache_home:
+        previous = os.environ.get("XDG_CACHE_HOME")
+        os.environ["XDG_CACHE_HOME"] = cache_home
+        try:
+            for _ in range(repeat):
+                shutil.rmtree(Path(cache_home) / "jupyter-hurl-kernel", ignore_errors=True)
+                start = time.perf_counter()
+                kernel = make_kernel()
+                constructs.append((time.perf_counter() - start) * 1000)
+                kernel.hurl_info
+                cold.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                make_kernel().hurl_info
+                warm.append((time.perf_counter() - start) * 1000)
+        finally:
+            if previous is None:
+                del os.environ["XDG_CACHE_HOME"]
+            else:
+                os.environ["XDG_CACHE_HOME"] = previous
+    results.add("startup.construct", "ms", constructs, "HurlKernel() in process")
+    results.add("startup.probe_cold", "ms", cold, "start-up until hurl is probed, empty cache")
+    results.add("startup.probe_cached", "ms", warm, "start-up until hurl is probed, cached")
+
+
+def bench_cells(results, url, repeat):
+    """Compare a cell run by the kernel with the same file run by hurl."""
+    code = f"GET {url}\nHTTP 200\n"
+    direct = []
+    with tempfile.TemporaryDirectory() as directory:
+        hurl_file = Path(directory) / "cell.hurl"
+        hurl_file.write_text(code)
+        for _ in range(repeat):
+            direct.append(timed(lambda: subprocess.run(
+                ["hurl", "--color", str(hurl_file)], stdout=subprocess.DEVNULL
+            )) * 1000)
+    kernel = make_kernel()
+    execute(kernel, code)
+    in_process = [timed(execute, kernel, code) * 1000 for _ in range(repeat)]
+    overhead = [k - d for k, d in zip(sorted(in_process), sorted(direct))]
+    results.add("cell.hurl_direct", "ms", direct, "hurl run on the cell's file, no kernel")
+    results.add("cell.in_process", "ms", in_process, "do_execute of the same cell")
+    results.add(
+        "cell.overhead", "ms", overhead,
+        "do_execute minus hurl alone (temp files, spawn, iopub messages)",
+    )
+
+    captures = f"GET {url}\nHTTP 200\n[Captures]\ntoken: header \"Content-Type\"\n"
+    samples = [timed(execute, kernel, captures) * 1000 for _ in range(repeat)]
+    results.add("cell.with_captures", "ms", samples, "cell with captures (JSON report)")
+
+    kernel = make_kernel(engine="inprocess")
+    execute(kernel, code)
+    samples = [timed(execute, kernel, code) * 1000 for _ in range(repeat)]
+    results.add("cell.inprocess", "ms", samples, "do_execute with the in-process engine, pooled")
+    samples = [timed(execute, kernel, captures) * 1000 for _ in range(repeat)]
+    results.add("cell.inprocess_captures", "ms", samples, "cell with captures, in-process engine")
+
+
+def bench_batch(results, url, cells, repeat):
+    """Throughput of queued cells run with %%batch, against one cell at a time."""
+    code = f"GET {url}\nHTTP 200\n"
+    kernel = make_kernel()
+    sequential, batched = [], []
+    for _ in range(repeat):
+        duration = timed(lambda: [execute(kernel, code) for _ in range(cells)])
+        sequential.append(cells / duration)
+        for _ in range(cells):
+            execute(kernel, "%%batch\n" + code)
+        batched.append(cells / timed(execute, kernel, "%%batch run"))
+    results.add("batch.sequential", "requests/s", sequential, f"{cells} cells run one by one")
+    results.add("batch.parallel", "requests/s", batched, f"{cells} cells run with %%batch run")
+
+
+def _peak_rss_kib(pid):
+    """Peak resident set size of a process in KiB (Linux only), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def bench_client(results, url, large_urls, repeat):
+    """Start real kernels and drive them through a kernel client."""
+    with tempfile.TemporaryDirectory() as spec_root:
+        spec_dir = Path(spec_root) / "hurl-benchmark"
+        spec_dir.mkdir()
+        (spec_dir / "kernel.json").write_text(json.dumps({
+            "argv": [sys.executable, "-m", "jupyter_hurl_kernel.kernel", "-f", "{connection_file}"],
+            "display_name": "Hurl (benchmark)",
+            "language": "hurl",
+        }))
+        spec_manager = KernelSpecManager(kernel_dirs=[spec_root])
+
+        def start():
+            manager = KernelManager(kernel_name="hurl-benchmark", kernel_spec_manager=spec_manager)
+            manager.start_kernel(stderr=subprocess.DEVNULL)
+            client = manager.client()
+            client.start_channels()
+            client.wait_for_ready(timeout=60)
+            return manager, client
+
+        def stop(manager, client):
+            client.stop_channels()
+            manager.shutdown_kernel(now=True)
+
+        def run_cell(client, code):
+            reply = client.execute_interactive(code, timeout=120, output_hook=lambda msg: None)
+            if reply["content"]["status"] != "ok":
+                raise RuntimeError(f"cell failed: {reply['content'].get('evalue')}")
+
+        startup = []
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            manager, client = start()
+            startup.append(time.perf_counter() - begin)
+            stop(manager, client)
+        results.add("client.startup", "s", startup, "start a kernel until kernel_info is answered")
+
+        manager, client = start()
+        try:
+            code = f"GET {url}\nHTTP 200\n"
+            run_cell(client, code)
+            roundtrip = []
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                run_cell(client, code)
+                roundtrip.append((time.perf_counter() - begin) * 1000)
+            results.add("client.cell_roundtrip", "ms", roundtrip, "execute request until idle")
+        finally:
+            stop(manager, client)
+
+        for size, large_url in large_urls:
+            peaks = []
+            for _ in range(max(1, repeat // 5)):
+                manager, client = start()
+                try:
+                    run_cell(client, f"%%max-output=1m\nGET {large_url}\nHTTP 200\n")
+                    peak = _peak_rss_kib(getattr(manager.provisioner, "pid", None))
+                finally:
+                    stop(manager, client)
+                if peak is None:
+                    print("  (peak RSS is only measured on Linux)")
+                    return
+                peaks.append(peak / 1024)
+            results.add(
+                f"client.peak_rss_{size}", "MiB", peaks,
+                f"kernel peak RSS after a {size} body (output truncated to 1m)",
+            )
+
+
+def compare(current, previous_path, threshold):
+    """Print the change of every median against a previous results file.
+
+    Returns:
+        bool: True if a benchmark regressed by more than threshold
+    """
+    previous = {
+        record["name"]: record
+        for record in json.loads(Path(previous_path).read_text())["benchmarks"]
+    }
+    regressed = False
+    print(f"\nComparison with {previous_path}:")
+    for record in current:
+        old = previous.get(record["name"])
+        if old is None or not old["median"]:
+            continue
+        change = (record["median"] - old["median"]) / abs(old["median"])
+        worse = -change if record["unit"] in _HIGHER_IS_BETTER else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"  {record['name']:<28} {old['median']:>10.2f} -> {record['median']:>10.2f} "
+              f"{record['unit']:<10} {change:+.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmark-results.json",
+                        help="file receiving the results (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=10, help="samples per benchmark")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="latency in ms added by the stand-in server")
+    parser.add_argument("--body-size", default="1k", help="body size of the cell benchmarks")
+    parser.add_argument("--large-body", action="append",
+                        help="body sizes of the peak RSS benchmarks (default: 10m and 100m)")
+    parser.add_argument("--batch-cells", type=int, default=20, help="cells per batch")
+    parser.add_argument("--no-client", action="store_true",
+                        help="skip the benchmarks starting real kernels")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="previous results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative change reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    if shutil.which("hurl") is None:
+        sys.exit("hurl is not installed or not in PATH")
+    large_bodies = args.large_body or ["10m", "100m"]
+    for size in [args.body_size, *large_bodies]:
+        parse_size(size)
+
+    results = Results()
+    with StandInServer() as server:
+        query = f"?delay={args.latency:g}" if args.latency else ""
+        url = f"{server.url}/bytes/{args.body_size}{query}"
+        print(f"Stand-in server on {server.url}")
+        bench_startup(results, args.repeat)
+        bench_cells(results, url, args.repeat)
+        bench_batch(results, url, args.batch_cells, max(1, args.repeat // 2))
+        if not args.no_client:
+            large_urls = [(size, f"{server.url}/bytes/{size}") for size in large_bodies]
+            bench_client(results, url, large_urls, args.repeat)
+
+    hurl_version = make_kernel().hurl_version
+    results.write(args.output, hurl_version, vars(args))
+    print(f"\nResults written to {args.output}")
+    if args.compare and compare(results.records, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
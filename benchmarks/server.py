@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Local HTTP server standing in for real APIs in the benchmarks.
+
+Endpoints:
+    /bytes/<n>   n bytes of body (suffixes k, m, g accepted: /bytes/10m)
+    /json        a small JSON document, with a token to capture
+    any path     accepts ?delay=<ms> to answer after a latency
+
+Run it alone with: python benchmarks/server.py --port 8000
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_CHUNK = b"x" * 65536
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(text):
+    """Parse a size such as '512', '64k' or '10m' into bytes."""
+    text = text.strip().lower()
+    unit = text[-1] if text and text[-1] in _UNITS else ""
+    return int(float(text[: len(text) - len(unit)]) * _UNITS[unit])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately: without TCP_NODELAY, every
+    # response on a kept-alive connection waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        delay = float(query.get("delay", ["0"])[0])
+        if delay:
+            time.sleep(delay / 1000)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        if url.path.startswith("/bytes/"):
+            try:
+                size = parse_size(url.path[len("/bytes/"):])
+            except ValueError:
+                self.send_error(400, "invalid size")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            while size > 0:
+                chunk = _CHUNK[:size]
+                self.wfile.write(chunk)
+                size -= len(chunk)
+        elif url.path == "/json":
+            body = json.dumps({"token": "benchmark-token", "items": list(range(10))}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer:
+    """The stand-in server, run in a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        """Base URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    with StandInServer(args.host, args.port) as server:
+        print(f"Serving on {server.url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
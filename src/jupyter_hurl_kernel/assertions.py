@@ -0,0 +1,160 @@
+"""Compact pass/fail summaries of %%test cells, built from hurl's JSON report."""
+
+import html
+import re
+from dataclasses import dataclass, field
+
+from .report import call_status, call_total_us
+
+# stderr kept from a %%test run, to show the details of the failures
+TEST_OUTPUT_SIZE = 1024 * 1024
+
+# Location of an error in hurl's output: '  --> cell.hurl:12:5'
+_LOCATION = re.compile(r"^\s*-->\s*.*:(\d+):\d+\s*$")
+
+# Line hurl --test prints after each file: 'cell.hurl: Success (3 request(s) in 12 ms)'
+_FILE_RESULT = re.compile(r"^\S.*: (Success|Failure) \(")
+
+
+@dataclass
+class EntryResult:
+    """Outcome of one entry of a %%test cell."""
+
+    number: int
+    method: str
+    url: str
+    # True or False, None if the entry was not run
+    success: bool | None = None
+    status: object = None
+    duration_ms: float | None = None
+    errors: list = field(default_factory=list)
+
+
+def split_errors(stderr):
+    """Split hurl's error output into (line, text) pairs, one per error.
+
+    line is the line of the Hurl file the error points to, or None.
+    """
+    errors = []
+    current = None
+    for line in stderr.splitlines():
+        if line.startswith("error"):
+            current = [line]
+            errors.append(current)
+        elif _FILE_RESULT.match(line):
+            current = None
+        elif current is not None:
+            current.append(line)
+    pairs = []
+    for lines in errors:
+        location = next((_LOCATION.match(line) for line in lines if _LOCATION.match(line)), None)
+        pairs.append((int(location.group(1)) if location else None, "\n".join(lines).rstrip()))
+    return pairs
+
+
+def collect_results(report, stderr, entries):
+    """Match the entries of a cell with their outcome in a hurl report.
+
+    Args:
+        report: The report of the run, as returned by read_report
+        stderr: hurl's error output, pointing to the lines of the failures
+        entries: The cell's parsed entries, in order
+
+    Returns:
+        list: One EntryResult per entry; entries after a failure are not run
+    """
+    results = [
+        EntryResult(number, entry.method, entry.url)
+        for number, entry in enumerate(entries, 1)
+    ]
+    executed = [entry for result in report or [] for entry in result.get("entries", [])]
+    for data in executed:
+        index = data.get("index", 0) - 1
+        if not 0 <= index < len(results):
+            continue
+        result = results[index]
+        calls = data.get("calls", [])
+        if calls:
+            request = calls[-1].get("request", {})
+            result.method = request.get("method", result.method)
+            result.url = request.get("url", result.url)
+            result.status = call_status(calls[-1])
+        if "time" in data:
+            result.duration_ms = data["time"]
+        elif calls:
+            result.duration_ms = sum(call_total_us(call) or 0 for call in calls) / 1000
+        result.success = all(assert_.get("success", True) for assert_ in data.get("asserts", []))
+
+    # Errors point to a line of the file: attach each one to its entry
+    starts = sorted(
+        (data.get("line", 0), data.get("index", 0) - 1) for data in executed
+        if 0 < data.get("index", 0) <= len(results)
+    )
+    for line, text in split_errors(stderr):
+        owners = [index for start, index in starts if line is not None and start <= line]
+        if owners:
+            index = owners[-1]
+        elif starts:
+            index = starts[-1][1]
+        else:
+            index = 0
+        if results:
+            results[index].errors.append(text)
+            results[index].success = False
+    return results
+
+
+def _mark(result):
+    return {True: "PASS", False: "FAIL", None: "----"}[result.success]
+
+
+def format_results(results, elapsed):
+    """Render the results of a %%test cell as (text, html).
+
+    Every entry takes one line; the details of the failures follow the
+    text summary and are folded in the HTML table, to be opened on demand.
+    """
+    passed = sum(result.success is True for result in results)
+    failed = sum(result.success is False for result in results)
+    skipped = sum(result.success is None for result in results)
+    title = f"{passed} passed, {failed} failed"
+    if skipped:
+        title += f", {skipped} not run"
+    title += f" ({len(results)} {'entry' if len(results) == 1 else 'entries'} in {elapsed:.2f} s)"
+
+    def duration(result):
+        return "" if result.duration_ms is None else f"{result.duration_ms:g} ms"
+
+    lines = [title]
+    rows = []
+    for result in results:
+        status = "" if result.status is None else str(result.status)
+        lines.append(
+            f"{_mark(result)} #{result.number:<4} {result.method} {result.url}"
+            + (f"  {status}" if status else "")
+            + (f"  {duration(result)}" if duration(result) else "")
+        )
+        details = ""
+        if result.errors:
+            details = (
+                "<details><summary>details</summary><pre>"
+                + html.escape("\n\n".join(result.errors))
+                + "</pre></details>"
+            )
+        color = {True: "#2e7d32", False: "#c62828", None: "#757575"}[result.success]
+        rows.append(
+            f"<tr><td style='color:{color}'><b>{_mark(result)}</b></td>"
+            f"<td>#{result.number}</td>"
+            f"<td style='text-align:left'><code>{html.escape(result.method)} {html.escape(result.url)}</code></td>"
+            f"<td>{html.escape(status)}</td><td>{duration(result)}</td>"
+            f"<td style='text-align:left'>{details}</td></tr>"
+        )
+    failures = [result for result in results if result.errors]
+    if failures:
+        lines.append("")
+        for result in failures:
+            lines.append(f"#{result.number} {result.method} {result.url}:")
+            lines.extend("    " + line for error in result.errors for line in error.splitlines())
+    text = "\n".join(lines) + "\n"
+    markup = f"<b>{html.escape(title)}</b><table>{''.join(rows)}</table>"
+    return text, markup
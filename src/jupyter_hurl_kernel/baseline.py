@@ -0,0 +1,268 @@
+"""Latency baselines of cells, saved and checked with %%baseline."""
+
+import hashlib
+import html
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+from .benchmark import mann_whitney_u, median
+from .report import call_total_us, iter_calls
+
+# Defaults of the %%baseline arguments
+DEFAULT_ITERATIONS = 20
+DEFAULT_WARMUP = 3
+DEFAULT_TOLERANCE = 0.15
+DEFAULT_ALPHA = 0.05
+
+
+def default_baseline_dir():
+    """Return the per-user directory of the saved baselines."""
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "jupyter-hurl-kernel" / "baselines"
+
+
+def baseline_key(hurl_code, name=None):
+    """Return the key of a cell's baseline: its name, or a hash of its code."""
+    if name:
+        return "name-" + hashlib.sha256(name.encode("utf-8")).hexdigest()[:32]
+    return "code-" + hashlib.sha256(hurl_code.strip().encode("utf-8")).hexdigest()[:32]
+
+
+def parse_tolerance(value):
+    """Parse a tolerance given in percent, e.g. '15%' or '15'.
+
+    Raises:
+        ValueError: If the value is not a positive percentage
+    """
+    try:
+        tolerance = float(str(value).strip().rstrip("%")) / 100
+    except ValueError:
+        tolerance = -1
+    if tolerance <= 0:
+        raise ValueError(f"Invalid tolerance: {value!r} (expected a percentage such as 15%)")
+    return tolerance
+
+
+def percentile(values, percent):
+    """Percentile of values, interpolated between the closest ranks."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * percent / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class EntryTimingParser:
+    """Turn hurl's --json output lines into latency samples per entry."""
+
+    def __init__(self, warmup):
+        self.warmup = warmup
+        self.runs = 0
+        self.failures = 0
+        # {entry index: [milliseconds]} and {entry index: "METHOD url"}
+        self.samples = {}
+        self.labels = {}
+        self._partial = ""
+
+    def feed(self, name, text):
+        """Consume a chunk of stdout text."""
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        """Process any trailing partial line."""
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ""
+
+    def _line(self, line):
+        try:
+            result = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(result, dict):
+            return
+        self.runs += 1
+        if self.runs <= self.warmup:
+            return
+        if not result.get("success", False):
+            # A failed run would skew the samples of the entries it reached
+            self.failures += 1
+            return
+        totals = {}
+        for entry, call in iter_calls(result):
+            index = entry.get("index")
+            total = call_total_us(call)
+            if index is None or total is None:
+                continue
+            totals[index] = totals.get(index, 0) + total / 1000
+            request = call.get("request", {})
+            self.labels.setdefault(index, f"{request.get('method', '')} {request.get('url', '')}")
+        for index, total in totals.items():
+            self.samples.setdefault(index, []).append(total)
+
+
+class BaselineStore:
+    """Baselines saved as one JSON file per cell (or per name)."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def save(self, key, code, parser, name=None):
+        """Save the samples collected by an EntryTimingParser.
+
+        Returns:
+            dict: The saved baseline
+        """
+        baseline = {
+            "name": name,
+            "code": code,
+            "created": time.time(),
+            "entries": [
+                {"index": index, "label": parser.labels.get(index, ""), "samples": samples}
+                for index, samples in sorted(parser.samples.items())
+            ],
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(baseline))
+        os.replace(tmp, path)
+        return baseline
+
+    def load(self, key):
+        """Return a saved baseline, or None."""
+        try:
+            return json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, key):
+        """Delete a baseline; return whether it existed."""
+        try:
+            self._path(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def all(self):
+        """Return every saved baseline, newest first."""
+        baselines = []
+        for path in self.directory.glob("*.json"):
+            try:
+                baselines.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return sorted(baselines, key=lambda baseline: baseline.get("created", 0), reverse=True)
+
+
+def check(baseline, parser, tolerance=DEFAULT_TOLERANCE, alpha=DEFAULT_ALPHA):
+    """Compare new samples with a baseline, entry by entry.
+
+    An entry regressed if its p50 or p95 is more than `tolerance` slower
+    than the baseline's, and the Mann-Whitney U test finds the difference
+    significant at level `alpha` (so that noise alone does not fail a
+    cell).
+
+    Returns:
+        list: One dict per entry of the baseline
+    """
+    rows = []
+    for saved in baseline["entries"]:
+        index = saved["index"]
+        before = saved["samples"]
+        after = parser.samples.get(index, [])
+        row = {
+            "index": index, "label": parser.labels.get(index, saved.get("label", "")),
+            "n": len(after), "p50_before": percentile(before, 50),
+            "p95_before": percentile(before, 95),
+        }
+        if not after or not before:
+            row["verdict"] = "no samples"
+            row["regressed"] = False
+            rows.append(row)
+            continue
+        p50, p95 = percentile(after, 50), percentile(after, 95)
+        _, p_value = mann_whitney_u(after, before)
+        change50 = (p50 - row["p50_before"]) / row["p50_before"] if row["p50_before"] else 0.0
+        change95 = (p95 - row["p95_before"]) / row["p95_before"] if row["p95_before"] else 0.0
+        slower = median(after) > median(before)
+        regressed = p_value < alpha and slower and max(change50, change95) > tolerance
+        row.update(
+            p50=p50, p95=p95, change50=change50, change95=change95, p_value=p_value,
+            regressed=regressed,
+        )
+        if regressed:
+            row["verdict"] = f"REGRESSED (p={p_value:.3g})"
+        elif p_value < alpha and not slower:
+            row["verdict"] = f"faster (p={p_value:.3g})"
+        elif p_value < alpha:
+            row["verdict"] = f"slower, within {tolerance * 100:g}% (p={p_value:.3g})"
+        else:
+            row["verdict"] = f"no significant change (p={p_value:.3g})"
+        rows.append(row)
+    return rows
+
+
+def format_check(rows, baseline, tolerance):
+    """Render the result of a baseline check as (text, html)."""
+    columns = ("Entry", "n", "p50", "p95", "Verdict")
+
+    def ms(value):
+        return "-" if value is None else f"{value:.2f}"
+
+    def change(value):
+        return "" if value is None else f" ({value * 100:+.1f}%)"
+
+    cells = [
+        [
+            f"#{row['index']} {row['label']}".strip(), str(row["n"]),
+            f"{ms(row.get('p50'))} ms{change(row.get('change50'))}",
+            f"{ms(row.get('p95'))} ms{change(row.get('change95'))}",
+            row["verdict"],
+        ]
+        for row in rows
+    ]
+    saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(baseline.get("created", 0)))
+    regressed = sum(row["regressed"] for row in rows)
+    title = (
+        f"{regressed} of {len(rows)} entries regressed" if regressed
+        else f"No regression beyond {tolerance * 100:g}%"
+    ) + f" (baseline of {saved})"
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    text = title + "\n" + "  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip() + "\n"
+    text += "".join(
+        "  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() + "\n" for r in cells
+    )
+    header = "".join(f"<th>{c}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(
+            f"<td style='color:#c62828'><b>{html.escape(v)}</b></td>" if row["regressed"] and i == 4
+            else f"<td>{html.escape(v)}</td>"
+            for i, v in enumerate(r)
+        ) + "</tr>"
+        for r, row in zip(cells, rows)
+    )
+    return text, f"<b>{html.escape(title)}</b><table><tr>{header}</tr>{body}</table>"
+
+
+def format_saved(baseline):
+    """Render a saved baseline as plain text."""
+    lines = [f"Baseline saved for {len(baseline['entries'])} entries:"]
+    for entry in baseline["entries"]:
+        samples = entry["samples"]
+        lines.append(
+            f"  #{entry['index']} {entry['label']}: n={len(samples)}, "
+            f"p50 {percentile(samples, 50):.2f} ms, p95 {percentile(samples, 95):.2f} ms"
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,238 @@
+"""Batch execution of queued cells, in as few hurl invocations as possible."""
+
+import json
+import os
+import re
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# "--> /path/to/file.hurl:12:5" lines locate an error in hurl's output
+_ERROR_LOCATION = re.compile(r"^\s*-->\s*(?P<file>.+?\.hurl):\d+:\d+\s*$")
+
+# "/path/to/file.hurl: Success (2 request(s) in 120 ms)" progress lines
+_FILE_STATUS = re.compile(
+    r"^(?P<file>.+?\.hurl):\s*(?P<status>Success|Failure|Running)\b(?P<detail>.*)$"
+)
+
+
+@dataclass
+class BatchEntry:
+    """A cell queued for batch execution."""
+
+    number: int
+    code: str
+    display_id: str
+    # Variables the cell captures and refers to
+    captures: frozenset = frozenset()
+    references: frozenset = frozenset()
+    # Numbers of the queued cells that must run first
+    depends_on: list = field(default_factory=list)
+    filename: str = ""
+    success: bool | None = None
+    # Numbers of the dependencies that failed, if the entry was not run
+    skipped: list = field(default_factory=list)
+    time_ms: int | None = None
+    requests: int = 0
+    errors: list = field(default_factory=list)
+
+
+class BatchQueue:
+    """Cells queued with %%batch, waiting for %%batch run."""
+
+    def __init__(self):
+        self.entries = []
+        self._counter = 0
+        # Display ids must not collide with those of a previous kernel
+        self._prefix = f"hurl-batch-{uuid.uuid4().hex[:8]}"
+
+    def add(self, code, captures=frozenset(), references=frozenset()):
+        """Queue a cell and return its entry.
+
+        Args:
+            code: Hurl code of the cell
+            captures: Names of the variables the cell captures
+            references: Names of the variables the cell refers to
+        """
+        self._counter += 1
+        entry = BatchEntry(
+            number=self._counter,
+            code=code,
+            display_id=f"{self._prefix}-{self._counter}",
+            captures=frozenset(captures),
+            references=frozenset(references),
+        )
+        self.entries.append(entry)
+        return entry
+
+    def take(self):
+        """Remove and return all queued entries."""
+        entries, self.entries = self.entries, []
+        return entries
+
+    def clear(self):
+        """Drop all queued entries, returning how many were dropped."""
+        count = len(self.entries)
+        self.entries = []
+        return count
+
+
+def plan_waves(entries):
+    """Order queued entries by the variables they capture and use.
+
+    An entry depends on every earlier entry capturing a variable it refers
+    to, and, so that values are not overwritten out of order, on every
+    earlier entry capturing or referring to a variable it captures. Sets
+    `depends_on` of each entry.
+
+    Returns:
+        list: Waves of entries, in queue order within a wave; the entries of
+            a wave only depend on entries of earlier waves
+    """
+    waves = []
+    level = {}
+    for index, entry in enumerate(entries):
+        entry.depends_on = [
+            earlier.number for earlier in entries[:index]
+            if entry.references & earlier.captures
+            or entry.captures & (earlier.captures | earlier.references)
+        ]
+        level[entry.number] = 1 + max((level[n] for n in entry.depends_on), default=-1)
+        if level[entry.number] == len(waves):
+            waves.append([])
+        waves[level[entry.number]].append(entry)
+    return waves
+
+
+def write_batch_files(entries, directory):
+    """Write each entry to its own .hurl file in directory."""
+    for entry in entries:
+        path = Path(directory) / f"cell-{entry.number}.hurl"
+        path.write_text(entry.code)
+        entry.filename = str(path)
+
+
+def build_batch_command(entries, jobs, report_dir, parallel=True):
+    """Build the hurl command line running all entries.
+
+    Args:
+        entries: Entries whose files are run
+        jobs: Number of parallel jobs, defaults to the number of cores
+        report_dir: Directory receiving hurl's JSON report
+        parallel: Whether hurl supports --parallel; without it the files
+            are run one after the other
+    """
+    cmd = ["hurl", "--test", "--no-color"]
+    if parallel:
+        cmd.extend(["--parallel", "--jobs", str(jobs or os.cpu_count() or 1)])
+    cmd.extend(["--report-json", str(report_dir)])
+    cmd.extend(entry.filename for entry in entries)
+    return cmd
+
+
+class BatchOutputParser:
+    """Attribute hurl's test-mode stderr to the files of a batch.
+
+    Text is fed as it streams in; complete lines are attributed to the file
+    that the current error block or progress line refers to, and `on_update`
+    is called with the entry whenever its status changes.
+    """
+
+    def __init__(self, entries, on_update):
+        self._by_file = {entry.filename: entry for entry in entries}
+        self._on_update = on_update
+        self._partial = ""
+        self._block = []
+
+    def feed(self, name, text):
+        """Consume a chunk of stderr text."""
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        """Process any trailing partial line."""
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ""
+        self._block = []
+
+    def _line(self, line):
+        status = _FILE_STATUS.match(line)
+        if status and status.group("file") in self._by_file:
+            self._block = []
+            entry = self._by_file[status.group("file")]
+            if status.group("status") != "Running":
+                entry.success = status.group("status") == "Success"
+                self._on_update(entry)
+            return
+        if line.startswith("error:") or line.startswith("warning:"):
+            self._block = [line]
+            return
+        if not self._block:
+            return
+        self._block.append(line)
+        location = _ERROR_LOCATION.match(line)
+        if location and location.group("file") in self._by_file:
+            entry = self._by_file[location.group("file")]
+            # Keep the header and location of the block; the rest follows
+            entry.errors.append(self._block)
+        elif not line.strip():
+            self._block = []
+
+
+def apply_report(entries, report_dir):
+    """Update entries with the results of hurl's JSON report.
+
+    Files missing from the report (e.g. because they could not be parsed)
+    are marked as failed.
+
+    Returns:
+        bool: True if a report was found
+    """
+    report_file = Path(report_dir) / "report.json"
+    try:
+        report = json.loads(report_file.read_text())
+    except (OSError, ValueError):
+        report = None
+    for entry in entries:
+        if entry.success is None:
+            entry.success = False
+    if report is None:
+        return False
+    by_file = {entry.filename: entry for entry in entries}
+    for result in report:
+        entry = by_file.get(result.get("filename"))
+        if entry is None:
+            continue
+        entry.success = bool(result.get("success"))
+        entry.time_ms = result.get("time")
+        entry.requests = sum(
+            len(e.get("calls", [])) for e in result.get("entries", [])
+        )
+    return True
+
+
+def format_entry_status(entry):
+    """Render the status of a batch entry as plain text."""
+    if entry.skipped:
+        failed = ", ".join(f"#{number}" for number in entry.skipped)
+        return f"[batch #{entry.number}] Skipped (depends on {failed}, which did not succeed)"
+    if entry.success is None:
+        if entry.depends_on:
+            after = ", ".join(f"#{number}" for number in entry.depends_on)
+            return f"[batch #{entry.number}] queued (runs after {after})"
+        return f"[batch #{entry.number}] queued"
+    status = "Success" if entry.success else "Failure"
+    details = []
+    if entry.requests:
+        details.append(f"{entry.requests} request(s)")
+    if entry.time_ms is not None:
+        details.append(f"{entry.time_ms} ms")
+    text = f"[batch #{entry.number}] {status}"
+    if details:
+        text += f" ({', '.join(details)})"
+    for block in entry.errors:
+        text += "\n" + "\n".join(block).replace(entry.filename, f"cell #{entry.number}")
+    return text
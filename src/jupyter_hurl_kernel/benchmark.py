@@ -0,0 +1,324 @@
+"""A/B latency benchmarks and the statistics used to compare them."""
+
+import html
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .report import call_total_us, iter_calls
+
+# "# variant: name" comment lines separate the variants of a %%bench cell
+_VARIANT_MARKER = re.compile(r"^\s*#\s*variant\s*:\s*(?P<name>.*?)\s*$", re.IGNORECASE)
+
+
+@dataclass
+class Variant:
+    """One side of a benchmark."""
+
+    name: str
+    code: str
+    filename: str = ""
+    seen: int = 0
+    samples: list = field(default_factory=list)
+    failures: int = 0
+
+
+def split_variants(hurl_code):
+    """Split a %%bench cell into its variants.
+
+    Returns:
+        list: Variants in order of appearance; code before the first marker
+            is shared by (prepended to) every variant
+    """
+    shared = []
+    variants = []
+    for line in hurl_code.split("\n"):
+        marker = _VARIANT_MARKER.match(line)
+        if marker:
+            variants.append(Variant(name=marker.group("name") or f"#{len(variants) + 1}", code=""))
+        elif variants:
+            variants[-1].code += line + "\n"
+        else:
+            shared.append(line)
+    prefix = "\n".join(shared).strip()
+    for variant in variants:
+        if prefix:
+            variant.code = prefix + "\n" + variant.code
+    return variants
+
+
+def write_variant_files(variants, directory):
+    """Write each variant to its own .hurl file."""
+    for index, variant in enumerate(variants):
+        path = Path(directory) / f"variant-{index}.hurl"
+        path.write_text(variant.code)
+        variant.filename = str(path)
+
+
+def interleaved_order(variants, rounds):
+    """Return the files to run, interleaving variants to cancel drift.
+
+    Each round runs every variant once; the order is rotated from round to
+    round so that no variant always runs first on a warm connection pool or
+    server cache.
+    """
+    files = []
+    for round_number in range(rounds):
+        shift = round_number % len(variants)
+        rotated = variants[shift:] + variants[:shift]
+        if round_number % 2:
+            rotated.reverse()
+        files.extend(variant.filename for variant in rotated)
+    return files
+
+
+class BenchOutputParser:
+    """Turn hurl's --json output lines into per-variant samples."""
+
+    def __init__(self, variants, warmup):
+        self._by_file = {variant.filename: variant for variant in variants}
+        self.warmup = warmup
+        self._partial = ""
+
+    def feed(self, name, text):
+        """Consume a chunk of stdout text."""
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        """Process any trailing partial line."""
+        if self._partial:
+            self._line(self._partial)
+            self._partial = ""
+
+    def _line(self, line):
+        try:
+            result = json.loads(line)
+        except ValueError:
+            return
+        variant = self._by_file.get(result.get("filename"))
+        if variant is None:
+            return
+        variant.seen += 1
+        if variant.seen <= self.warmup:
+            return
+        totals = [call_total_us(call) for _, call in iter_calls(result)]
+        if not result.get("success", False) or not totals or None in totals:
+            variant.failures += 1
+            return
+        variant.samples.append(sum(totals) / 1000)
+
+
+def mean(values):
+    """Arithmetic mean."""
+    return sum(values) / len(values)
+
+
+def stdev(values):
+    """Sample standard deviation (0 for fewer than two values)."""
+    if len(values) < 2:
+        return 0.0
+    m = mean(values)
+    return math.sqrt(sum((v - m) ** 2 for v in values) / (len(values) - 1))
+
+
+def median(values):
+    """Median."""
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def _betacf(a, b, x):
+    """Continued fraction for the regularized incomplete beta function."""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c if abs(c) > tiny else 1.0 + aa / tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c if abs(c) > tiny else 1.0 + aa / tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-12:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+        + a * math.log(x) + b * math.log(1 - x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1 - x) / b
+
+
+def t_sf_two_sided(t, df):
+    """Two-sided p-value of Student's t distribution."""
+    if df <= 0 or math.isnan(t):
+        return 1.0
+    if math.isinf(t):
+        return 0.0
+    return _betainc(df / 2, 0.5, df / (df + t * t))
+
+
+def t_quantile(p, df):
+    """Quantile of Student's t distribution for p in (0.5, 1)."""
+    low, high = 0.0, 1000.0
+    target = 2 * (1 - p)
+    for _ in range(100):
+        middle = (low + high) / 2
+        if t_sf_two_sided(middle, df) > target:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def confidence_interval(values, level=0.95):
+    """Confidence interval of the mean, as (low, high)."""
+    m = mean(values)
+    if len(values) < 2:
+        return m, m
+    half = t_quantile(1 - (1 - level) / 2, len(values) - 1) * stdev(values) / math.sqrt(len(values))
+    return m - half, m + half
+
+
+def welch_t_test(a, b):
+    """Welch's unequal variances t-test.
+
+    Returns:
+        tuple: (t statistic, two-sided p-value)
+    """
+    if len(a) < 2 or len(b) < 2:
+        return 0.0, 1.0
+    va, vb = stdev(a) ** 2 / len(a), stdev(b) ** 2 / len(b)
+    if va + vb == 0:
+        return 0.0, 1.0 if mean(a) == mean(b) else 0.0
+    t = (mean(a) - mean(b)) / math.sqrt(va + vb)
+    df = (va + vb) ** 2 / (
+        (va ** 2 / (len(a) - 1) if len(a) > 1 else 0)
+        + (vb ** 2 / (len(b) - 1) if len(b) > 1 else 0)
+    )
+    return t, t_sf_two_sided(t, df)
+
+
+def mann_whitney_u(a, b):
+    """Mann-Whitney U test with the normal approximation and tie correction.
+
+    Latencies are skewed and outlier-prone, so this rank test is the one
+    used for the verdict; Welch's test is reported alongside.
+
+    Returns:
+        tuple: (U statistic of a, two-sided p-value)
+    """
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(combined)
+    ties = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = rank
+        count = j - i + 1
+        ties += count ** 3 - count
+        i = j + 1
+    rank_sum = sum(r for r, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))) if n > 1 else 0
+    if sigma == 0:
+        return u, 1.0
+    z = (u - n1 * n2 / 2) / sigma
+    return u, math.erfc(abs(z) / math.sqrt(2))
+
+
+def compare(variants, alpha=0.05):
+    """Compare each variant against the first one.
+
+    Returns:
+        list: One dict per variant with its summary and, for all but the
+            first, the comparison against the first
+    """
+    rows = []
+    baseline = variants[0]
+    for variant in variants:
+        samples = variant.samples
+        row = {"name": variant.name, "n": len(samples), "failures": variant.failures}
+        if samples:
+            low, high = confidence_interval(samples)
+            row.update(
+                mean=mean(samples), median=median(samples), stdev=stdev(samples),
+                ci_low=low, ci_high=high,
+            )
+        if variant is not baseline and samples and baseline.samples:
+            _, p_welch = welch_t_test(samples, baseline.samples)
+            _, p_mw = mann_whitney_u(samples, baseline.samples)
+            change = (median(samples) - median(baseline.samples)) / median(baseline.samples)
+            row.update(p_welch=p_welch, p_mann_whitney=p_mw, change=change)
+            if p_mw < alpha:
+                direction = "slower" if change > 0 else "faster"
+                row["verdict"] = (
+                    f"{abs(change) * 100:.1f}% {direction} than {baseline.name} "
+                    f"(significant, p={p_mw:.3g})"
+                )
+            else:
+                row["verdict"] = f"no significant difference with {baseline.name} (p={p_mw:.3g})"
+        rows.append(row)
+    return rows
+
+
+def format_comparison(rows, running=False):
+    """Render the comparison as (text, html)."""
+    columns = ("Variant", "n", "Failed", "Mean", "Median", "Stddev", "95% CI", "Verdict")
+
+    def fmt(row):
+        if "mean" not in row:
+            return [row["name"], str(row["n"]), str(row["failures"]), "-", "-", "-", "-", ""]
+        return [
+            row["name"], str(row["n"]), str(row["failures"]),
+            f"{row['mean']:.2f} ms", f"{row['median']:.2f} ms", f"{row['stdev']:.2f} ms",
+            f"[{row['ci_low']:.2f}, {row['ci_high']:.2f}] ms",
+            row.get("verdict", "baseline"),
+        ]
+
+    cells = [fmt(row) for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    title = "Benchmark running..." if running else "Benchmark results"
+    text = title + "\n" + "  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip() + "\n"
+    text += "".join(
+        "  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() + "\n" for r in cells
+    )
+    header = "".join(f"<th>{c}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(v)}</td>" for v in r) + "</tr>" for r in cells
+    )
+    return text, f"<b>{title}</b><table><tr>{header}</tr>{body}</table>"
@@ -0,0 +1,199 @@
+"""On-disk cache of hurl results for idempotent cells."""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+# Default time to live when %%cache is used without ttl=
+DEFAULT_TTL = 300
+
+# Only cells made of these methods are cached
+CACHEABLE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_STREAMS = ("stdout", "stderr")
+
+
+def default_cache_dir():
+    """Return the per-user cache directory of the kernel."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "jupyter-hurl-kernel" / "responses"
+
+
+def non_cacheable_methods(methods):
+    """Return the methods, of those of a cell, that are not safe to cache."""
+    return sorted(set(methods) - CACHEABLE_METHODS)
+
+
+def make_key(hurl_code, variables, flags):
+    """Build the cache key of a cell.
+
+    Args:
+        hurl_code: Hurl source, without magic lines
+        variables: Variables the cell is executed with
+        flags: Mode flags affecting hurl's output (e.g. ['include'])
+    """
+    material = json.dumps(
+        {"code": hurl_code, "variables": variables, "flags": sorted(flags)},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CacheEntry:
+    """A cached result, as stored on disk."""
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.returncode = meta["returncode"]
+        self.created = meta["created"]
+        self.expires = meta["expires"]
+        self.captures = meta.get("captures", [])
+
+    @property
+    def age(self):
+        """Seconds since the entry was stored."""
+        return time.time() - self.created
+
+    def stream_path(self, name):
+        """Path of the recorded 'stdout' or 'stderr' bytes."""
+        return self.directory / name
+
+
+class CacheWriter:
+    """Records the output of a run and commits it to the cache on success."""
+
+    def __init__(self, cache, key):
+        self._cache = cache
+        self.key = key
+        self._directory = cache.directory / f".{key}.{os.getpid()}.tmp"
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self.sinks = {
+            name: open(self._directory / name, "wb") for name in _STREAMS
+        }
+
+    def commit(self, returncode, captures, ttl):
+        """Store the recorded output."""
+        self._close()
+        now = time.time()
+        meta = {
+            "returncode": returncode,
+            "created": now,
+            "expires": now + ttl,
+            "captures": captures,
+        }
+        (self._directory / "meta.json").write_text(json.dumps(meta, default=str))
+        target = self._cache.directory / self.key
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(self._directory, target)
+        self._cache.stats["stores"] += 1
+        self._cache.evict()
+
+    def discard(self):
+        """Drop the recorded output."""
+        self._close()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _close(self):
+        for sink in self.sinks.values():
+            sink.close()
+
+
+class ResponseCache:
+    """Size-bounded, least-recently-used cache of cell results.
+
+    Each entry is a directory named after the cell's key holding the raw
+    stdout and stderr of the run plus its metadata; the modification time of
+    the metadata file records the last use and drives eviction.
+    """
+
+    def __init__(self, directory=None, max_size=256 * 1024 * 1024):
+        self.directory = Path(directory or default_cache_dir())
+        self.max_size = max_size
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def lookup(self, key):
+        """Return the live entry for key, or None."""
+        entry_dir = self.directory / key
+        meta_file = entry_dir / "meta.json"
+        try:
+            meta = json.loads(meta_file.read_text())
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        if meta.get("expires", 0) < time.time():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            self.stats["misses"] += 1
+            return None
+        os.utime(meta_file)
+        self.stats["hits"] += 1
+        return CacheEntry(entry_dir, meta)
+
+    def writer(self, key):
+        """Return a writer recording a new entry for key."""
+        return CacheWriter(self, key)
+
+    def entries(self):
+        """Return (last_used, size, path) for every stored entry."""
+        result = []
+        try:
+            children = list(os.scandir(self.directory))
+        except OSError:
+            return result
+        for child in children:
+            if not child.is_dir() or child.name.startswith("."):
+                continue
+            path = Path(child.path)
+            try:
+                last_used = (path / "meta.json").stat().st_mtime
+                size = sum(f.stat().st_size for f in path.iterdir())
+            except OSError:
+                continue
+            result.append((last_used, size, path))
+        return result
+
+    def evict(self):
+        """Remove expired entries, then the least recently used ones above max_size."""
+        now = time.time()
+        entries = []
+        for last_used, size, path in self.entries():
+            try:
+                expires = json.loads((path / "meta.json").read_text())["expires"]
+            except (OSError, ValueError, KeyError):
+                expires = 0
+            if expires < now:
+                shutil.rmtree(path, ignore_errors=True)
+                self.stats["evictions"] += 1
+            else:
+                entries.append((last_used, size, path))
+        total = sum(size for _, size, _ in entries)
+        for last_used, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """Remove every entry, returning how many were removed."""
+        entries = self.entries()
+        for _, _, path in entries:
+            shutil.rmtree(path, ignore_errors=True)
+        return len(entries)
+
+    def summary(self):
+        """Describe the cache contents and hit/miss statistics."""
+        entries = self.entries()
+        lookups = self.stats["hits"] + self.stats["misses"]
+        ratio = f"{100 * self.stats['hits'] / lookups:.0f}%" if lookups else "n/a"
+        return (
+            f"Cache: {len(entries)} entries, "
+            f"{sum(size for _, size, _ in entries)} / {self.max_size} bytes "
+            f"in {self.directory}\n"
+            f"Hits: {self.stats['hits']}, misses: {self.stats['misses']} "
+            f"(hit ratio {ratio}), stores: {self.stats['stores']}, "
+            f"evictions: {self.stats['evictions']}\n"
+        )
@@ -0,0 +1,225 @@
+"""Context-aware completion of Hurl code."""
+
+import bisect
+import re
+
+from . import parser
+
+HTTP_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS', 'CONNECT', 'TRACE']
+
+HEADERS = [
+    'Accept:', 'Accept-Encoding:', 'Accept-Language:', 'Authorization:',
+    'Cache-Control:', 'Connection:', 'Content-Type:', 'Content-Length:',
+    'Cookie:', 'Host:', 'If-Match:', 'If-Modified-Since:', 'If-None-Match:',
+    'Origin:', 'Referer:', 'User-Agent:', 'X-Forwarded-For:', 'X-Requested-With:',
+]
+
+CONTENT_TYPES = [
+    'application/json', 'application/x-www-form-urlencoded', 'multipart/form-data',
+    'text/plain', 'text/html', 'application/xml', 'application/octet-stream',
+]
+
+REQUEST_SECTIONS = [f'[{name}]' for name in parser.REQUEST_SECTIONS]
+
+RESPONSE_SECTIONS = [f'[{name}]' for name in parser.RESPONSE_SECTIONS]
+
+QUERIES = list(parser.QUERY_ARGS)
+
+PREDICATES = ['not'] + list(parser.PREDICATE_ARGS)
+
+FILTERS = list(parser.FILTER_ARGS)
+
+OPTIONS = [f'{name}:' for name in parser.OPTION_NAMES]
+
+TEMPLATE_FUNCTIONS = list(parser.TEMPLATE_FUNCTIONS)
+
+MAGIC_LINES = [
+    '%%include', '%%verbose', '%%timing', '%%test', '%%output=', '%%timeout=', '%%max-output=',
+    '%%overflow=', '%%batch', '%%batch run',
+    '%%vars', '%%vars set', '%%vars clear',
+    '%%cookies', '%%cookies clear', '%%cookies scope',
+    '%%cache', '%%cache ttl=', '%%cache off', '%%cache stats',
+    '%%cache clear', '%%load', '%%bench', '%%stats', '%%stats clear', '%%preflight off',
+    '%%engine=inprocess', '%%engine=hurl', '%%rich off', '%%rich on',
+    '%%background', '%%background list', '%%background wait', '%%background cancel',
+    '%%watch interval=5s', '%%watch until=success', '%%watch count=10',
+    '%%foreach file=', '%%foreach concurrency=',
+    '%%baseline save', '%%baseline check', '%%baseline check tolerance=15%', '%%baseline list',
+    '%%history', '%%history on', '%%history off', '%%history requests url=', '%%history show', '%%history export', '%%history clear',
+]
+
+_WORD = re.compile(r"\S*$")
+
+# Number of URLs and variable names learnt from executed cells
+MAX_LEARNED = 2000
+
+
+class PrefixIndex:
+    """Sorted, case-insensitive index of words answering prefix queries.
+
+    A lookup is a binary search for the first candidate followed by a scan
+    of the matches only, instead of a pass over the whole vocabulary.
+    """
+
+    def __init__(self, words=()):
+        self._keys = []
+        self._words = []
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, word):
+        """Insert a word, ignoring duplicates."""
+        key = word.lower()
+        position = bisect.bisect_left(self._keys, key)
+        while position < len(self._keys) and self._keys[position] == key:
+            if self._words[position] == word:
+                return
+            position += 1
+        self._keys.insert(position, key)
+        self._words.insert(position, word)
+
+    def lookup(self, prefix):
+        """Return the words starting with prefix, ignoring case."""
+        key = prefix.lower()
+        start = bisect.bisect_left(self._keys, key)
+        end = start
+        while end < len(self._keys) and self._keys[end].startswith(key):
+            end += 1
+        return self._words[start:end]
+
+
+def _context(document, line):
+    """Find the context completing the first word of a 1-based line needs.
+
+    A partly typed line can look like a request or a section header of its
+    own ("GE", "[Asser"): the context is then the one of the line above.
+
+    Returns:
+        str: The section name (e.g. 'Asserts'), 'request' for the headers of a
+            request, 'response' after its HTTP status line, 'body', or None
+            before any request
+    """
+    entry = document.entry_at(line)
+    if entry is not None and line > 1:
+        relative = line - entry.line
+        if any(start == relative for start, _ in entry.regions):
+            return document.context_at(line - 1)
+    return document.context_at(line)
+
+
+class CompletionEngine:
+    """Completes Hurl code from indexes built once per kernel."""
+
+    def __init__(self, hurl_parser=None):
+        # Shared with the kernel, so that a cell is parsed once for every request
+        self.parser = hurl_parser or parser.HurlParser()
+        self.headers = PrefixIndex(HEADERS)
+        self.content_types = PrefixIndex(CONTENT_TYPES)
+        self.request_sections = PrefixIndex(REQUEST_SECTIONS + RESPONSE_SECTIONS)
+        self.response_sections = PrefixIndex(RESPONSE_SECTIONS)
+        self.queries = PrefixIndex(QUERIES)
+        self.filters = PrefixIndex(FILTERS)
+        self.predicates_and_filters = PrefixIndex(PREDICATES + FILTERS)
+        self.options = PrefixIndex(OPTIONS)
+        self.magic_lines = PrefixIndex(MAGIC_LINES)
+        self.line_starts = PrefixIndex(HTTP_METHODS + MAGIC_LINES + ['HTTP'])
+        self.everything = PrefixIndex(
+            HTTP_METHODS + HEADERS + REQUEST_SECTIONS + RESPONSE_SECTIONS + MAGIC_LINES
+            + QUERIES + PREDICATES + FILTERS
+        )
+        # Completions of the first word of a line, besides line_starts
+        self._line_start_indexes = {
+            'request': self.headers,
+            'response': self.response_sections,
+            'Options': self.options,
+            'Asserts': self.queries,
+        }
+        # Learnt from the cells executed in the session
+        self.urls = PrefixIndex()
+        self.variables = PrefixIndex(TEMPLATE_FUNCTIONS)
+
+    def learn(self, document, variables=()):
+        """Remember the URLs and variable names of an executed cell.
+
+        Args:
+            document: The parsed cell
+            variables: Names of the session variables
+        """
+        for entry in document.entries:
+            if entry.url and len(self.urls) < MAX_LEARNED:
+                self.urls.add(entry.url.split()[0])
+        names = [capture.name for capture in document.captures] + list(variables)
+        for name in names:
+            if len(self.variables) < MAX_LEARNED:
+                self.variables.add(name)
+
+    def complete(self, code, cursor_pos, variables=()):
+        """Complete the word before the cursor.
+
+        Args:
+            code: The cell's code
+            cursor_pos: Offset of the cursor in code
+            variables: Names of the current session variables
+
+        The context of the cursor comes from the parsed cell, which is cached:
+        completing again in an unchanged cell, or in a cell where only the
+        current entry changed, re-parses at most that entry.
+
+        Returns:
+            tuple: (matches, cursor_start)
+        """
+        line_start = code.rfind('\n', 0, cursor_pos) + 1
+        before = code[line_start:cursor_pos]
+        word_match = _WORD.search(before)
+        word = word_match.group()
+        cursor_start = line_start + word_match.start()
+        stripped = before.lstrip()
+        first_word = stripped == word
+
+        # Inside a {{template}}: variables and functions
+        template = before.rfind('{{')
+        if template != -1 and '}}' not in before[template:]:
+            prefix = before[template + 2:].lstrip()
+            matches = self.variables.lookup(prefix)
+            matches += sorted(
+                name for name in variables
+                if name.lower().startswith(prefix.lower()) and name not in matches
+            )
+            return matches, cursor_pos - len(prefix)
+
+        if stripped.startswith('%%'):
+            return self.magic_lines.lookup(stripped), cursor_pos - len(stripped)
+
+        # The URL of a request line
+        if not first_word and stripped.split()[0] in HTTP_METHODS:
+            return self.urls.lookup(word), cursor_start
+
+        section = _context(self.parser.parse(code), code.count('\n', 0, line_start) + 1)
+        if section == 'body':
+            return [], cursor_start
+        if word.startswith('['):
+            if section in ('response', 'Captures', 'Asserts'):
+                return self.response_sections.lookup(word), cursor_start
+            return self.request_sections.lookup(word), cursor_start
+
+        if first_word:
+            index = self._line_start_indexes.get(section)
+            matches = index.lookup(word) if index else []
+            return matches + self.line_starts.lookup(word), cursor_start
+
+        if section == 'request':
+            if stripped.lower().startswith('content-type:'):
+                return self.content_types.lookup(word), cursor_start
+            return [], cursor_start
+        if section == 'Options':
+            return [], cursor_start
+        if section == 'Asserts':
+            return self.predicates_and_filters.lookup(word), cursor_start
+        if section == 'Captures':
+            if stripped.split(':', 1)[-1].strip() == word:
+                return self.queries.lookup(word), cursor_start
+            return self.filters.lookup(word), cursor_start
+        return self.everything.lookup(word), cursor_start
@@ -0,0 +1,248 @@
+"""Cookie jar persisted across cells."""
+
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from http.cookies import CookieError, SimpleCookie
+from pathlib import Path
+
+# Prefix curl and hurl use to mark HttpOnly cookies in Netscape cookie files
+_HTTP_ONLY_PREFIX = "#HttpOnly_"
+
+
+@dataclass
+class Cookie:
+    """A cookie line from a Netscape cookie file."""
+
+    domain: str
+    include_subdomains: bool
+    path: str
+    secure: bool
+    expires: str
+    name: str
+    value: str
+    http_only: bool = False
+
+    @classmethod
+    def parse(cls, line):
+        """Parse a cookie file line, returning None for comments and blanks."""
+        line = line.rstrip("\r\n")
+        http_only = line.startswith(_HTTP_ONLY_PREFIX)
+        if http_only:
+            line = line[len(_HTTP_ONLY_PREFIX):]
+        elif not line.strip() or line.startswith("#"):
+            return None
+        fields = line.split("\t")
+        if len(fields) != 7:
+            return None
+        domain, subdomains, path, secure, expires, name, value = fields
+        return cls(
+            domain=domain,
+            include_subdomains=subdomains.upper() == "TRUE",
+            path=path,
+            secure=secure.upper() == "TRUE",
+            expires=expires,
+            name=name,
+            value=value,
+            http_only=http_only,
+        )
+
+    def format(self):
+        """Render the cookie as a Netscape cookie file line."""
+        domain = (_HTTP_ONLY_PREFIX if self.http_only else "") + self.domain
+        return "\t".join([
+            domain,
+            "TRUE" if self.include_subdomains else "FALSE",
+            self.path,
+            "TRUE" if self.secure else "FALSE",
+            self.expires,
+            self.name,
+            self.value,
+        ])
+
+    def matches_host(self, host):
+        """Return True if the cookie belongs to host, a parent or a subdomain of it."""
+        host = host.lower().lstrip(".")
+        domain = self.domain.lower().lstrip(".")
+        return host == domain or host.endswith("." + domain) or domain.endswith("." + host)
+
+    def applies_to(self, host, path, secure, now=None):
+        """Return True if a request to host and path must send the cookie."""
+        host = host.lower()
+        domain = self.domain.lower().lstrip(".")
+        if host != domain and not (self.include_subdomains and host.endswith("." + domain)):
+            return False
+        if not (path == self.path or path.startswith(self.path.rstrip("/") + "/")):
+            return False
+        if self.secure and not secure:
+            return False
+        expires = int(self.expires) if self.expires.isdigit() else 0
+        return expires == 0 or expires > (now or time.time())
+
+
+def parse_set_cookie(header, host, now=None):
+    """Parse a Set-Cookie header received from host.
+
+    Returns:
+        list: The cookies it sets; an expired cookie asks to delete a cookie
+    """
+    jar = SimpleCookie()
+    try:
+        jar.load(header)
+    except CookieError:
+        return []
+    now = now or time.time()
+    cookies = []
+    for name, morsel in jar.items():
+        expires = 0
+        if morsel["max-age"]:
+            try:
+                expires = int(now + int(morsel["max-age"])) if int(morsel["max-age"]) > 0 else 1
+            except ValueError:
+                pass
+        elif morsel["expires"]:
+            try:
+                expires = max(int(parsedate_to_datetime(morsel["expires"]).timestamp()), 1)
+            except (TypeError, ValueError):
+                pass
+        domain = morsel["domain"].lstrip(".")
+        cookies.append(Cookie(
+            domain=f".{domain}" if domain else host,
+            include_subdomains=bool(domain),
+            path=morsel["path"] or "/",
+            secure=bool(morsel["secure"]),
+            expires=str(expires),
+            name=name,
+            value=morsel.value,
+            http_only=bool(morsel["httponly"]),
+        ))
+    return cookies
+
+
+class CookieJar:
+    """A cookie file shared by every hurl invocation of the kernel.
+
+    hurl reads the jar with --cookie and writes it back with --cookie-jar,
+    so a session cookie obtained by a login cell is sent by the cells that
+    follow. The jar can be restricted to a set of hosts, in which case
+    cookies set by other hosts are dropped after each run.
+    """
+
+    def __init__(self):
+        self._directory = None
+        self.scope = []
+
+    @property
+    def path(self):
+        """Path of the jar file, created on first use."""
+        if self._directory is None:
+            self._directory = Path(tempfile.mkdtemp(prefix="hurl-cookies-"))
+        return self._directory / "cookies.txt"
+
+    def cookies(self, host=None):
+        """Return the cookies in the jar, optionally only those of host."""
+        if self._directory is None or not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            cookies = [cookie for cookie in map(Cookie.parse, f) if cookie]
+        if host:
+            cookies = [cookie for cookie in cookies if cookie.matches_host(host)]
+        return cookies
+
+    def command_args(self, write=True):
+        """Return the hurl arguments reading (and writing back) the jar.
+
+        Args:
+            write: Also pass --cookie-jar; hurl only supports it for a
+                single file, so it must be False for batches.
+        """
+        args = []
+        if self.cookies():
+            args.extend(["--cookie", str(self.path)])
+        if write:
+            args.extend(["--cookie-jar", str(self.path)])
+        return args
+
+    def request_header(self, host, path, secure):
+        """Return the Cookie header of a request made in-process, or None."""
+        now = time.time()
+        pairs = [
+            f"{cookie.name}={cookie.value}" for cookie in self.cookies()
+            if cookie.applies_to(host, path, secure, now)
+        ]
+        return "; ".join(pairs) or None
+
+    def store(self, host, set_cookie_headers):
+        """Save the cookies set by a response received in-process."""
+        received = [
+            cookie for header in set_cookie_headers
+            for cookie in parse_set_cookie(header, host)
+        ]
+        if not received:
+            return
+        now = time.time()
+        keys = {(c.domain.lower(), c.path, c.name) for c in received}
+        cookies = [
+            c for c in self.cookies() if (c.domain.lower(), c.path, c.name) not in keys
+        ]
+        cookies += [
+            c for c in received if not (c.expires != "0" and int(c.expires) <= now)
+        ]
+        self._rewrite(cookies)
+
+    def apply_scope(self):
+        """Drop cookies that belong to hosts outside the scope."""
+        if self.scope:
+            self._rewrite(
+                cookie for cookie in self.cookies()
+                if any(cookie.matches_host(host) for host in self.scope)
+            )
+
+    def clear(self, hosts=None):
+        """Remove the cookies of the given hosts, or all of them.
+
+        Returns:
+            int: Number of cookies removed
+        """
+        cookies = self.cookies()
+        if hosts:
+            kept = [
+                cookie for cookie in cookies
+                if not any(cookie.matches_host(host) for host in hosts)
+            ]
+        else:
+            kept = []
+        self._rewrite(kept)
+        return len(cookies) - len(kept)
+
+    def close(self):
+        """Delete the jar file."""
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def _rewrite(self, cookies):
+        lines = [cookie.format() + "\n" for cookie in cookies]
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("# Netscape HTTP Cookie File\n")
+            f.writelines(lines)
+
+
+class ReadOnlyCookieJar:
+    """A view of a CookieJar that sends its cookies but stores no new ones.
+
+    Used by runs that share the jar concurrently, the way hurl is given
+    --cookie without --cookie-jar.
+    """
+
+    def __init__(self, jar):
+        self._jar = jar
+
+    def request_header(self, host, path, secure):
+        """Return the Cookie header of a request made in-process, or None."""
+        return self._jar.request_header(host, path, secure)
+
+    def store(self, host, set_cookie_headers):
+        """Drop the cookies set by a response."""
@@ -0,0 +1,271 @@
+"""Data-driven runs of a cell with %%foreach: one run per row of a file."""
+
+import asyncio
+import csv
+import html
+import json
+import time
+from pathlib import Path
+
+from .histogram import LatencyHistogram
+from .streaming import ProcessInterrupted
+from .variables import VARIABLE_NAME, format_value
+
+# Formats of the row files, by extension
+ROW_FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+# Number of distinct error messages shown in the summary
+MAX_ERROR_SAMPLES = 5
+
+# Rows read ahead of the workers, per worker
+READ_AHEAD = 4
+
+# Output of hurl --json kept per row, to read its report
+REPORT_SIZE = 1024 * 1024
+
+
+def row_format(path, name=None):
+    """Return the format of a row file: 'csv', 'tsv' or 'jsonl'.
+
+    Args:
+        path: The file
+        name: Format given with format=, overriding the extension
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if name:
+        if name.lower() not in ROW_FORMATS.values():
+            raise ValueError(f"Unknown row format: {name!r} (expected csv, tsv or jsonl)")
+        return name.lower()
+    suffix = Path(path).suffix.lower()
+    if suffix not in ROW_FORMATS:
+        raise ValueError(
+            f"Cannot tell the format of {path} from its extension: add format=csv, tsv or jsonl"
+        )
+    return ROW_FORMATS[suffix]
+
+
+def _check_columns(columns, where):
+    for column in columns:
+        if not VARIABLE_NAME.match(column or ""):
+            raise ValueError(f"{where}: {column!r} is not a valid variable name")
+
+
+def iter_rows(path, fmt):
+    """Yield the rows of a file as {column: text}, reading it as it goes.
+
+    CSV and TSV files have a header line naming the columns; JSONL files
+    have one object per line, whose non-string values are passed as JSON.
+
+    Raises:
+        ValueError: If the file is malformed, or a column is not a valid
+            variable name
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt in ("csv", "tsv"):
+            reader = csv.DictReader(f, delimiter="\t" if fmt == "tsv" else ",")
+            _check_columns(reader.fieldnames or [], f"{path}, header")
+            for row in reader:
+                yield {name: value or "" for name, value in row.items() if name is not None}
+            return
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}, line {number}: {e}") from None
+            if not isinstance(row, dict):
+                raise ValueError(f"{path}, line {number}: expected a JSON object")
+            _check_columns(row, f"{path}, line {number}")
+            yield {name: format_value(value) for name, value in row.items()}
+
+
+class ForEachStats:
+    """Aggregates of the rows run so far; their memory does not grow with rows."""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.ended_at = None
+        self.rows = 0
+        self.passed = 0
+        self.failed = 0
+        self.histogram = LatencyHistogram()
+        self.statuses = {}
+        self.errors = []
+
+    @property
+    def elapsed(self):
+        return (self.ended_at or time.monotonic()) - self.started_at
+
+    def record(self, result):
+        self.rows += 1
+        if result["success"]:
+            self.passed += 1
+        else:
+            self.failed += 1
+        for status, total_us in result.get("calls", []):
+            status = str(status or "none")
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if total_us is not None:
+                self.histogram.record(total_us)
+        error = result.get("error")
+        if error and error not in self.errors and len(self.errors) < MAX_ERROR_SAMPLES:
+            self.errors.append(error)
+
+
+class ForEachRun:
+    """Runs a coroutine for every row of a file, with a bounded worker pool.
+
+    Rows are read as workers become free, and each result is written as one
+    JSON line to the output file as soon as it is known, so neither the rows
+    nor the results are held in memory.
+    """
+
+    def __init__(self, rows, run_row, concurrency, output_path):
+        """Create a run; nothing is started until `run` is awaited.
+
+        Args:
+            rows: Iterable of {column: text}
+            run_row: Coroutine function called with (number, row), returning
+                a result dict with 'success', 'exit', 'calls' (a list of
+                (status, microseconds)) and 'error', or raising
+                ProcessInterrupted
+            concurrency: Number of rows run at the same time
+            output_path: JSON lines file receiving one result per row
+        """
+        self.rows = rows
+        self.run_row = run_row
+        self.concurrency = concurrency
+        self.output_path = Path(output_path)
+        self.stats = ForEachStats()
+        self.interrupted = False
+        # Processes running rows, interrupted with the run
+        self.processes = set()
+        # The first error raised by a row, which stops the run
+        self._error = None
+
+    @property
+    def stopping(self):
+        """True once no new row must be started."""
+        return self.interrupted or self._error is not None
+
+    async def run(self):
+        """Run every row, or until interrupted.
+
+        Raises:
+            ValueError: If the row file is malformed; the rows read before
+                the error have been run
+            Exception: What a row raised other than ProcessInterrupted, e.g.
+                OSError if hurl cannot be started; the running rows are
+                interrupted
+        """
+        queue = asyncio.Queue(self.concurrency * READ_AHEAD)
+        with open(self.output_path, "w", encoding="utf-8") as output:
+            workers = [
+                asyncio.ensure_future(self._work(queue, output))
+                for _ in range(self.concurrency)
+            ]
+            try:
+                for number, row in enumerate(self.rows, 1):
+                    if self.stopping:
+                        break
+                    await queue.put((number, row))
+            finally:
+                # The workers only return on None: they drain the queue
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+                self.stats.ended_at = time.monotonic()
+        if self._error is not None:
+            raise self._error
+
+    async def _work(self, queue, output):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if self.stopping:
+                continue
+            number, row = item
+            try:
+                result = await self.run_row(number, row)
+                self.stats.record(result)
+                output.write(_result_line(number, row, result))
+            except ProcessInterrupted:
+                continue
+            except Exception as e:
+                # A worker that returned would leave the queue full, and the
+                # rows waiting for it forever
+                if self._error is None:
+                    self._error = e
+                    for process in list(self.processes):
+                        process.interrupt()
+
+    def interrupt(self):
+        """Stop reading rows and interrupt the running ones.
+
+        Safe to call from a signal handler or another thread.
+        """
+        self.interrupted = True
+        for process in list(self.processes):
+            process.interrupt()
+
+
+def _result_line(number, row, result):
+    """Render the result of a row as a compact JSON line."""
+    calls = result.get("calls", [])
+    record = {
+        "row": number,
+        "values": row,
+        "success": result["success"],
+        "exit": result.get("exit"),
+        "status": [status for status, _ in calls],
+        "time_ms": round(sum(us or 0 for _, us in calls) / 1000, 3),
+    }
+    if result.get("error"):
+        record["error"] = result["error"]
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def format_foreach(stats, source, output_path, running=False):
+    """Render the aggregates of a %%foreach run as (text, html)."""
+    histogram = stats.histogram
+
+    def ms(value):
+        return "-" if value is None else f"{value / 1000:.2f}"
+
+    rate = stats.rows / stats.elapsed if stats.elapsed else 0.0
+    rows = [
+        ("Rows", f"{stats.rows} ({rate:.1f}/s)"),
+        ("Passed / failed", f"{stats.passed} / {stats.failed}"),
+        ("Latency min / mean / max", f"{ms(histogram.min)} / {ms(histogram.mean)} / {ms(histogram.max)} ms"),
+    ]
+    for percent in (50, 90, 99):
+        rows.append((f"p{percent:g}", f"{ms(histogram.percentile(percent))} ms"))
+    if stats.statuses:
+        rows.append(("Status codes", ", ".join(
+            f"{status}: {count}" for status, count in sorted(stats.statuses.items())
+        )))
+    rows.append(("Results", str(output_path)))
+    title = f"{'Running' if running else 'Ran'} the cell for each row of {source}"
+    title += f" ({stats.elapsed:.1f} s)"
+    width = max(len(label) for label, _ in rows)
+    text = title + "\n" + "".join(f"{label:<{width}}  {value}\n" for label, value in rows)
+    html_rows = "".join(
+        f"<tr><th style='text-align:left'>{label}</th><td>{html.escape(value)}</td></tr>"
+        for label, value in rows
+    )
+    markup = f"<b>{html.escape(title)}</b><table>{html_rows}</table>"
+    if stats.errors:
+        text += "Errors:\n" + "".join(f"  {error}\n" for error in stats.errors)
+        markup += "<b>Errors</b><ul>" + "".join(
+            f"<li><code>{html.escape(error)}</code></li>" for error in stats.errors
+        ) + "</ul>"
+    return text, markup
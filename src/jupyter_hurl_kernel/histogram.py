@@ -0,0 +1,97 @@
+"""Mergeable latency histogram with bounded relative error."""
+
+import math
+
+
+class LatencyHistogram:
+    """Log-linear histogram of integer values, in the spirit of HdrHistogram.
+
+    Values below 2**precision_bits are counted exactly; larger values share a
+    bucket with values having the same `precision_bits` leading bits, which
+    bounds the relative error of every reported percentile to
+    2**(1 - precision_bits) (under 1% with the default of 8 bits). Memory
+    only grows with the number of distinct buckets, never with the number of
+    samples, and histograms recorded in different processes can be merged.
+    """
+
+    def __init__(self, precision_bits=8):
+        self.precision_bits = precision_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.precision_bits)
+        return (shift << self.precision_bits) | (value >> shift)
+
+    def _bucket_value(self, index):
+        """Return the midpoint of the values counted in a bucket."""
+        shift = index >> self.precision_bits
+        mantissa = index & ((1 << self.precision_bits) - 1)
+        low = mantissa << shift
+        return low + ((1 << shift) - 1) / 2
+
+    def record(self, value, count=1):
+        """Record a non-negative value (e.g. a latency in microseconds)."""
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Add the samples of another histogram of the same precision."""
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("Cannot merge histograms of different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        """Mean of the recorded values, or None if empty."""
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent):
+        """Return the value at the given percentile (0-100), or None if empty."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                value = self._bucket_value(index)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Serialize the histogram to plain data (e.g. to send it between processes)."""
+        return {
+            "precision_bits": self.precision_bits,
+            "counts": [[index, count] for index, count in self.counts.items()],
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a histogram serialized with to_dict."""
+        histogram = cls(data["precision_bits"])
+        histogram.counts = {index: count for index, count in data["counts"]}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
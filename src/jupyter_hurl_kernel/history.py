@@ -0,0 +1,421 @@
+"""Local history of the cells run by the kernel, in a SQLite database."""
+
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from .magics import parse_duration
+from .report import call_status, call_total_us
+
+# Defaults of the kernel's history_* traits
+DEFAULT_MAX_SIZE = 100 * 1024 ** 2
+DEFAULT_MAX_AGE = 30 * 24 * 3600.0
+DEFAULT_MAX_BODY = 1024 ** 2
+
+# Retention is enforced every EVICT_EVERY recorded executions
+EVICT_EVERY = 50
+
+# Rows written at a time by export
+EXPORT_BATCH = 10000
+
+# Timing fields of hurl's report kept per request, in microseconds
+TIMING_FIELDS = ("name_lookup", "connect", "app_connect", "start_transfer")
+
+EXPORT_COLUMNS = (
+    "execution_id", "started", "code_hash", "exit_code", "entry", "method", "url",
+    "status", "total_us", *(f"{name}_us" for name in TIMING_FIELDS),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    code_hash TEXT NOT NULL,
+    code TEXT NOT NULL,
+    variables TEXT NOT NULL,
+    exit_code INTEGER,
+    elapsed REAL,
+    body BLOB,
+    body_size INTEGER NOT NULL,
+    truncated INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS requests (
+    execution_id INTEGER NOT NULL REFERENCES executions(id) ON DELETE CASCADE,
+    entry INTEGER NOT NULL,
+    started REAL NOT NULL,
+    method TEXT,
+    url TEXT,
+    status INTEGER,
+    total_us INTEGER,
+    name_lookup_us INTEGER,
+    connect_us INTEGER,
+    app_connect_us INTEGER,
+    start_transfer_us INTEGER
+);
+CREATE INDEX IF NOT EXISTS executions_started ON executions(started);
+CREATE INDEX IF NOT EXISTS executions_code_hash ON executions(code_hash);
+CREATE INDEX IF NOT EXISTS requests_url_started ON requests(url, started);
+CREATE INDEX IF NOT EXISTS requests_started ON requests(started);
+CREATE INDEX IF NOT EXISTS requests_execution ON requests(execution_id);
+"""
+
+
+def default_history_path():
+    """Return the per-user path of the history database."""
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "jupyter-hurl-kernel" / "history.sqlite"
+
+
+def parse_time(value, now=None):
+    """Parse a point in time: a duration ago ('1h', '30m') or an ISO date.
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    now = time.time() if now is None else now
+    try:
+        return now - parse_duration(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(
+            f"Invalid time: {value!r} (expected a duration ago such as 2h, or a date such as 2024-05-01)"
+        ) from None
+
+
+class BodyCapture:
+    """Stream sink keeping the first bytes of a response body.
+
+    Everything written is passed on to `sink`, if any, so that it can be
+    chained with the sink of the response cache.
+    """
+
+    def __init__(self, max_size, sink=None):
+        self.max_size = max_size
+        self.sink = sink
+        self.size = 0
+        self._chunks = []
+        self._kept = 0
+
+    @property
+    def data(self):
+        return b"".join(self._chunks)
+
+    def write(self, data):
+        self.size += len(data)
+        if self._kept < self.max_size:
+            chunk = data[:self.max_size - self._kept]
+            self._chunks.append(chunk)
+            self._kept += len(chunk)
+        if self.sink is not None:
+            self.sink.write(data)
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+
+class HistoryStore:
+    """Executions of cells with their requests, timings and bodies.
+
+    Bodies are stored compressed. Executions older than max_age are
+    dropped, and the oldest ones are dropped while the database is larger
+    than max_size.
+    """
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        # Must be set before the tables are created to take effect
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(_SCHEMA)
+        self._recorded = 0
+        self.evict()
+
+    def close(self):
+        self._db.close()
+
+    def record(self, code, variables, exit_code, elapsed, calls, body=b"", body_size=None,
+               started=None):
+        """Store an execution.
+
+        Args:
+            code: The cell's code
+            variables: Variables the cell used, {name: value}
+            exit_code: hurl's exit code
+            elapsed: Wall time of the run in seconds
+            calls: (entry number, call) pairs, calls shaped as in hurl's report
+            body: The output, or its first bytes
+            body_size: Size of the whole output, len(body) by default
+            started: Time of the execution, now by default
+
+        Returns:
+            int: The id of the execution
+        """
+        started = time.time() if started is None else started
+        body_size = len(body) if body_size is None else body_size
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO executions (started, code_hash, code, variables, exit_code, elapsed,"
+                " body, body_size, truncated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    started,
+                    hashlib.sha256(code.encode("utf-8")).hexdigest(),
+                    code,
+                    json.dumps(variables, sort_keys=True, default=str),
+                    exit_code,
+                    elapsed,
+                    zlib.compress(body) if body else None,
+                    body_size,
+                    int(body_size > len(body)),
+                ),
+            )
+            execution_id = cursor.lastrowid
+            self._db.executemany(
+                "INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        execution_id, entry, started,
+                        call.get("request", {}).get("method"),
+                        call.get("request", {}).get("url"),
+                        call_status(call),
+                        call_total_us(call),
+                        *(call.get("timings", {}).get(name) for name in TIMING_FIELDS),
+                    )
+                    for entry, call in calls
+                ],
+            )
+        self._recorded += 1
+        if self._recorded % EVICT_EVERY == 0:
+            self.evict()
+        return execution_id
+
+    @property
+    def size(self):
+        """Bytes used by the database, free pages excluded."""
+        page_size, = self._db.execute("PRAGMA page_size").fetchone()
+        pages, = self._db.execute("PRAGMA page_count").fetchone()
+        free, = self._db.execute("PRAGMA freelist_count").fetchone()
+        return (pages - free) * page_size
+
+    def evict(self, now=None):
+        """Drop the executions beyond the age and size limits.
+
+        Returns:
+            int: Number of executions dropped
+        """
+        now = time.time() if now is None else now
+        dropped = 0
+        with self._db:
+            if self.max_age:
+                dropped += self._db.execute(
+                    "DELETE FROM executions WHERE started < ?", (now - self.max_age,)
+                ).rowcount
+        while self.max_size and self.size > self.max_size:
+            count, = self._db.execute("SELECT COUNT(*) FROM executions").fetchone()
+            if not count:
+                break
+            with self._db:
+                dropped += self._db.execute(
+                    "DELETE FROM executions WHERE id IN "
+                    "(SELECT id FROM executions ORDER BY started LIMIT ?)",
+                    (max(1, count // 10),),
+                ).rowcount
+        if dropped:
+            self._db.execute("PRAGMA incremental_vacuum")
+        return dropped
+
+    def clear(self):
+        """Drop every execution."""
+        with self._db:
+            self._db.execute("DELETE FROM executions")
+        self._db.execute("PRAGMA incremental_vacuum")
+
+    def count(self):
+        """Return the number of executions stored."""
+        return self._db.execute("SELECT COUNT(*) FROM executions").fetchone()[0]
+
+    def executions(self, since=None, until=None, limit=20):
+        """Return the latest executions, newest first, as dicts."""
+        where, args = _time_range("started", since, until)
+        rows = self._db.execute(
+            "SELECT e.id, e.started, e.exit_code, e.elapsed, e.body_size,"
+            " (SELECT COUNT(*) FROM requests r WHERE r.execution_id = e.id),"
+            " (SELECT url FROM requests r WHERE r.execution_id = e.id ORDER BY entry LIMIT 1)"
+            f" FROM executions e {where} ORDER BY e.started DESC LIMIT ?",
+            (*args, limit),
+        )
+        keys = ("id", "started", "exit_code", "elapsed", "body_size", "requests", "url")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def requests(self, url=None, since=None, until=None, limit=50):
+        """Return the latest requests to URLs starting with url, newest first."""
+        where, args = _requests_filter(url, since, until)
+        rows = self._db.execute(
+            "SELECT execution_id, entry, started, method, url, status, total_us FROM requests"
+            f" {where} ORDER BY started DESC LIMIT ?",
+            (*args, limit),
+        )
+        keys = ("execution_id", "entry", "started", "method", "url", "status", "total_us")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def execution(self, execution_id):
+        """Return an execution with its decompressed body, or None."""
+        row = self._db.execute(
+            "SELECT id, started, code, variables, exit_code, elapsed, body, body_size, truncated"
+            " FROM executions WHERE id = ?",
+            (execution_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "started", "code", "variables", "exit_code", "elapsed", "body",
+                "body_size", "truncated")
+        execution = dict(zip(keys, row))
+        execution["variables"] = json.loads(execution["variables"])
+        execution["body"] = zlib.decompress(execution["body"]) if execution["body"] else b""
+        return execution
+
+    def _export_rows(self, url, since, until):
+        where, args = _requests_filter(url, since, until, table="r.")
+        cursor = self._db.execute(
+            "SELECT r.execution_id, r.started, e.code_hash, e.exit_code, r.entry, r.method,"
+            " r.url, r.status, r.total_us, r.name_lookup_us, r.connect_us, r.app_connect_us,"
+            " r.start_transfer_us FROM requests r JOIN executions e ON e.id = r.execution_id"
+            f" {where} ORDER BY r.started, r.execution_id, r.entry",
+            args,
+        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                return
+            yield [
+                (row[0], datetime.fromtimestamp(row[1]).isoformat(), *row[2:])
+                for row in rows
+            ]
+
+    def export(self, path, url=None, since=None, until=None):
+        """Write the requests, with their execution, to a CSV or Parquet file.
+
+        The format follows the extension of path. Parquet needs pyarrow.
+
+        Returns:
+            int: Number of rows written
+
+        Raises:
+            ValueError: If the format is not supported
+        """
+        path = Path(path)
+        suffix = path.suffix.lower()
+        written = 0
+        if suffix == ".csv":
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS)
+                for rows in self._export_rows(url, since, until):
+                    writer.writerows(rows)
+                    written += len(rows)
+            return written
+        if suffix != ".parquet":
+            raise ValueError(f"Cannot export to {path.name}: use a .csv or .parquet file")
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError(
+                "Exporting to Parquet needs pyarrow: pip install 'jupyter-hurl-kernel[parquet]'"
+            ) from None
+        writer = None
+        try:
+            for rows in self._export_rows(url, since, until):
+                table = pyarrow.Table.from_pydict(
+                    {name: list(column) for name, column in zip(EXPORT_COLUMNS, zip(*rows))}
+                )
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                written += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            # No rows: still write a file, with the columns
+            pyarrow.parquet.write_table(
+                pyarrow.Table.from_pydict({name: [] for name in EXPORT_COLUMNS}), path
+            )
+        return written
+
+
+def _time_range(column, since, until):
+    clauses, args = [], []
+    if since is not None:
+        clauses.append(f"{column} >= ?")
+        args.append(since)
+    if until is not None:
+        clauses.append(f"{column} < ?")
+        args.append(until)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+
+def _requests_filter(url, since, until, table=""):
+    where, args = _time_range(f"{table}started", since, until)
+    if url:
+        # A range on the url column uses its index, unlike LIKE
+        clause = f"{table}url >= ? AND {table}url < ?"
+        where = f"{where} AND {clause}" if where else f"WHERE {clause}"
+        args += [url, url + "\U0010ffff"]
+    return where, args
+
+
+def format_executions(executions):
+    """Render a list of executions as plain text."""
+    if not executions:
+        return "No executions recorded\n"
+    lines = []
+    for execution in executions:
+        started = datetime.fromtimestamp(execution["started"]).strftime("%Y-%m-%d %H:%M:%S")
+        elapsed = "" if execution["elapsed"] is None else f"{execution['elapsed'] * 1000:.0f} ms"
+        lines.append(
+            f"#{execution['id']:<6} {started}  exit {execution['exit_code']}  {elapsed:>9}"
+            f"  {execution['requests']} request(s)  {execution['url'] or ''}\n"
+        )
+    return "".join(lines)
+
+
+def format_requests(requests):
+    """Render a list of requests, with a latency summary, as plain text."""
+    if not requests:
+        return "No requests recorded\n"
+    lines = []
+    totals = []
+    for request in requests:
+        started = datetime.fromtimestamp(request["started"]).strftime("%Y-%m-%d %H:%M:%S")
+        total = request["total_us"]
+        if total is not None:
+            totals.append(total)
+        duration = "-" if total is None else f"{total / 1000:.1f} ms"
+        lines.append(
+            f"{started}  #{request['execution_id']:<6} {request['status'] or '-':<4}"
+            f" {duration:>10}  {request['method']} {request['url']}\n"
+        )
+    if totals:
+        totals.sort()
+        lines.append(
+            f"{len(requests)} request(s): min {totals[0] / 1000:.1f} ms,"
+            f" median {totals[len(totals) // 2] / 1000:.1f} ms,"
+            f" max {totals[-1] / 1000:.1f} ms\n"
+        )
+    return "".join(lines)
@@ -0,0 +1,806 @@
+"""In-process execution of simple Hurl cells over pooled connections.
+
+Spawning hurl for every cell also means a new connection, with its TCP and
+TLS handshakes, for every cell. The in-process engine runs a common subset
+of Hurl itself, over keep-alive connections that outlive the cells; cells
+using anything outside the subset are left to hurl (see `unsupported`).
+"""
+
+import asyncio
+import base64
+import errno
+import http.client
+import json
+import operator
+import os
+import re
+import select
+import socket
+import ssl
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+from urllib.request import getproxies_environment, proxy_bypass_environment
+
+from . import __version__
+from .streaming import ProcessInterrupted
+from .variables import format_value
+
+# What the engine runs; anything else is left to hurl
+REQUEST_SECTIONS = {'QueryStringParams', 'Query', 'FormParams', 'Form', 'BasicAuth', 'Cookies'}
+QUERIES = {'status', 'header', 'url', 'body', 'jsonpath', 'regex', 'duration', 'variable'}
+FILTERS = {'count', 'first', 'last', 'nth', 'toInt', 'toFloat', 'toString'}
+PREDICATES = {
+    '==', '!=', '>', '>=', '<', '<=', 'contains', 'startsWith', 'endsWith', 'matches',
+    'exists', 'isBoolean', 'isCollection', 'isEmpty', 'isFloat', 'isInteger', 'isList',
+    'isNumber', 'isObject', 'isString',
+}
+BODY_KINDS = {'json', 'xml', 'multiline', 'oneline', 'base64', 'hex'}
+# Language hints of multi-line strings sent as they are
+MULTILINE_HINTS = {'', 'json', 'xml'}
+# Connections are HTTP/1.1
+STATUS_VERSIONS = {'HTTP', 'HTTP/1.1'}
+
+# Idle connections kept per host
+MAX_IDLE_PER_HOST = 4
+
+_CHUNK_SIZE = 64 * 1024
+
+# How often a connection being opened checks whether the run was stopped
+_CONNECT_POLL_INTERVAL = 0.1
+
+# connect_ex results of a non-blocking connection still being opened
+_CONNECT_PENDING = {
+    errno.EINPROGRESS, errno.EALREADY, errno.EWOULDBLOCK,
+    getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK),
+}
+
+# Dotted and bracketed JSONPath steps: $.items[0]['a b']
+_JSONPATH = re.compile(r"""^\$(?:\.[A-Za-z_][\w-]*|\[\d+\]|\['[^']*'\]|\["[^"]*"\])*$""")
+_JSONPATH_STEP = re.compile(r"""\.([A-Za-z_][\w-]*)|\[(\d+)\]|\['([^']*)'\]|\["([^"]*)"\]""")
+
+_TEMPLATE = re.compile(r"\{\{(.*?)\}\}")
+_VARIABLE = re.compile(r"^\s*([A-Za-z_][\w-]*)\s*$")
+_URL_COMMENT = re.compile(r"\s+#.*$")
+
+_COMPARISONS = {
+    '>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+}
+
+# No value, e.g. a missing header or JSON member
+_NONE = object()
+
+# Retried once on a fresh connection when a reused one turns out to be closed
+_STALE_CONNECTION = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+def _literal_text(text):
+    """Decode a quoted or backticked argument, leaving other text as is."""
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        return json.loads(text)
+    if len(text) >= 2 and text[0] == text[-1] == '`':
+        return text[1:-1]
+    return text
+
+
+def _proxy_variable(url):
+    """Return the proxy variable hurl would use for a URL, or None.
+
+    hurl (through libcurl) sends requests through the proxies of the
+    environment, which the in-process engine does not do. A host given by
+    a template may need a proxy, and counts as one.
+    """
+    proxies = getproxies_environment()
+    parts = urlsplit(_URL_COMMENT.sub('', url).strip())
+    scheme = parts.scheme.lower()
+    if proxies.get(scheme):
+        name = f"{scheme}_proxy"
+    elif proxies.get('all'):
+        name = "all_proxy"
+    else:
+        return None
+    host = parts.hostname or ''
+    if '{{' not in host and host and proxy_bypass_environment(host, proxies):
+        return None
+    return name
+
+
+def unsupported(code, document, variables):
+    """Return why a cell cannot run in-process, or None if it can.
+
+    Args:
+        code: The cell's code
+        document: The parsed cell
+        variables: Names of the session variables
+    """
+    # The parser drops the lines it cannot read, e.g. an assert: only hurl
+    # can tell whether they are valid
+    if document.errors:
+        return "a cell with syntax errors"
+    if not document.entries:
+        return "the cell has no request"
+    for expression in _TEMPLATE.findall(code):
+        if not _VARIABLE.match(expression):
+            return f"template {{{{{expression.strip()}}}}}"
+    known = set(variables) | {'newUuid', 'newDate'}
+    for entry in document.entries:
+        proxy = _proxy_variable(entry.url)
+        if proxy:
+            return f"a proxy ({proxy})"
+        for section in entry.sections:
+            if section.name not in REQUEST_SECTIONS:
+                return f"[{section.name}] section"
+        body = entry.body
+        if body is not None:
+            if body.kind not in BODY_KINDS:
+                return f"{body.kind} body"
+            if body.kind == 'multiline' and '\n' in body.text:
+                hint = body.text.split('\n', 1)[0].strip()[3:].strip()
+                if hint not in MULTILINE_HINTS:
+                    return f"```{hint} body"
+        response = entry.response
+        captured = {capture.name for capture in entry.captures}
+        if response is not None:
+            if response.version not in STATUS_VERSIONS:
+                return f"{response.version} status line"
+            if response.body is not None:
+                return "response body assert"
+            for item in entry.captures + entry.asserts:
+                query = item.query
+                if query.type not in QUERIES:
+                    return f"{query.type} query"
+                if query.type == 'jsonpath' and not _JSONPATH.match(_literal_text(query.argument or '')):
+                    return f"JSONPath {query.argument}"
+                for filter_ in item.filters:
+                    if filter_.name not in FILTERS:
+                        return f"{filter_.name} filter"
+                predicate = getattr(item, 'predicate', None)
+                if predicate is not None and predicate.name not in PREDICATES:
+                    return f"{predicate.name} predicate"
+        missing = entry.variables - known - captured
+        if missing:
+            return f"undefined variable {sorted(missing)[0]}"
+        known |= captured
+    return None
+
+
+def jsonpath(document, expression):
+    """Evaluate a JSONPath of the supported subset, returning _NONE if nothing matches."""
+    value = document
+    for member, index, quoted, double_quoted in _JSONPATH_STEP.findall(expression[1:]):
+        key = member or quoted or double_quoted
+        if index:
+            if not isinstance(value, list) or int(index) >= len(value):
+                return _NONE
+            value = value[int(index)]
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            return _NONE
+    return value
+
+
+class PooledResponse:
+    """A response whose connection goes back to the pool once closed."""
+
+    def __init__(self, pool, key, connection, response):
+        self.status = response.status
+        self.version = "HTTP/1.1" if response.version == 11 else "HTTP/1.0"
+        self.headers = response.getheaders()
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._response = response
+
+    def read(self, size=_CHUNK_SIZE):
+        """Read a chunk of the body, b'' at its end."""
+        return self._response.read(size)
+
+    def close(self):
+        """Release the connection, closing it unless it can be reused."""
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool.release(self._key, self._connection)
+        else:
+            self._response.close()
+            self._connection.close()
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections shared by the cells of a kernel.
+
+    Safe to use from several threads; a connection is used by one request
+    at a time.
+    """
+
+    def __init__(self, max_idle_per_host=MAX_IDLE_PER_HOST, context=None):
+        self.max_idle_per_host = max_idle_per_host
+        self._context = context
+        self._idle = {}
+        self._lock = threading.Lock()
+        # Connections opened, and requests sent on a reused connection
+        self.opened = 0
+        self.reused = 0
+
+    def _connect(self, key, timeout):
+        scheme, host, port = key
+        if scheme == "https":
+            if self._context is None:
+                self._context = ssl.create_default_context()
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                connection = idle.pop()
+                if connection.sock is not None:
+                    connection.timeout = timeout
+                    connection.sock.settimeout(timeout)
+                    self.reused += 1
+                    return connection, True
+            self.opened += 1
+        return self._connect(key, timeout), False
+
+    def release(self, key, connection):
+        """Return an idle connection to the pool."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, url, headers, body=None, timeout=None, on_connection=None):
+        """Send a request and return its PooledResponse, before reading the body.
+
+        Args:
+            method: HTTP method
+            url: Absolute http or https URL
+            headers: (name, value) pairs
+            body: Bytes of the body, or None
+            timeout: Socket timeout in seconds
+            on_connection: Called with the connection before it is used, so
+                that another thread can close it to abort the request
+        """
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        names = {name.lower() for name, _ in headers}
+        for attempt in range(2):
+            connection, reused = self._acquire(key, timeout)
+            if on_connection is not None:
+                on_connection(connection)
+            try:
+                connection.putrequest(
+                    method, target, skip_host='host' in names, skip_accept_encoding=True
+                )
+                for name, value in headers:
+                    connection.putheader(name, value)
+                if body is not None and 'content-length' not in names:
+                    connection.putheader('Content-Length', str(len(body)))
+                connection.endheaders(body)
+                response = connection.getresponse()
+            except _STALE_CONNECTION:
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            return PooledResponse(self, key, connection, response)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class _Response:
+    """What the asserts and captures of an entry see of a response."""
+
+    def __init__(self, url, status, version, headers, body, duration_ms):
+        self.url = url
+        self.status = status
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.duration_ms = duration_ms
+        self._json = _NONE
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    @property
+    def json(self):
+        if self._json is _NONE:
+            self._json = json.loads(self.body)
+        return self._json
+
+    def header_values(self, name):
+        return [value for key, value in self.headers if key.lower() == name.lower()]
+
+
+class _Failure(Exception):
+    """An assert, capture or runtime error of an entry, at a line of the cell."""
+
+    def __init__(self, line, title, detail):
+        super().__init__(detail)
+        self.line = line
+        self.title = title
+        self.detail = detail
+
+
+def _show(value):
+    if value is _NONE:
+        return "none"
+    if isinstance(value, str):
+        return json.dumps(value)
+    return format_value(value)
+
+
+class InProcessRun:
+    """A cell run in a worker thread, with the interface of StreamingProcess.
+
+    The last response body is written to stdout (preceded by its status line
+    and headers in include mode) and errors to stderr in hurl's format, so
+    that output limits, the response cache and interrupts work the same as
+    for a hurl process. Values captured by the cell are in `captures`.
+    """
+
+    def __init__(self, pool, code, document, variables, cookies, stdout, stderr,
+                 include=False):
+        """Create a run; nothing is sent until `run` is awaited.
+
+        Args:
+            pool: The ConnectionPool to send requests with
+            code: The cell's code, for error messages
+            document: The parsed cell, accepted by `unsupported`
+            variables: Session variables, {name: value}
+            cookies: The kernel's CookieJar
+            stdout: StreamForwarder receiving the body
+            stderr: StreamForwarder receiving errors
+            include: Write the status line and headers before the body
+        """
+        self.pool = pool
+        self.document = document
+        self.variables = dict(variables)
+        self.cookies = cookies
+        self.stdout = stdout
+        self.stderr = stderr
+        self.include = include
+        self.captures = []
+        # One call per entry run, shaped like the calls of hurl's JSON report
+        self.calls = []
+        self.started_at = None
+        self.ended_at = None
+        # No process is spawned; kept for the kernel's metrics
+        self.spawn_time = None
+        self.interrupted = False
+        self._lines = code.split("\n")
+        self._timeout = None
+        self._loop = None
+        self._closed = False
+        self._connection = None
+        # Set once the run is interrupted or timed out
+        self._aborted = False
+
+    @property
+    def elapsed(self):
+        """Seconds the run has been going on (or went on, once finished)."""
+        if self.started_at is None:
+            return 0.0
+        return (self.ended_at or time.monotonic()) - self.started_at
+
+    async def run(self, timeout=None):
+        """Run the cell to completion.
+
+        Returns:
+            int: hurl's exit code for the same outcome: 0, 3 for a runtime
+                error, 4 for a failed assert or capture
+
+        Raises:
+            asyncio.TimeoutError: If the cell exceeded `timeout`
+            ProcessInterrupted: If `interrupt` was called while running
+        """
+        self._loop = asyncio.get_running_loop()
+        if self.interrupted:
+            raise ProcessInterrupted()
+        self._timeout = timeout
+        self.started_at = time.monotonic()
+        self.spawn_time = 0.0
+        worker = asyncio.ensure_future(asyncio.to_thread(self._run))
+        try:
+            done, _ = await asyncio.wait({worker}, timeout=timeout)
+            if not done:
+                self._abort()
+                raise asyncio.TimeoutError()
+            returncode = worker.result()
+            if self.interrupted:
+                raise ProcessInterrupted()
+            return returncode
+        finally:
+            self.ended_at = time.monotonic()
+            self._closed = True
+            self.stdout.close()
+            self.stderr.close()
+
+    def interrupt(self):
+        """Request the run to stop.
+
+        Safe to call from a signal handler or another thread.
+        """
+        self.interrupted = True
+        self._abort()
+
+    def _abort(self):
+        self._aborted = True
+        connection = self._connection
+        # A connection still being opened has no socket yet: it gives up on
+        # its own, see _open_socket
+        if connection is not None and connection.sock is not None:
+            try:
+                connection.sock.shutdown(2)
+            except OSError:
+                pass
+
+    def _use(self, connection):
+        self._connection = connection
+        connection._create_connection = self._open_socket
+        if self.interrupted:
+            self._abort()
+
+    def _open_socket(self, address, timeout=None, source_address=None):
+        """Open a connection like socket.create_connection, until the run is stopped.
+
+        The socket connects without blocking, so that an interrupt or the
+        cell's timeout stops a request to an unresponsive host at once.
+        """
+        host, port = address
+        deadline = None if timeout is None else time.monotonic() + timeout
+        error = OSError(f"cannot resolve {host}")
+        for family, kind, proto, _, sockaddr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+            sock = socket.socket(family, kind, proto)
+            try:
+                if source_address:
+                    sock.bind(source_address)
+                sock.setblocking(False)
+                code = sock.connect_ex(sockaddr)
+                while code in _CONNECT_PENDING:
+                    if self._aborted:
+                        raise ConnectionAbortedError("the request was stopped")
+                    wait = _CONNECT_POLL_INTERVAL
+                    if deadline is not None:
+                        wait = min(wait, deadline - time.monotonic())
+                        if wait <= 0:
+                            raise TimeoutError("timed out")
+                    _, writable, _ = select.select([], [sock], [], wait)
+                    if writable:
+                        code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if code:
+                    raise OSError(code, os.strerror(code))
+                sock.settimeout(timeout)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+                if self._aborted:
+                    raise
+        raise error
+
+    def _emit(self, forwarder, data):
+        """Feed bytes to a forwarder from the worker thread."""
+        def feed():
+            if not self._closed:
+                forwarder.feed(data)
+        self._loop.call_soon_threadsafe(feed)
+
+    def _run(self):
+        entries = self.document.entries
+        for index, entry in enumerate(entries):
+            last = index == len(entries) - 1
+            try:
+                self._run_entry(entry, last)
+            except _Failure as failure:
+                self._report(failure)
+                return 4
+            except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+                if self.interrupted:
+                    return None
+                self._report(_Failure(entry.line, "HTTP connection", str(e) or type(e).__name__))
+                return 3
+        return 0
+
+    def _run_entry(self, entry, last):
+        url = self._render(_URL_COMMENT.sub('', entry.url))
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise _Failure(entry.line, "Invalid URL", f"{url!r} is not an http(s) URL")
+        headers = [
+            ('User-Agent', f'jupyter-hurl-kernel/{__version__}'),
+            ('Accept', '*/*'),
+        ]
+        headers += [(header.key, self._render(header.value)) for header in entry.headers]
+        body, content_type = self._body(entry)
+        cookie_pairs = []
+        query = []
+        for section in entry.sections:
+            pairs = [(item.key, self._render(_literal_text(item.value))) for item in section.items]
+            if section.name in ('QueryStringParams', 'Query'):
+                query += pairs
+            elif section.name in ('FormParams', 'Form'):
+                body = urlencode(pairs).encode()
+                content_type = 'application/x-www-form-urlencoded'
+            elif section.name == 'BasicAuth':
+                for user, password in pairs:
+                    token = base64.b64encode(f"{user}:{password}".encode()).decode()
+                    headers.append(('Authorization', f'Basic {token}'))
+            elif section.name == 'Cookies':
+                cookie_pairs += [f"{name}={value}" for name, value in pairs]
+        if query:
+            url += ('&' if parts.query else '?') + urlencode(query)
+        jar_cookies = self.cookies.request_header(
+            parts.hostname, parts.path or "/", parts.scheme == "https"
+        )
+        if jar_cookies:
+            cookie_pairs.insert(0, jar_cookies)
+        if cookie_pairs:
+            headers.append(('Cookie', '; '.join(cookie_pairs)))
+        names = {name.lower() for name, _ in headers}
+        if content_type and 'content-type' not in names:
+            headers.append(('Content-Type', content_type))
+
+        # Stream the body of the last response, unless the entry examines it
+        stream = last and not any(
+            item.query.type in ('body', 'jsonpath', 'regex')
+            for item in entry.captures + entry.asserts
+        )
+        started = time.perf_counter()
+        response = self.pool.request(
+            entry.method, url, headers, body, self._timeout, on_connection=self._use
+        )
+        try:
+            if last and self.include:
+                head = f"{response.version} {response.status}\n" + "".join(
+                    f"{name}: {value}\n" for name, value in response.headers
+                )
+                self._emit(self.stdout, (head + "\n").encode())
+            chunks = []
+            while True:
+                chunk = response.read()
+                if not chunk:
+                    break
+                if stream:
+                    self._emit(self.stdout, chunk)
+                else:
+                    chunks.append(chunk)
+        finally:
+            response.close()
+        duration = time.perf_counter() - started
+        duration_ms = int(duration * 1000)
+        self.calls.append({
+            "request": {"method": entry.method, "url": url},
+            "response": {"status": response.status},
+            "timings": {"total": int(duration * 1_000_000)},
+        })
+        set_cookies = [value for name, value in response.headers if name.lower() == 'set-cookie']
+        if set_cookies:
+            self.cookies.store(parts.hostname, set_cookies)
+        result = _Response(
+            url, response.status, response.version, response.headers, b"".join(chunks), duration_ms
+        )
+        self._check(entry, result)
+        if last and not stream:
+            self._emit(self.stdout, result.body)
+
+    def _render(self, text):
+        def value(match):
+            name = match.group(1).strip()
+            if name == 'newUuid':
+                return str(uuid.uuid4())
+            if name == 'newDate':
+                return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            return format_value(self.variables[name])
+        return _TEMPLATE.sub(value, text)
+
+    def _body(self, entry):
+        """Return the bytes and default content type of an entry's body."""
+        body = entry.body
+        if body is None:
+            return None, None
+        text = body.text.strip()
+        if body.kind == 'json':
+            return self._render(text).encode(), 'application/json'
+        if body.kind == 'xml':
+            return self._render(text).encode(), 'application/xml'
+        if body.kind == 'oneline':
+            return self._render(text[1:-1]).encode(), None
+        if body.kind == 'multiline':
+            if '\n' not in text:
+                return self._render(text[3:-3]).encode(), None
+            content = text.split('\n', 1)[1]
+            return self._render(content[:content.rfind('```')]).encode(), None
+        data = text.split(',', 1)[1].rstrip(';').strip()
+        if body.kind == 'base64':
+            return base64.b64decode(data), None
+        return bytes.fromhex(data), None
+
+    def _value(self, token):
+        """The value of a predicate or filter argument."""
+        if token.startswith('/') and token.endswith('/') and len(token) > 1:
+            return re.compile(token[1:-1].replace('\\/', '/'))
+        if token.startswith('{{'):
+            name = token[2:-2].strip()
+            return self._render(token) if name in ('newUuid', 'newDate') else self.variables[name]
+        if token.startswith(('"', '`')):
+            return self._render(_literal_text(token))
+        for convert in (int, float):
+            try:
+                return convert(token)
+            except ValueError:
+                pass
+        return {'true': True, 'false': False, 'null': None}.get(token, token)
+
+    def _query(self, line, query, response):
+        kind = query.type
+        argument = self._value(query.argument) if query.argument else None
+        if kind == 'status':
+            return response.status
+        if kind == 'url':
+            return response.url
+        if kind == 'duration':
+            return response.duration_ms
+        if kind == 'body':
+            return response.text
+        if kind == 'variable':
+            return self.variables.get(argument, _NONE)
+        if kind == 'header':
+            values = response.header_values(argument)
+            return values[0] if len(values) == 1 else (values or _NONE)
+        if kind == 'regex':
+            pattern = argument if isinstance(argument, re.Pattern) else re.compile(argument)
+            match = pattern.search(response.text)
+            if match is None:
+                return _NONE
+            return match.group(1) if pattern.groups else match.group()
+        try:
+            document = response.json
+        except ValueError:
+            raise _Failure(line, "Invalid JSON", "the response body is not valid JSON")
+        return jsonpath(document, argument)
+
+    def _filter(self, line, filter_, value):
+        name = filter_.name
+        try:
+            if name == 'count':
+                return len(value)
+            if name == 'first':
+                return value[0]
+            if name == 'last':
+                return value[-1]
+            if name == 'nth':
+                return value[int(self._value(filter_.arguments[0]))]
+            if name == 'toInt':
+                return int(value)
+            if name == 'toFloat':
+                return float(value)
+            return value if isinstance(value, str) else format_value(value)
+        except (TypeError, ValueError, IndexError, KeyError):
+            raise _Failure(line, f"Filter {name}", f"invalid input {_show(value)}")
+
+    def _evaluate(self, line, item, response):
+        value = self._query(line, item.query, response)
+        for filter_ in item.filters:
+            if value is _NONE:
+                break
+            value = self._filter(line, filter_, value)
+        return value
+
+    def _check(self, entry, response):
+        """Run the implicit asserts, captures and asserts of an entry."""
+        expected = entry.response
+        if expected is None:
+            return
+        if expected.status != '*' and int(expected.status) != response.status:
+            raise _Failure(
+                entry.line + expected.line, "Assert status code",
+                f"actual value is <{response.status}>",
+            )
+        for header in expected.headers:
+            value = self._render(header.value)
+            actual = response.header_values(header.key)
+            if value not in actual:
+                raise _Failure(
+                    entry.line + header.line, "Assert header value",
+                    f"actual value is <{', '.join(actual) or 'none'}>",
+                )
+        for capture in entry.captures:
+            value = self._evaluate(entry.line + capture.line, capture, response)
+            if value is _NONE:
+                raise _Failure(entry.line + capture.line, "Capture", "the query has no value")
+            self.variables[capture.name] = value
+            self.captures.append((capture.name, value))
+        failures = []
+        for assert_ in entry.asserts:
+            line = entry.line + assert_.line
+            try:
+                actual = self._evaluate(line, assert_, response)
+            except _Failure as failure:
+                failures.append(failure)
+                continue
+            predicate = assert_.predicate
+            expected_value = self._value(predicate.value) if predicate.value is not None else None
+            if _predicate(predicate.name, actual, expected_value) == predicate.negated:
+                detail = f"actual:   {_show(actual)}\n"
+                detail += f"expected: {'not ' if predicate.negated else ''}{predicate.name}"
+                if predicate.value is not None:
+                    detail += f" {predicate.value}"
+                failures.append(_Failure(line, "Assert failure", detail))
+        for failure in failures[:-1]:
+            self._report(failure)
+        if failures:
+            raise failures[-1]
+
+    def _report(self, failure):
+        """Write an error to stderr the way hurl does."""
+        source = self._lines[failure.line - 1] if 0 < failure.line <= len(self._lines) else ""
+        width = len(str(failure.line))
+        gutter = " " * width
+        detail = "".join(f"{gutter} |   {line}\n" for line in failure.detail.split("\n"))
+        text = (
+            f"error: {failure.title}\n"
+            f"{gutter}--> line {failure.line}\n"
+            f"{gutter} |\n"
+            f"{failure.line} | {source}\n"
+            f"{detail}"
+            f"{gutter} |\n\n"
+        )
+        self._emit(self.stderr, text.encode())
+
+
+def _predicate(name, actual, expected):
+    """Return whether a predicate holds."""
+    if name == 'exists':
+        return actual is not _NONE
+    if actual is _NONE:
+        return False
+    if name in ('==', '!='):
+        # true == 1 in Python, not in Hurl
+        equal = actual == expected and isinstance(actual, bool) == isinstance(expected, bool)
+        return equal if name == '==' else not equal
+    if name in _COMPARISONS:
+        try:
+            return _COMPARISONS[name](actual, expected)
+        except TypeError:
+            return False
+    if name == 'contains':
+        try:
+            return expected in actual
+        except TypeError:
+            return False
+    if name in ('startsWith', 'endsWith'):
+        if not isinstance(actual, str) or not isinstance(expected, str):
+            return False
+        return actual.startswith(expected) if name == 'startsWith' else actual.endswith(expected)
+    if name == 'matches':
+        pattern = expected if isinstance(expected, re.Pattern) else re.compile(str(expected))
+        return isinstance(actual, str) and pattern.search(actual) is not None
+    if name == 'isEmpty':
+        return isinstance(actual, (str, list, dict)) and not actual
+    types = {
+        'isBoolean': bool, 'isString': str, 'isList': list, 'isObject': dict,
+        'isCollection': (list, dict), 'isFloat': float,
+    }
+    if name in types:
+        return isinstance(actual, types[name])
+    if name == 'isInteger':
+        return isinstance(actual, int) and not isinstance(actual, bool)
+    return isinstance(actual, (int, float)) and not isinstance(actual, bool)  # isNumber
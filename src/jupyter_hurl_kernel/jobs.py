@@ -0,0 +1,177 @@
+"""Cells run in the background with %%background."""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+
+# Output of a job kept for its display, per stream
+JOB_OUTPUT_SIZE = 64 * 1024
+
+RUNNING = "running"
+
+
+@dataclass
+class Job:
+    """A cell running (or that ran) in the background."""
+
+    number: int
+    code: str
+    display_id: str
+    started: float = field(default_factory=time.time)
+    ended: float | None = None
+    status: str = RUNNING
+    returncode: int | None = None
+    stdout: str = ""
+    stderr: str = ""
+    # The asyncio task running the job and its hurl process, once started
+    task: asyncio.Future | None = None
+    process: object = None
+
+    @property
+    def elapsed(self):
+        """Seconds the job has been running, or ran."""
+        return (self.ended or time.time()) - self.started
+
+    @property
+    def summary(self):
+        """First request line of the job's code."""
+        for line in self.code.splitlines():
+            if line.strip() and not line.lstrip().startswith(("#", "%%")):
+                return line.strip()
+        return ""
+
+    def finish(self, status, returncode=None):
+        self.status = status
+        self.returncode = returncode
+        self.ended = time.time()
+
+
+class JobTable:
+    """The background jobs of the kernel, bounded in size.
+
+    Finished jobs are forgotten, oldest first, to make room for new ones;
+    running jobs are never dropped, so a full table of running jobs refuses
+    new ones.
+    """
+
+    def __init__(self, capacity=20, max_running=4):
+        self.capacity = capacity
+        self.max_running = max_running
+        self.jobs = []
+        self._counter = 0
+        # Display ids must not collide with those of a previous kernel
+        self._prefix = f"hurl-job-{uuid.uuid4().hex[:8]}"
+
+    @property
+    def running(self):
+        """Jobs that have not finished."""
+        return [job for job in self.jobs if job.status == RUNNING]
+
+    def add(self, code):
+        """Register a new job and return it.
+
+        Raises:
+            ValueError: If max_running jobs are already running
+        """
+        if len(self.running) >= self.max_running:
+            raise ValueError(
+                f"{len(self.running)} background jobs are already running "
+                f"(at most {self.max_running}): wait for or cancel one first"
+            )
+        while len(self.jobs) >= self.capacity:
+            self.jobs.remove(next(job for job in self.jobs if job.status != RUNNING))
+        self._counter += 1
+        job = Job(self._counter, code, f"{self._prefix}-{self._counter}")
+        self.jobs.append(job)
+        return job
+
+    def find(self, words):
+        """Return the jobs selected by words: job numbers, 'all' or nothing.
+
+        Without words, the running jobs are selected.
+
+        Raises:
+            ValueError: If a word is not the number of a known job
+        """
+        if not words:
+            return self.running
+        if words == ["all"]:
+            return list(self.jobs)
+        by_number = {str(job.number): job for job in self.jobs}
+        by_number.update({f"#{job.number}": job for job in self.jobs})
+        unknown = [word for word in words if word not in by_number]
+        if unknown:
+            raise ValueError(f"Unknown job: {unknown[0]}")
+        return [by_number[word] for word in words]
+
+
+def format_job(job):
+    """Render the status of a job, with its output once finished, as plain text."""
+    started = time.strftime("%H:%M:%S", time.localtime(job.started))
+    if job.status == RUNNING:
+        text = f"[job #{job.number}] running since {started}: {job.summary}"
+    else:
+        text = f"[job #{job.number}] {job.status} after {job.elapsed:.1f}s: {job.summary}"
+        if job.returncode not in (None, 0):
+            text += f" (exit code {job.returncode})"
+    for output in (job.stdout, job.stderr):
+        if output:
+            text += "\n" + output.rstrip("\n")
+    return text
+
+
+def format_job_table(jobs):
+    """Render a list of jobs, one line each, as plain text."""
+    if not jobs:
+        return "No background jobs\n"
+    lines = [
+        f"#{job.number:<4} {job.status:<10} {job.elapsed:>8.1f}s  {job.summary}\n"
+        for job in jobs
+    ]
+    return "".join(lines)
+
+
+class JobWaiter:
+    """Waits for jobs until they finish or the kernel is interrupted.
+
+    Registered with the kernel's running processes while waiting, so that
+    an interrupt stops the wait (and not the jobs).
+    """
+
+    def __init__(self):
+        self.interrupted = False
+        self._loop = None
+        self._stop = None
+
+    async def wait(self, tasks, timeout=None):
+        """Wait for tasks to finish.
+
+        Returns:
+            bool: True if they all finished
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if self.interrupted or not tasks:
+            return not tasks
+        stop = asyncio.ensure_future(self._stop.wait())
+        deadline = None if timeout is None else self._loop.time() + timeout
+        pending = set(tasks)
+        try:
+            while pending and not stop.done():
+                remaining = None if deadline is None else deadline - self._loop.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    pending | {stop}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                pending -= done
+            return not pending
+        finally:
+            stop.cancel()
+
+    def interrupt(self):
+        """Stop waiting. Safe to call from a signal handler or another thread."""
+        self.interrupted = True
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
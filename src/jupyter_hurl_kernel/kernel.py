@@ -1,11 +1,129 @@
 """Hurl Jupyter Kernel implementation."""
 
+import asyncio
+import hashlib
+import html
+import itertools
+import json
 import re
-import subprocess
+import shutil
+import signal
+import sqlite3
 import tempfile
+import time
+import uuid
+from collections import OrderedDict
 from pathlib import Path
 
 from ipykernel.kernelbase import Kernel
+from traitlets import Bool, Enum, Float, Integer, Unicode
+
+from .assertions import TEST_OUTPUT_SIZE, collect_results, format_results
+from .baseline import (
+    DEFAULT_ALPHA,
+    DEFAULT_ITERATIONS,
+    DEFAULT_TOLERANCE,
+    DEFAULT_WARMUP,
+    BaselineStore,
+    EntryTimingParser,
+    baseline_key,
+    check,
+    default_baseline_dir,
+    format_check,
+    format_saved,
+    parse_tolerance,
+)
+from .batch import (
+    BatchOutputParser,
+    BatchQueue,
+    apply_report,
+    build_batch_command,
+    format_entry_status,
+    plan_waves,
+    write_batch_files,
+)
+from .benchmark import (
+    BenchOutputParser,
+    compare,
+    format_comparison,
+    interleaved_order,
+    split_variants,
+    write_variant_files,
+)
+from .cache import (
+    DEFAULT_TTL,
+    ResponseCache,
+    default_cache_dir,
+    make_key,
+    non_cacheable_methods,
+)
+from .completion import CompletionEngine
+from .cookies import CookieJar, ReadOnlyCookieJar
+from .foreach import REPORT_SIZE, ForEachRun, format_foreach, iter_rows, row_format
+from .history import (
+    DEFAULT_MAX_AGE,
+    DEFAULT_MAX_BODY,
+    DEFAULT_MAX_SIZE,
+    BodyCapture,
+    HistoryStore,
+    default_history_path,
+    format_executions,
+    format_requests,
+    parse_time,
+)
+from .inprocess import ConnectionPool, InProcessRun, unsupported
+from .jobs import (
+    JOB_OUTPUT_SIZE,
+    RUNNING,
+    JobTable,
+    JobWaiter,
+    format_job,
+    format_job_table,
+)
+from .loadgen import LoadTest, default_workers, format_summary, plan_workers
+from .magics import parse_duration, parse_magic_args, parse_size
+from .metrics import CellMetrics, MetricsRecorder, MetricsServer, format_stats
+from .parser import (
+    FILTER_ARGS,
+    PREDICATE_ARGS,
+    QUERY_ARGS,
+    HurlParser,
+    format_errors,
+    parse_hurl_errors,
+)
+from .probe import BackgroundProbe
+from .rendering import DEFAULT_MAX_SIZE as RICH_MAX_SIZE
+from .rendering import DEFAULT_PAGE_SIZE, RichOutput
+from .report import call_status, call_total_us, iter_calls, iter_captures, read_report
+from .streaming import (
+    KILL_GRACE_PERIOD,
+    READ_CHUNK_SIZE,
+    STDERR_TAIL_SIZE,
+    OutputLimiter,
+    ProcessInterrupted,
+    StreamForwarder,
+    StreamingProcess,
+)
+from .timing import collect_timings, format_timings
+from .variables import (
+    VariableStore,
+    format_value,
+)
+from .watch import WATCH_OUTPUT_SIZE, Watch, format_watch, parse_watch_args
+
+_MAGIC_NAME = re.compile(r"([A-Za-z][\w-]*)\s*(?:=|\s|$)(.*)")
+
+# Seconds hurlfmt gets to confirm the syntax errors of a cell
+_HURLFMT_TIMEOUT = 5
+
+# hurlfmt verdicts kept, so that re-running a cell does not run it again
+_SYNTAX_VERDICTS = 256
+
+# Seconds a shutdown waits for the running cells and jobs to stop
+_SHUTDOWN_TIMEOUT = 5
+
+# Magics running a command of the kernel instead of the cell's requests
+_COMMAND_MAGICS = ('stats', 'vars', 'cookies', 'bench', 'load', 'batch', 'background', 'watch', 'foreach', 'history', 'baseline')
 
 
 class HurlKernel(Kernel):
@@ -24,41 +142,269 @@ class HurlKernel(Kernel):
     }
     banner = "Hurl kernel - Execute HTTP requests with Hurl"
 
+    timeout = Float(
+        30.0,
+        help="Wall-clock limit in seconds for a cell, 0 to disable. "
+        "Override per cell with %%timeout=N.",
+    ).tag(config=True)
+
+    max_output = Integer(
+        5 * 1024 * 1024,
+        help="Maximum number of output bytes forwarded to the frontend per cell, "
+        "0 to disable. Override per cell with %%max-output=SIZE.",
+    ).tag(config=True)
+
+    overflow = Enum(
+        ["truncate", "spill"],
+        default_value="truncate",
+        help="What to do with output beyond max_output: 'truncate' keeps a "
+        "head/tail preview, 'spill' writes the rest to a file. "
+        "Override per cell with %%overflow=MODE.",
+    ).tag(config=True)
+
+    spill_dir = Unicode(
+        "",
+        help="Directory receiving spilled output, defaults to the system "
+        "temporary directory.",
+    ).tag(config=True)
+
+    rich_output = Bool(
+        True,
+        help="Render JSON, XML and HTML response bodies as rich output (a "
+        "collapsible JSON tree, indented XML, a sandboxed HTML preview) "
+        "instead of text. Override per cell with %%rich on|off.",
+    ).tag(config=True)
+
+    rich_max_size = Integer(
+        RICH_MAX_SIZE,
+        help="Largest response body, in characters, held back to be rendered; "
+        "larger ones are streamed as text. The cell's max_output caps it too.",
+    ).tag(config=True)
+
+    rich_page_size = Integer(
+        DEFAULT_PAGE_SIZE,
+        help="Characters of a rendered body sent to the frontend; only the "
+        "first page of larger bodies is shown, and the whole body is written "
+        "to a file in spill_dir.",
+    ).tag(config=True)
+
+    cache_ttl = Float(
+        0.0,
+        help="Cache the result of every idempotent cell for this many seconds, "
+        "0 to only cache cells marked with %%cache ttl=N.",
+    ).tag(config=True)
+
+    cache_dir = Unicode(
+        "",
+        help="Directory of the response cache, defaults to "
+        "~/.cache/jupyter-hurl-kernel/responses.",
+    ).tag(config=True)
+
+    cache_max_size = Integer(
+        256 * 1024 * 1024,
+        help="Maximum size in bytes of the response cache; least recently "
+        "used entries are evicted beyond it.",
+    ).tag(config=True)
+
+    baseline_dir = Unicode(
+        "",
+        help="Directory of the latency baselines saved with %%baseline save, "
+        "defaults to ~/.local/share/jupyter-hurl-kernel/baselines.",
+    ).tag(config=True)
+
+    history = Bool(
+        False,
+        help="Record every cell run in a local SQLite database, with its "
+        "variables, exit code, request timings and compressed output. "
+        "Toggle per session with %%history on|off.",
+    ).tag(config=True)
+
+    history_path = Unicode(
+        "",
+        help="Path of the history database, defaults to "
+        "~/.local/share/jupyter-hurl-kernel/history.sqlite.",
+    ).tag(config=True)
+
+    history_max_size = Integer(
+        DEFAULT_MAX_SIZE,
+        help="Maximum size in bytes of the history; oldest executions are "
+        "dropped beyond it.",
+    ).tag(config=True)
+
+    history_max_age = Float(
+        DEFAULT_MAX_AGE,
+        help="Seconds executions are kept in the history, 0 to keep them "
+        "until the size limit is reached.",
+    ).tag(config=True)
+
+    history_max_body = Integer(
+        DEFAULT_MAX_BODY,
+        help="Bytes of each cell's output stored in the history.",
+    ).tag(config=True)
+
+    engine = Enum(
+        ["hurl", "inprocess"],
+        default_value="hurl",
+        help="What runs cells: 'hurl' spawns hurl for every cell, 'inprocess' "
+        "runs simple cells in the kernel over connections kept open across "
+        "cells, and leaves the others to hurl. Override per cell with %%engine=NAME.",
+    ).tag(config=True)
+
+    preflight = Bool(
+        True,
+        help="Check the syntax of a cell before running it. A cell is not run "
+        "if hurlfmt confirms its errors; without hurlfmt they are only "
+        "reported as warnings. Disable per cell with %%preflight off.",
+    ).tag(config=True)
+
+    max_background_jobs = Integer(
+        4,
+        help="Number of %%background jobs that can run at the same time.",
+    ).tag(config=True)
+
+    metrics_buffer_size = Integer(
+        1000,
+        help="Number of recent cells whose execution metrics are kept for %%stats.",
+    ).tag(config=True)
+
+    metrics_log = Unicode(
+        "",
+        help="File receiving the metrics of every cell as JSON lines, empty to disable.",
+    ).tag(config=True)
+
+    metrics_port = Integer(
+        0,
+        help="Serve the metrics in Prometheus format on http://127.0.0.1:PORT/metrics, "
+        "0 to disable.",
+    ).tag(config=True)
+
     def __init__(self, **kwargs):
         """Initialize the kernel."""
         super().__init__(**kwargs)
-        self._check_hurl_installation()
+        # hurl processes currently running, stopped on interrupt or shutdown
+        self._processes = set()
+        # Cells queued with %%batch, run together by %%batch run
+        self._batch = BatchQueue()
+        # Variables captured by previous cells, passed to every execution
+        self._variables = VariableStore()
+        # Cookies shared by every cell
+        self._cookies = CookieJar()
+        # Cells started with %%background, with their hurl processes
+        self._jobs = JobTable(max_running=self.max_background_jobs)
+        # Created on first use, so that the cache traits can be configured
+        self._response_cache = None
+        self._connection_pool = None
+        self._history_store = None
+        # Probing hurl can be slow on shared filesystems: do not hold up start-up
+        self._probe = BackgroundProbe()
+        # Parsed cells, shared by execution, completion and inspection
+        self._parser = HurlParser()
+        # hurlfmt's (rejected, message) for the cells the parser rejects, by hash
+        self._syntax_verdicts = OrderedDict()
+        # Completion indexes, extended with the URLs and captures of executed cells
+        self._completer = CompletionEngine(self._parser)
+        # Execution metrics of recent cells, and those of the running cell
+        self._metrics = MetricsRecorder(self.metrics_buffer_size, self.metrics_log or None)
+        self._cell_metrics = None
+        self._metrics_server = None
+        # The event loop running cells and jobs, see do_shutdown
+        self._shell_loop = None
+        if self.metrics_port:
+            try:
+                self._metrics_server = MetricsServer(self._metrics, self.metrics_port)
+            except OSError as e:
+                self.log.warning("Cannot serve metrics on port %s: %s", self.metrics_port, e)
 
-    def _check_hurl_installation(self):
-        """Check if hurl is installed and available."""
-        try:
-            result = subprocess.run(
-                ["hurl", "--version"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
-            if result.returncode == 0:
-                self.hurl_version = result.stdout.strip()
-            else:
-                self.hurl_version = "unknown"
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            self.hurl_version = None
+    def pre_handler_hook(self):
+        """Route SIGINT to running hurl processes while a message is handled."""
+        self.saved_sigint_handler = signal.signal(signal.SIGINT, self._handle_sigint)
+
+    def _handle_sigint(self, signum, frame):
+        """Stop running hurl processes, or behave like the default handler."""
+        if not self._processes:
+            raise KeyboardInterrupt
+        self._interrupt_processes()
+
+    def _interrupt_processes(self):
+        """Ask every running hurl process to stop."""
+        for process in list(self._processes):
+            process.interrupt()
+
+    async def do_shutdown(self, restart):
+        """Stop running hurl processes and jobs before the kernel exits.
+
+        On ipykernel 7 this runs on the control thread, while cells and
+        jobs run on the shell's event loop: they are stopped from there.
+        """
+        loop = self._shell_loop
+        if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+            stopped = asyncio.run_coroutine_threadsafe(self._stop_running(), loop)
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(stopped), _SHUTDOWN_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.log.warning("Jobs still running after %ss, shutting down", _SHUTDOWN_TIMEOUT)
+        else:
+            await self._stop_running()
+        self._cookies.close()
+        if self._connection_pool is not None:
+            self._connection_pool.close()
+        if self._history_store is not None:
+            self._history_store.close()
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+        return {"status": "ok", "restart": restart}
+
+    async def _stop_running(self):
+        """Stop the running processes and jobs, and wait for them to wind down."""
+        self._interrupt_processes()
+        tasks = []
+        for job in self._jobs.running:
+            self._cancel_job(job)
+            if job.task is not None:
+                tasks.append(job.task)
+        deadline = time.monotonic() + 2 * KILL_GRACE_PERIOD
+        if tasks:
+            await asyncio.wait(tasks, timeout=2 * KILL_GRACE_PERIOD)
+        while self._processes and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
+    @property
+    def hurl_info(self):
+        """The installed hurl binary and the options it supports."""
+        return self._probe.result()
+
+    @property
+    def hurl_version(self):
+        """Version string of hurl, or None if it is not installed."""
+        return self.hurl_info.version
+
+    def _unsupported(self, option, purpose, silent):
+        """Build an error reply if hurl lacks an option, or return None."""
+        if self.hurl_info.supports(option):
+            return None
+        error_message = (
+            f"Error: {purpose} requires a hurl supporting {option} "
+            f"(installed: {self.hurl_version})\n"
+        )
+        return self._error_reply("HurlUnsupported", error_message.strip(), error_message, silent)
 
     def _parse_magic_line(self, code):
-        """Parse magic line (%%include, %%verbose, or %%output=filename) from code.
+        """Parse magic lines (%%include, %%verbose, %%output=filename, ...) from code.
 
         Args:
             code: The code to parse
 
         Returns:
-            tuple: (hurl_code, mode, output_file) where:
-                - mode is 'normal', 'include', or 'verbose'
+            tuple: (hurl_code, mode, output_file, options) where:
+                - mode is 'normal', 'include', 'verbose', 'timing' or 'test'
                 - output_file is the filename from %%output=filename or None
+                - options maps every other magic name (lowercase) to its
+                  argument string, e.g. {'timeout': '60'} for %%timeout=60
         """
         lines = code.split('\n')
         mode = 'normal'
         output_file = None
+        options = {}
         hurl_code_lines = []
 
         for line in lines:
@@ -71,15 +417,296 @@ class HurlKernel(Kernel):
                     mode = 'include'
                 elif magic_lower == 'verbose':
                     mode = 'verbose'
+                elif magic_lower == 'timing':
+                    mode = 'timing'
+                elif magic_lower == 'test':
+                    mode = 'test'
                 elif magic_lower.startswith('output='):
                     # Extract filename from %%output=filename
                     output_file = magic[7:].strip()  # Remove 'output=' prefix
+                else:
+                    # Generic %%name, %%name=value or %%name arguments
+                    match = _MAGIC_NAME.match(magic)
+                    if match:
+                        options[match.group(1).lower()] = match.group(2).strip()
             else:
                 hurl_code_lines.append(line)
 
-        return '\n'.join(hurl_code_lines), mode, output_file
+        return '\n'.join(hurl_code_lines), mode, output_file, options
+
+    def _resolve_limits(self, options):
+        """Combine the configured resource limits with per-cell magics.
+
+        Args:
+            options: Magic options returned by _parse_magic_line
+
+        Returns:
+            tuple: (timeout, max_output, overflow) with timeout None if disabled
+
+        Raises:
+            ValueError: If a magic value is invalid
+        """
+        timeout = self.timeout
+        if 'timeout' in options:
+            timeout = parse_duration(options['timeout'])
+        max_output = self.max_output
+        if 'max-output' in options:
+            max_output = parse_size(options['max-output'])
+        overflow = options.get('overflow', self.overflow).lower()
+        if overflow not in ('truncate', 'spill'):
+            raise ValueError(
+                f"Invalid overflow mode: {overflow!r} (expected truncate or spill)"
+            )
+        return (timeout or None), max_output, overflow
+
+    def _resolve_cache_ttl(self, options):
+        """Return the time to live of the cell's cached result, or None.
+
+        Raises:
+            ValueError: If the %%cache magic is invalid
+        """
+        if 'cache' not in options:
+            return self.cache_ttl or None
+        words, params = parse_magic_args(options['cache'])
+        if words and words[0].lower() == 'off':
+            return None
+        if 'ttl' in params:
+            return parse_duration(params['ttl']) or None
+        return self.cache_ttl or DEFAULT_TTL
 
-    def do_execute(
+    def _resolve_rich(self, options, mode, output_file):
+        """Return whether the body of the cell is rendered as rich output.
+
+        Raises:
+            ValueError: If the %%rich magic is invalid
+        """
+        rich = options.get('rich', '').strip().lower()
+        if rich not in ('', 'on', 'off'):
+            raise ValueError(f"Invalid %%rich argument: {rich!r} (expected on or off)")
+        enabled = rich == 'on' if rich else self.rich_output
+        # --include puts the headers before the body, and --output takes it away
+        return enabled and mode in ('normal', 'verbose') and not output_file
+
+    def _rich_output(self, send, max_output):
+        """Wrap a send callable to render the response body of a cell.
+
+        No more of the body is held in memory than the output limit would
+        forward.
+        """
+        max_size = min(self.rich_max_size, max_output) if max_output > 0 else self.rich_max_size
+        return RichOutput(
+            send,
+            lambda data, metadata: self._send_display(data, metadata=metadata),
+            max_size, self.rich_page_size, self.spill_dir,
+        )
+
+    def _finish_output(self, rich, limiter):
+        """Render the held-back body and send the notices of the output limits."""
+        if rich is not None:
+            notice = rich.finish()
+            if notice:
+                self._send_overflow_notice(notice, rich.spill_path)
+        notice = limiter.finish()
+        if notice:
+            self._send_overflow_notice(notice, limiter.spill_path)
+
+    def _resolve_engine(self, options):
+        """Return the engine running the cell, 'hurl' or 'inprocess'.
+
+        Raises:
+            ValueError: If the %%engine magic is invalid
+        """
+        engine = options.get('engine', self.engine).strip().lower() or self.engine
+        if engine not in ('hurl', 'inprocess'):
+            raise ValueError(f"Invalid engine: {engine!r} (expected hurl or inprocess)")
+        return engine
+
+    @property
+    def connection_pool(self):
+        """Connections of the in-process engine, kept open across cells."""
+        if self._connection_pool is None:
+            self._connection_pool = ConnectionPool()
+        return self._connection_pool
+
+    @property
+    def history_store(self):
+        """The history database, opened on first use."""
+        if self._history_store is None:
+            self._history_store = HistoryStore(
+                self.history_path or default_history_path(),
+                self.history_max_size, self.history_max_age,
+            )
+        return self._history_store
+
+    @property
+    def response_cache(self):
+        """The on-disk response cache."""
+        if self._response_cache is None:
+            self._response_cache = ResponseCache(
+                self.cache_dir or default_cache_dir(), self.cache_max_size
+            )
+        return self._response_cache
+
+    def _send_stream(self, name, text):
+        """Send a chunk of text to the frontend as a stream message."""
+        started = time.perf_counter()
+        self.send_response(
+            self.iopub_socket,
+            "stream",
+            {"name": name, "text": text},
+        )
+        if self._cell_metrics is not None:
+            self._cell_metrics.add("send", time.perf_counter() - started)
+
+    def _ok_reply(self):
+        """Build a successful execute reply."""
+        return {
+            "status": "ok",
+            "execution_count": self.execution_count,
+            "payload": [],
+            "user_expressions": {},
+        }
+
+    def _error_reply(self, ename, evalue, error_message, silent):
+        """Report an error to the frontend and build the matching execute reply."""
+        if not silent:
+            self._send_stream("stderr", error_message)
+        return {
+            "status": "error",
+            "execution_count": self.execution_count,
+            "ename": ename,
+            "evalue": evalue,
+            "traceback": [error_message],
+        }
+
+    async def _confirm_syntax_errors(self, code):
+        """Ask hurlfmt whether a cell the parser rejects is invalid.
+
+        The parser does not know the whole Hurl grammar, so only hurl's own
+        parser decides whether a cell is run. Its verdicts are cached by the
+        hash of the cell.
+
+        Returns:
+            tuple: (rejected, message) with rejected True if hurlfmt rejects
+                the cell, False if it accepts it, None if hurlfmt is not
+                installed or did not answer; message is hurlfmt's error
+        """
+        hurlfmt = shutil.which("hurlfmt")
+        if hurlfmt is None:
+            return None, ""
+        # Magic lines become comments, to keep the line numbers of the errors
+        source = "\n".join(
+            "#" if line.lstrip().startswith("%%") else line for line in code.split("\n")
+        )
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        verdict = self._syntax_verdicts.get(key)
+        if verdict is None:
+            verdict = await self._run_hurlfmt(hurlfmt, source)
+            if verdict[0] is None:
+                return verdict
+            self._syntax_verdicts[key] = verdict
+            while len(self._syntax_verdicts) > _SYNTAX_VERDICTS:
+                self._syntax_verdicts.popitem(last=False)
+        self._syntax_verdicts.move_to_end(key)
+        return verdict
+
+    async def _run_hurlfmt(self, hurlfmt, source):
+        """Run hurlfmt on a cell, see _confirm_syntax_errors."""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                hurlfmt, "--no-color", "--out", "json",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError:
+            return None, ""
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(source.encode("utf-8")), _HURLFMT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return None, ""
+        return process.returncode != 0, stderr.decode("utf-8", errors="replace")
+
+    def _preflight_warning(self, code, errors):
+        """Report syntax errors no hurlfmt could confirm; the cell still runs."""
+        self._send_stream(
+            "stderr",
+            f"Warning: {len(errors)} possible syntax error(s), running the cell anyway\n"
+            + "\n".join(format_errors(code, errors)) + "\n",
+        )
+
+    def _preflight_error(self, code, errors, message, silent):
+        """Report the syntax errors of a cell that was not run.
+
+        Args:
+            code: The cell
+            errors: The parser's errors, sent as diagnostics only if
+                hurlfmt's output gives no location
+            message: hurlfmt's error output, shown to the user
+            silent: If True, don't send output to the client
+        """
+        errors = parse_hurl_errors(message) or errors
+        diagnostics = format_errors(code, errors)
+        summary = f"{len(errors)} syntax error(s), the cell was not run"
+        if not silent:
+            self._send_stream("stderr", f"Error: {summary}\n{message.rstrip()}\n")
+            self._send_display({
+                "text/plain": summary,
+                "application/json": {
+                    "diagnostics": [
+                        {
+                            "line": error.line,
+                            "column": error.column,
+                            "message": error.message,
+                            "severity": "error",
+                        }
+                        for error in errors
+                    ]
+                },
+            })
+        return {
+            "status": "error",
+            "execution_count": self.execution_count,
+            "ename": "HurlSyntaxError",
+            "evalue": summary,
+            "traceback": [message] if message.strip() else diagnostics,
+        }
+
+    def _send_display(self, data, display_id=None, update=False, metadata=None):
+        """Send (or update in place) a display_data message."""
+        started = time.perf_counter()
+        content = {"data": data, "metadata": metadata or {}}
+        if display_id is not None:
+            content["transient"] = {"display_id": display_id}
+        self.send_response(
+            self.iopub_socket,
+            "update_display_data" if update else "display_data",
+            content,
+        )
+        if self._cell_metrics is not None:
+            self._cell_metrics.add("send", time.perf_counter() - started)
+
+    def _send_overflow_notice(self, notice, spill_path):
+        """Tell the user that output was truncated, linking the spill file if any."""
+        data = {"text/plain": notice}
+        if spill_path:
+            path = Path(spill_path)
+            try:
+                # Relative links are opened by the notebook's file browser
+                href = path.relative_to(Path.cwd()).as_posix()
+                data["text/html"] = (
+                    f"<pre>{html.escape(notice)}</pre>"
+                    f'<a href="{html.escape(href)}" target="_blank">Open {html.escape(path.name)}</a>'
+                )
+            except ValueError:
+                pass  # Outside the notebook directory, the path is all we can give
+        self._send_display(data)
+
+    async def do_execute(
         self,
         code,
         silent,
@@ -99,13 +726,25 @@ class HurlKernel(Kernel):
         Returns:
             dict: Execution result
         """
+        self._shell_loop = asyncio.get_running_loop()
         if not code.strip():
-            return {
-                "status": "ok",
-                "execution_count": self.execution_count,
-                "payload": [],
-                "user_expressions": {},
-            }
+            return self._ok_reply()
+
+        metrics = self._cell_metrics = CellMetrics()
+        started = time.perf_counter()
+        reply = None
+        try:
+            reply = await self._execute_cell(code, silent)
+            return reply
+        finally:
+            metrics.add("total", time.perf_counter() - started)
+            metrics.status = reply["status"] if reply else "error"
+            self._cell_metrics = None
+            self._metrics.record(metrics)
+
+    async def _execute_cell(self, code, silent):
+        """Execute a non-empty cell, recording its metrics in self._cell_metrics."""
+        metrics = self._cell_metrics
 
         # Check if hurl is installed
         if self.hurl_version is None:
@@ -113,223 +752,1473 @@ class HurlKernel(Kernel):
                 "Error: hurl is not installed or not found in PATH.\n"
                 "Please install hurl from https://hurl.dev/docs/installation.html"
             )
-            if not silent:
-                self.send_response(
-                    self.iopub_socket,
-                    "stream",
-                    {"name": "stderr", "text": error_message},
-                )
-            return {
-                "status": "error",
-                "execution_count": self.execution_count,
-                "ename": "HurlNotFound",
-                "evalue": "hurl is not installed",
-                "traceback": [error_message],
-            }
+            return self._error_reply(
+                "HurlNotFound", "hurl is not installed", error_message, silent
+            )
 
         # Parse magic lines and get hurl code
-        hurl_code, mode, output_file = self._parse_magic_line(code)
+        started = time.perf_counter()
+        hurl_code, mode, output_file, options = self._parse_magic_line(code)
+
+        try:
+            timeout, max_output, overflow = self._resolve_limits(options)
+            cache_ttl = self._resolve_cache_ttl(options)
+            engine = self._resolve_engine(options)
+            rich = self._resolve_rich(options, mode, output_file)
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+        # Magic lines are ignored by the parser: parse the whole cell, which
+        # do_complete and do_is_complete have usually parsed already
+        document = self._parser.parse(code)
+        metrics.add("parse", time.perf_counter() - started)
+        self._completer.learn(document)
+        metrics.kind = next(
+            (name for name in _COMMAND_MAGICS if name in options), mode
+        )
+
+        # Reject malformed cells before anything reaches hurl or the network,
+        # and before a batch queues them
+        if document.errors and self.preflight and options.get('preflight', '').lower() != 'off':
+            rejected, message = await self._confirm_syntax_errors(code)
+            if rejected:
+                return self._preflight_error(code, document.errors, message, silent)
+            if rejected is None and not silent:
+                self._preflight_warning(code, document.errors)
+
+        if 'stats' in options:
+            return self._execute_stats(options['stats'], silent)
+
+        cache_command = options.get('cache', '').strip().lower()
+        if cache_command in ('stats', 'clear'):
+            return self._execute_cache(cache_command, silent)
+
+        if 'vars' in options:
+            return self._execute_vars(options['vars'], silent)
+
+        if 'history' in options:
+            return self._execute_history(options['history'], silent)
+
+        if 'cookies' in options:
+            return self._execute_cookies(options['cookies'], silent)
+
+        if 'bench' in options:
+            return await self._execute_bench(
+                hurl_code, options['bench'],
+                timeout if 'timeout' in options else None, silent,
+            )
+
+        if 'load' in options:
+            return await self._execute_load(hurl_code, options['load'], silent)
+
+        if 'baseline' in options:
+            return await self._execute_baseline(
+                hurl_code, options['baseline'],
+                timeout if 'timeout' in options else None, silent,
+            )
+
+        if 'foreach' in options:
+            return await self._execute_foreach(
+                code, hurl_code, document, options['foreach'], engine, timeout, silent
+            )
+
+        watch = None
+        if 'watch' in options:
+            try:
+                watch = Watch(code, hurl_code, parse_watch_args(options['watch']))
+            except ValueError as e:
+                return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+            if not hurl_code.strip():
+                return self._ok_reply()
+
+        if 'background' in options:
+            if watch is not None:
+                return self._start_watch_job(watch, document, engine, timeout, silent)
+            return await self._execute_background(
+                hurl_code, document, options['background'],
+                timeout if 'timeout' in options else None, silent,
+            )
+
+        if watch is not None:
+            return await self._execute_watch(watch, document, engine, timeout, silent)
+
+        if 'batch' in options:
+            return await self._execute_batch(
+                hurl_code, document, options['batch'], timeout, silent
+            )
 
         if not hurl_code.strip():
-            return {
-                "status": "ok",
-                "execution_count": self.execution_count,
-                "payload": [],
-                "user_expressions": {},
-            }
+            return self._ok_reply()
+
+        if mode in ('timing', 'test'):
+            error = self._unsupported("--report-json", f"%%{mode}", silent)
+            if error:
+                return error
 
-        # Create a temporary file to store the Hurl code
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".hurl", delete=False
-        ) as f:
-            f.write(hurl_code)
-            hurl_file = f.name
+        # Replay a cached result if there is one
+        cache_key = None
+        # Replaying a cached result would report stale timings
+        if cache_ttl and mode not in ('timing', 'test'):
+            unsafe = non_cacheable_methods(document.methods)
+            if output_file or unsafe:
+                if not silent:
+                    reason = f"uses {', '.join(unsafe)}" if unsafe else "writes to a file"
+                    self._send_stream("stderr", f"(not cached: the cell {reason})\n")
+            else:
+                variables = self._variables.as_dict(document.variables)
+                cache_key = make_key(hurl_code, variables, [mode])
+                entry = self.response_cache.lookup(cache_key)
+                if entry is not None:
+                    return self._replay_cached(entry, silent, max_output, overflow, rich)
+
+        # Simple cells can run in-process, over the kernel's pooled connections
+        in_process = engine == 'inprocess'
+        if in_process:
+            if mode not in ('normal', 'include'):
+                reason = f"%%{mode}"
+            elif output_file:
+                reason = "%%output"
+            else:
+                reason = unsupported(code, document, [name for name, _ in self._variables.items()])
+            if reason:
+                in_process = False
+                if 'engine' in options and not silent:
+                    self._send_stream(
+                        "stderr", f"(run by hurl: {reason} is not supported in-process)\n"
+                    )
+
+        started = time.perf_counter()
+        workdir = None
+        report_dir = None
+        cache_writer = None
+        process = None
+        body = None
 
         try:
-            # Build hurl command based on mode
-            cmd = ["hurl", "--color", hurl_file]
-
-            if mode == 'include':
-                # --include shows response headers and body
-                cmd.insert(1, "--include")
-            elif mode == 'verbose':
-                # --verbose shows all information (request, response, headers, timing, etc.)
-                cmd.insert(1, "--verbose")
-
-            # Add output file option if specified
-            if output_file:
-                cmd.extend(["--output", output_file])
-
-            # Execute hurl command
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
-
-            # Send stdout to the client
-            if result.stdout and not silent:
-                self.send_response(
-                    self.iopub_socket,
-                    "stream",
-                    {"name": "stdout", "text": result.stdout},
+            if not in_process:
+                # Create a temporary directory for the Hurl code and hurl's report
+                workdir = Path(tempfile.mkdtemp(prefix="hurl-"))
+                hurl_file = workdir / "cell.hurl"
+                hurl_file.write_text(hurl_code)
+
+                # Build hurl command based on mode
+                cmd = ["hurl", "--color", str(hurl_file)]
+
+                if mode == 'include':
+                    # --include shows response headers and body
+                    cmd.insert(1, "--include")
+                elif mode == 'verbose':
+                    # --verbose shows all information (request, response, headers, timing, etc.)
+                    cmd.insert(1, "--verbose")
+                elif mode == 'test':
+                    # --test runs the asserts without printing the bodies
+                    cmd.insert(1, "--test")
+
+                # Add output file option if specified
+                if output_file:
+                    cmd.extend(["--output", output_file])
+
+                # Pass the session variables, and collect captures if there are any
+                cmd.extend(self._variables.command_args(workdir / "variables.env"))
+                cmd.extend(self._cookies.command_args())
+                # The history keeps the timings of every request
+                needs_report = document.has_captures or mode in ('timing', 'test')
+                if needs_report or self.history:
+                    if self.hurl_info.supports("--report-json"):
+                        report_dir = workdir / "report"
+                        cmd.extend(["--report-json", str(report_dir)])
+                    elif needs_report and not silent:
+                        self._send_stream(
+                            "stderr",
+                            "(captures are not kept: this hurl does not support --report-json)\n",
+                        )
+            metrics.add("write", time.perf_counter() - started)
+
+            # Execute hurl command, forwarding output as it arrives
+            limiter = None
+            rich_output = None
+            send = None
+            # %%test sends a summary of the report instead of hurl's output
+            if not silent and mode != 'test':
+                limiter = OutputLimiter(
+                    self._send_stream, max_output, overflow, self.spill_dir
                 )
+                send = limiter
+                if rich:
+                    send = rich_output = self._rich_output(limiter, max_output)
+            sinks = {}
+            if cache_key is not None:
+                cache_writer = self.response_cache.writer(cache_key)
+                sinks = cache_writer.sinks
+            stdout_sink = sinks.get("stdout")
+            if self.history:
+                stdout_sink = body = BodyCapture(self.history_max_body, stdout_sink)
+            stdout = StreamForwarder("stdout", send, sink=stdout_sink)
+            stderr = StreamForwarder(
+                "stderr", send, tail_size=TEST_OUTPUT_SIZE if mode == 'test' else STDERR_TAIL_SIZE,
+                sink=sinks.get("stderr"),
+            )
+            if in_process:
+                process = InProcessRun(
+                    self.connection_pool, code, document, self._variables.as_dict(),
+                    self._cookies, stdout, stderr, include=(mode == 'include'),
+                )
+            else:
+                process = StreamingProcess(cmd, stdout, stderr)
+            self._processes.add(process)
+            try:
+                returncode = await process.run(timeout=timeout)
+            finally:
+                self._processes.discard(process)
+                if limiter is not None:
+                    self._finish_output(rich_output, limiter)
 
-            # Send stderr to the client
-            if result.stderr and not silent:
-                self.send_response(
-                    self.iopub_socket,
-                    "stream",
-                    {"name": "stderr", "text": result.stderr},
+            self._cookies.apply_scope()
+            if self.history:
+                self._record_history(code, document, returncode, process, report_dir, body, silent)
+            captures = []
+            if in_process:
+                captures = process.captures
+                self._variables.update_from_report(captures)
+            elif report_dir is not None:
+                captures = self._collect_captures(report_dir)
+            if mode == 'timing' and not silent:
+                self._send_timings(report_dir)
+            if mode == 'test':
+                return self._test_reply(
+                    document, report_dir, returncode, stderr.tail, process.elapsed, silent
                 )
+            if cache_writer is not None and returncode == 0:
+                cache_writer.commit(returncode, captures, cache_ttl)
+                cache_writer = None
 
             # If output file was written, notify the user
-            if output_file and result.returncode == 0 and not silent:
+            if output_file and returncode == 0 and not silent:
                 try:
                     output_path = Path(output_file)
                     if output_path.exists():
                         file_size = output_path.stat().st_size
                         message = f"\nOutput written to: {output_path.absolute()} ({file_size} bytes)\n"
-                        self.send_response(
-                            self.iopub_socket,
-                            "stream",
-                            {"name": "stdout", "text": message},
-                        )
+                        self._send_stream("stdout", message)
                 except Exception:
                     pass  # Silently ignore errors in file size checking
 
             # Determine execution status
-            if result.returncode == 0:
-                status = "ok"
-                return_dict = {
-                    "status": status,
-                    "execution_count": self.execution_count,
-                    "payload": [],
-                    "user_expressions": {},
-                }
-            else:
-                status = "error"
-                return_dict = {
-                    "status": status,
-                    "execution_count": self.execution_count,
-                    "ename": "HurlExecutionError",
-                    "evalue": f"Hurl command failed with exit code {result.returncode}",
-                    "traceback": [result.stderr] if result.stderr else [],
-                }
-
-            return return_dict
-
-        except subprocess.TimeoutExpired:
-            error_message = "Error: Hurl command timed out (exceeded 30 seconds)"
-            if not silent:
-                self.send_response(
-                    self.iopub_socket,
-                    "stream",
-                    {"name": "stderr", "text": error_message},
-                )
+            if returncode == 0:
+                return self._ok_reply()
             return {
                 "status": "error",
                 "execution_count": self.execution_count,
-                "ename": "HurlTimeout",
-                "evalue": "Command timed out",
-                "traceback": [error_message],
+                "ename": "HurlExecutionError",
+                "evalue": f"Hurl command failed with exit code {returncode}",
+                "traceback": [stderr.tail] if stderr.tail else [],
             }
+
+        except ProcessInterrupted:
+            received = stdout.total_bytes + stderr.total_bytes
+            error_message = (
+                f"\nExecution interrupted after {process.elapsed:.1f}s "
+                f"({received} bytes of output received)\n"
+            )
+            return self._error_reply(
+                "KeyboardInterrupt", "Execution interrupted", error_message, silent
+            )
+        except asyncio.TimeoutError:
+            error_message = (
+                f"\nError: Hurl command timed out (exceeded {timeout:g} seconds)\n"
+            )
+            return self._error_reply(
+                "HurlTimeout", "Command timed out", error_message, silent
+            )
         except Exception as e:
             error_message = f"Error executing Hurl command: {e}"
+            return self._error_reply(type(e).__name__, str(e), error_message, silent)
+        finally:
+            # Clean up temporary files
+            if cache_writer is not None:
+                cache_writer.discard()
+            if workdir is not None:
+                shutil.rmtree(workdir, ignore_errors=True)
+            if process is not None:
+                self._record_process_metrics(process)
+
+    def _record_process_metrics(self, process):
+        """Add the spawn latency, wall time and output size of a hurl run."""
+        metrics = self._cell_metrics
+        if metrics is None:
+            return
+        if process.spawn_time is not None:
+            metrics.add("spawn", process.spawn_time)
+            metrics.add("hurl", process.elapsed)
+        metrics.stdout_bytes += process.stdout.total_bytes
+        metrics.stderr_bytes += process.stderr.total_bytes
+
+    def _execute_stats(self, argument, silent):
+        """Handle the %%stats magic: show (or clear) the kernel's metrics."""
+        if argument.strip().lower() == 'clear':
+            self._metrics.clear()
+            if not silent:
+                self._send_stream("stdout", "Metrics cleared\n")
+            return self._ok_reply()
+        if argument.strip():
+            error_message = f"Error: unknown %%stats command {argument.strip()!r} (expected clear)\n"
+            return self._error_reply("ValueError", error_message.strip(), error_message, silent)
+        if not silent:
+            text, markup = format_stats(self._metrics.summary())
+            self._send_display({"text/plain": text, "text/html": markup})
+        return self._ok_reply()
+
+    def _record_history(self, code, document, returncode, process, report_dir, body, silent):
+        """Store a run in the history database."""
+        if report_dir is None:
+            # In-process runs make one call per entry
+            calls = list(enumerate(getattr(process, 'calls', []), 1))
+        else:
+            calls = [
+                (entry.get('index'), call)
+                for result in read_report(report_dir) or []
+                for entry, call in iter_calls(result)
+            ]
+        try:
+            self.history_store.record(
+                code, self._variables.as_dict(document.variables), returncode,
+                process.elapsed, calls, body.data, body.size,
+            )
+        except (OSError, sqlite3.Error) as e:
             if not silent:
-                self.send_response(
-                    self.iopub_socket,
-                    "stream",
-                    {"name": "stderr", "text": error_message},
+                self._send_stream("stderr", f"(not recorded in the history: {e})\n")
+
+    def _execute_history(self, argument, silent):
+        """Handle the %%history magic: query or export the history database.
+
+        Commands: 'on' and 'off' (record this session's cells or not),
+        'list [since=T] [until=T] [limit=N]' (the latest executions, the
+        default), 'requests [url=PREFIX] [since=T] [until=T] [limit=N]',
+        'show ID' (an execution with its output), 'export PATH [url=PREFIX]
+        [since=T] [until=T]' (CSV or Parquet) and 'clear'. Times are
+        durations ago (2h) or ISO dates.
+        """
+        try:
+            words, params = parse_magic_args(argument)
+            command = words[0].lower() if words else 'list'
+            since = parse_time(params['since']) if 'since' in params else None
+            until = parse_time(params['until']) if 'until' in params else None
+            limit = int(params.get('limit', 20 if command == 'list' else 50))
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+
+        if command in ('on', 'off'):
+            self.history = command == 'on'
+            if not silent:
+                state = "recorded in" if self.history else "no longer recorded in"
+                path = self.history_path or default_history_path()
+                self._send_stream("stdout", f"Cells are {state} {path}\n")
+            return self._ok_reply()
+
+        try:
+            store = self.history_store
+            if command == 'list':
+                text = format_executions(store.executions(since, until, limit))
+            elif command == 'requests':
+                text = format_requests(store.requests(params.get('url'), since, until, limit))
+            elif command == 'show':
+                execution = store.execution(int(words[1])) if len(words) > 1 else None
+                if execution is None:
+                    raise ValueError(f"No execution {words[1]!r} in the history" if len(words) > 1
+                                     else "%%history show needs an execution id")
+                text = self._format_execution(execution)
+            elif command == 'export':
+                if len(words) < 2:
+                    raise ValueError("%%history export needs a file: %%history export requests.csv")
+                count = store.export(words[1], params.get('url'), since, until)
+                text = f"Exported {count} request(s) to {words[1]}\n"
+            elif command == 'clear':
+                store.clear()
+                text = "History cleared\n"
+            else:
+                raise ValueError(
+                    f"unknown %%history command {command!r} "
+                    "(expected on, off, list, requests, show, export or clear)"
                 )
-            return {
-                "status": "error",
-                "execution_count": self.execution_count,
-                "ename": type(e).__name__,
-                "evalue": str(e),
-                "traceback": [error_message],
-            }
+        except (ValueError, OSError, sqlite3.Error) as e:
+            return self._error_reply(type(e).__name__, str(e), f"Error: {e}\n", silent)
+        if not silent:
+            self._send_stream("stdout", text)
+        return self._ok_reply()
+
+    @staticmethod
+    def _format_execution(execution):
+        """Render an execution of the history, with its stored output."""
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(execution['started']))
+        lines = [
+            f"Execution #{execution['id']} at {started}: exit code {execution['exit_code']}, "
+            f"{execution['elapsed'] * 1000:.0f} ms",
+        ]
+        for name, value in sorted(execution['variables'].items()):
+            lines.append(f"  {name} = {format_value(value)}")
+        lines += ["", execution['code'].rstrip(), ""]
+        lines.append(execution['body'].decode("utf-8", errors="replace"))
+        if execution['truncated']:
+            lines.append(
+                f"(output truncated: the first {len(execution['body'])} of "
+                f"{execution['body_size']} bytes were stored)"
+            )
+        return "\n".join(lines) + "\n"
+
+    def _collect_captures(self, report_dir):
+        """Store the values captured during a run in the session variables.
+
+        Returns:
+            list: The captured (name, value) pairs
+        """
+        captures = list(iter_captures(read_report(report_dir)))
+        self._variables.update_from_report(captures)
+        return captures
+
+    def _send_timings(self, report_dir):
+        """Display the timing breakdown of the calls made by a run."""
+        timings = collect_timings(read_report(report_dir))
+        if not timings:
+            self._send_stream("stderr", "(no timings: hurl made no request)\n")
+            return
+        text, markup = format_timings(timings)
+        self._send_display({"text/plain": text, "text/html": markup})
+
+    def _test_reply(self, document, report_dir, returncode, stderr, elapsed, silent):
+        """Display the pass/fail summary of a %%test cell and return its reply."""
+        results = collect_results(read_report(report_dir), stderr, document.entries)
+        if not silent:
+            text, markup = format_results(results, elapsed)
+            self._send_display({"text/plain": text, "text/html": markup})
+        if returncode == 0:
+            return self._ok_reply()
+        failed = sum(result.success is False for result in results)
+        if not failed:
+            # Not an assert failure, e.g. an invalid cell: show hurl's error
+            if not silent and stderr:
+                self._send_stream("stderr", stderr)
+            evalue = f"Hurl command failed with exit code {returncode}"
+        else:
+            evalue = f"{failed} of {len(results)} entries failed"
+        return {
+            "status": "error",
+            "execution_count": self.execution_count,
+            "ename": "HurlExecutionError",
+            "evalue": evalue,
+            "traceback": [],
+        }
+
+    def _replay_cached(self, entry, silent, max_output, overflow, rich):
+        """Send a cached result to the frontend as if hurl had just run."""
+        if not silent:
+            limiter = OutputLimiter(
+                self._send_stream, max_output, overflow, self.spill_dir
+            )
+            rich_output = self._rich_output(limiter, max_output) if rich else None
+            for name in ("stdout", "stderr"):
+                forwarder = StreamForwarder(name, rich_output or limiter)
+                with open(entry.stream_path(name), "rb") as f:
+                    for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+                        forwarder.feed(chunk)
+                forwarder.close()
+            self._finish_output(rich_output, limiter)
+            self._send_stream(
+                "stderr", f"\n(cached result from {entry.age:.0f}s ago)\n"
+            )
+        self._variables.update_from_report(entry.captures)
+        return self._ok_reply()
+
+    def _execute_cache(self, command, silent):
+        """Handle the '%%cache stats' and '%%cache clear' commands."""
+        if command == 'clear':
+            count = self.response_cache.clear()
+            message = f"Removed {count} cached result(s)\n"
+        else:
+            message = self.response_cache.summary()
+        if not silent:
+            self._send_stream("stdout", message)
+        return self._ok_reply()
+
+    def _execute_vars(self, argument, silent):
+        """Handle the %%vars magic.
+
+        '%%vars' lists the session variables, '%%vars set name=value ...'
+        sets some and '%%vars clear [name ...]' removes some or all of them.
+        """
+        try:
+            words, params = parse_magic_args(argument)
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+        command = words[0].lower() if words else 'list'
+
+        if command == 'set':
+            try:
+                for name, value in params.items():
+                    self._variables.set(name, value)
+            except ValueError as e:
+                return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+            if not silent:
+                self._send_stream("stdout", f"Set {len(params)} variable(s)\n")
+            return self._ok_reply()
+
+        if command == 'clear':
+            count = self._variables.clear(words[1:])
+            if not silent:
+                self._send_stream("stdout", f"Removed {count} variable(s)\n")
+            return self._ok_reply()
+
+        if command != 'list':
+            error_message = (
+                f"Error: unknown %%vars command {command!r} "
+                "(expected list, set or clear)\n"
+            )
+            return self._error_reply("ValueError", error_message.strip(), error_message, silent)
+
+        if not silent:
+            lines = []
+            for name, value in self._variables.items():
+                text = format_value(value)
+                if len(text) > 80:
+                    text = text[:77] + "..."
+                lines.append(f"{name} = {text}\n")
+            self._send_stream(
+                "stdout", f"{len(lines)} variable(s)\n" + "".join(lines)
+            )
+        return self._ok_reply()
+
+    def _execute_cookies(self, argument, silent):
+        """Handle the %%cookies magic.
+
+        '%%cookies [host]' lists the cookies of the jar, '%%cookies clear
+        [host ...]' removes some or all of them and '%%cookies scope
+        [host ...]' restricts the jar to the given hosts (none to lift it).
+        """
+        try:
+            words, params = parse_magic_args(argument)
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+        command = words[0].lower() if words else 'list'
+
+        if command == 'clear':
+            count = self._cookies.clear(words[1:])
+            if not silent:
+                self._send_stream("stdout", f"Removed {count} cookie(s)\n")
+            return self._ok_reply()
+
+        if command == 'scope':
+            self._cookies.scope = words[1:]
+            self._cookies.apply_scope()
+            if not silent:
+                scope = ", ".join(self._cookies.scope) or "all hosts"
+                self._send_stream("stdout", f"Cookie jar scope: {scope}\n")
+            return self._ok_reply()
+
+        if command == 'list':
+            host = words[1] if len(words) > 1 else None
+        else:
+            host = words[0]
+
+        if not silent:
+            lines = []
+            for cookie in self._cookies.cookies(host):
+                value = cookie.value if len(cookie.value) <= 60 else cookie.value[:57] + "..."
+                flags = [f for f, on in (("secure", cookie.secure), ("httponly", cookie.http_only)) if on]
+                flags_text = f" [{', '.join(flags)}]" if flags else ""
+                lines.append(f"{cookie.domain}{cookie.path} {cookie.name}={value}{flags_text}\n")
+            scope = ", ".join(self._cookies.scope) or "all hosts"
+            self._send_stream(
+                "stdout",
+                f"{len(lines)} cookie(s) (scope: {scope})\n" + "".join(lines),
+            )
+        return self._ok_reply()
+
+    async def _execute_background(self, hurl_code, document, argument, timeout, silent):
+        """Handle the %%background magic.
+
+        '%%background' starts the cell as a background job and returns at
+        once; the job's status line is replaced with its result when it
+        finishes. '%%background list', '%%background wait [N ...]
+        [timeout=S]' and '%%background cancel [N ...|all]' manage the jobs
+        (without numbers, wait and cancel apply to every running job).
+        """
+        try:
+            words, params = parse_magic_args(argument)
+            wait_timeout = parse_duration(params['timeout']) if 'timeout' in params else None
+            jobs = self._jobs.find(words[1:]) if words and words[0].lower() != 'list' else []
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+        command = words[0].lower() if words else ''
+
+        if command == '':
+            if not hurl_code.strip():
+                return self._ok_reply()
+            try:
+                job = self._jobs.add(hurl_code)
+            except ValueError as e:
+                return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+            job.task = asyncio.ensure_future(self._run_job(job, document, timeout))
+            if not silent:
+                self._send_display({"text/plain": format_job(job)}, job.display_id)
+            return self._ok_reply()
+
+        if command == 'list':
+            if not silent:
+                self._send_stream("stdout", format_job_table(self._jobs.jobs))
+            return self._ok_reply()
+
+        if command == 'cancel':
+            running = [job for job in jobs if job.status == RUNNING]
+            for job in running:
+                self._cancel_job(job)
+            if not silent:
+                self._send_stream("stdout", f"Cancelled {len(running)} job(s)\n")
+            return self._ok_reply()
+
+        if command != 'wait':
+            error_message = (
+                f"Error: unknown %%background command {command!r} "
+                "(expected list, wait or cancel)\n"
+            )
+            return self._error_reply("ValueError", error_message.strip(), error_message, silent)
+
+        # Only an interrupt of the wait is registered: the jobs keep running
+        waiter = JobWaiter()
+        self._processes.add(waiter)
+        try:
+            finished = await waiter.wait(
+                [job.task for job in jobs if job.status == RUNNING], wait_timeout
+            )
         finally:
-            # Clean up temporary file
+            self._processes.discard(waiter)
+        if waiter.interrupted:
+            return self._error_reply(
+                "KeyboardInterrupt", "Wait interrupted",
+                "\nWait interrupted, the jobs keep running\n", silent,
+            )
+        if not silent:
+            for job in jobs:
+                self._send_stream("stdout", format_job(job) + "\n")
+        if not finished:
+            error_message = f"Error: jobs still running after {wait_timeout:g}s\n"
+            return self._error_reply("HurlTimeout", error_message.strip(), error_message, silent)
+        failed = [job for job in jobs if job.status != 'succeeded']
+        if failed:
+            summary = f"{len(failed)} of {len(jobs)} job(s) did not succeed"
+            return self._error_reply("HurlExecutionError", summary, summary + "\n", silent)
+        return self._ok_reply()
+
+    async def _run_job(self, job, document, timeout):
+        """Run a background job, then show its result in place of its status."""
+        workdir = Path(tempfile.mkdtemp(prefix="hurl-job-"))
+        try:
+            hurl_file = workdir / "cell.hurl"
+            hurl_file.write_text(job.code)
+            cmd = ["hurl", "--no-color", str(hurl_file)]
+            cmd.extend(self._variables.command_args(workdir / "variables.env"))
+            # Foreground cells may write the jar meanwhile: only read it
+            cmd.extend(self._cookies.command_args(write=False))
+            report_dir = None
+            if document.has_captures and self.hurl_info.supports("--report-json"):
+                report_dir = workdir / "report"
+                cmd.extend(["--report-json", str(report_dir)])
+            stdout = StreamForwarder("stdout", tail_size=JOB_OUTPUT_SIZE)
+            stderr = StreamForwarder("stderr", tail_size=JOB_OUTPUT_SIZE)
+            # Not in self._processes: interrupting a cell leaves the jobs alone
+            job.process = StreamingProcess(cmd, stdout, stderr)
             try:
-                Path(hurl_file).unlink()
-            except Exception:
-                pass
+                returncode = await job.process.run(timeout=timeout)
+                job.finish("succeeded" if returncode == 0 else "failed", returncode)
+            except ProcessInterrupted:
+                job.finish("cancelled")
+            except asyncio.TimeoutError:
+                job.finish("timed out")
+            job.stdout, job.stderr = stdout.tail, stderr.tail
+            if report_dir is not None:
+                self._collect_captures(report_dir)
+        except Exception as e:
+            job.stderr = f"Error running the job: {e}"
+            job.finish("failed")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+            self._send_display({"text/plain": format_job(job)}, job.display_id, update=True)
 
-    def do_complete(self, code, cursor_pos):
-        """Provide autocompletion suggestions.
+    async def _execute_watch(self, watch, document, engine, timeout, silent):
+        """Handle the %%watch magic: re-run the cell until a stop condition.
 
-        Args:
-            code: The code to complete
-            cursor_pos: The cursor position in the code
+        A single display shows the latest change, updated in place after
+        every iteration. The kernel's event loop is free between
+        iterations, and an interrupt stops the watch.
+        """
+        display_id = f"hurl-watch-{uuid.uuid4().hex}"
+        self._processes.add(watch)
+        try:
+            await self._run_watch(watch, document, engine, timeout, display_id, silent)
+        except Exception as e:
+            error_message = f"Error executing Hurl command: {e}"
+            return self._error_reply(type(e).__name__, str(e), error_message, silent)
+        finally:
+            self._processes.discard(watch)
+        if watch.interrupted:
+            return self._error_reply(
+                "KeyboardInterrupt", "Watch interrupted",
+                f"\nWatch interrupted after {watch.iteration} iteration(s)\n", silent,
+            )
+        if watch.options.until in ('success', 'failure', 'change') or watch.returncode == 0:
+            return self._ok_reply()
+        return self._error_reply(
+            "HurlExecutionError", f"Hurl command failed with exit code {watch.returncode}",
+            f"Hurl command failed with exit code {watch.returncode}\n", silent,
+        )
+
+    def _start_watch_job(self, watch, document, engine, timeout, silent):
+        """Run a %%watch cell as a %%background job."""
+        try:
+            job = self._jobs.add(watch.code)
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+        # Cancelling the job interrupts the watch
+        job.process = watch
+
+        async def run():
+            try:
+                await self._run_watch(
+                    watch, document, engine, timeout, job.display_id, silent,
+                    update=True, write_cookies=False,
+                )
+                if watch.interrupted:
+                    job.finish("cancelled")
+                else:
+                    job.finish("succeeded" if watch.returncode == 0 else "failed", watch.returncode)
+            except Exception as e:
+                job.stderr = f"Error running the job: {e}"
+                job.finish("failed")
+            job.stdout = format_watch(watch)
+            if not silent:
+                self._send_display({"text/plain": format_job(job)}, job.display_id, update=True)
+
+        job.task = asyncio.ensure_future(run())
+        if not silent:
+            self._send_display({"text/plain": format_job(job)}, job.display_id)
+        return self._ok_reply()
+
+    async def _run_watch(self, watch, document, engine, timeout, display_id, silent,
+                         update=False, write_cookies=True):
+        """Run the iterations of a watch, updating its display after each one."""
+        loop = asyncio.get_running_loop()
+        while not watch.interrupted:
+            started = loop.time()
+            try:
+                returncode, output = await self._run_watch_iteration(
+                    watch, document, engine, timeout, write_cookies
+                )
+            except ProcessInterrupted:
+                break
+            changed = watch.record(returncode, output)
+            watch.stopped = watch.stop_reason(changed, output)
+            if not silent:
+                self._send_display({"text/plain": format_watch(watch)}, display_id, update=update)
+                update = True
+            if watch.stopped:
+                return
+            if not await watch.sleep(watch.options.interval - (loop.time() - started)):
+                break
+        watch.stopped = "interrupted"
+        if not silent and update:
+            self._send_display({"text/plain": format_watch(watch)}, display_id, update=True)
+
+    async def _run_watch_iteration(self, watch, document, engine, timeout, write_cookies):
+        """Run the watched cell once, without forwarding its output.
 
         Returns:
-            dict: Completion results
+            tuple: (returncode, output) with returncode None if it timed out
+
+        Raises:
+            ProcessInterrupted: If the watch was interrupted meanwhile
         """
-        # Get the text before the cursor
-        code_before_cursor = code[:cursor_pos]
-
-        # Find the current word being typed
-        match = re.search(r'(\S+)$', code_before_cursor)
-        if match:
-            current_word = match.group(1)
-            cursor_start = match.start(1)
-        else:
-            current_word = ""
-            cursor_start = cursor_pos
+        stdout = StreamForwarder("stdout", tail_size=WATCH_OUTPUT_SIZE)
+        stderr = StreamForwarder("stderr", tail_size=WATCH_OUTPUT_SIZE)
+        workdir = None
+        report_dir = None
+        in_process = engine == 'inprocess' and unsupported(
+            watch.code, document, [name for name, _ in self._variables.items()]
+        ) is None
+        try:
+            if in_process:
+                process = InProcessRun(
+                    self.connection_pool, watch.code, document, self._variables.as_dict(),
+                    self._cookies, stdout, stderr,
+                )
+            else:
+                workdir = Path(tempfile.mkdtemp(prefix="hurl-watch-"))
+                hurl_file = workdir / "cell.hurl"
+                hurl_file.write_text(watch.hurl_code)
+                cmd = ["hurl", "--no-color", str(hurl_file)]
+                cmd.extend(self._variables.command_args(workdir / "variables.env"))
+                cmd.extend(self._cookies.command_args(write=write_cookies))
+                if document.has_captures and self.hurl_info.supports("--report-json"):
+                    report_dir = workdir / "report"
+                    cmd.extend(["--report-json", str(report_dir)])
+                process = StreamingProcess(cmd, stdout, stderr)
+            watch.process = process
+            # The watch may have been interrupted while the process was built
+            if watch.interrupted:
+                raise ProcessInterrupted()
+            try:
+                returncode = await process.run(timeout=timeout)
+            except asyncio.TimeoutError:
+                returncode = None
+            finally:
+                watch.process = None
+            if in_process:
+                self._variables.update_from_report(process.captures)
+            elif report_dir is not None:
+                self._collect_captures(report_dir)
+            if write_cookies:
+                self._cookies.apply_scope()
+            return returncode, stdout.tail + stderr.tail
+        finally:
+            if workdir is not None:
+                shutil.rmtree(workdir, ignore_errors=True)
 
-        # Define completion lists
-        http_methods = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS', 'CONNECT', 'TRACE']
+    def _cancel_job(self, job):
+        """Stop a running background job."""
+        if job.process is not None:
+            job.process.interrupt()
+            return
+        # The job's task has not started yet
+        job.task.cancel()
+        job.finish("cancelled")
+        self._send_display({"text/plain": format_job(job)}, job.display_id, update=True)
 
-        common_headers = [
-            'Accept:', 'Accept-Encoding:', 'Accept-Language:', 'Authorization:',
-            'Cache-Control:', 'Connection:', 'Content-Type:', 'Content-Length:',
-            'Cookie:', 'Host:', 'Origin:', 'Referer:', 'User-Agent:',
-        ]
+    async def _execute_bench(self, hurl_code, argument, timeout, silent):
+        """Handle the %%bench magic: compare the latency of request variants.
 
-        content_types = [
-            'Content-Type: application/json',
-            'Content-Type: application/x-www-form-urlencoded',
-            'Content-Type: multipart/form-data',
-            'Content-Type: text/plain',
-            'Content-Type: text/html',
-            'Content-Type: application/xml',
-        ]
+        The cell holds two or more variants, each introduced by a
+        '# variant: name' comment line. After warmup=N (default 3) unmeasured
+        runs, every variant is run iterations=N times (default 20), all of
+        them interleaved in a single hurl invocation. Samples are the
+        request durations reported by hurl, so process start-up is not
+        measured.
+        """
+        try:
+            _, params = parse_magic_args(argument)
+            iterations = int(params.get('iterations', 20))
+            warmup = int(params.get('warmup', 3))
+            alpha = float(params.get('alpha', 0.05))
+            if iterations < 2 or warmup < 0 or not 0 < alpha < 1:
+                raise ValueError("iterations must be at least 2, warmup positive and alpha in (0, 1)")
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+
+        error = self._unsupported("--json", "%%bench", silent)
+        if error:
+            return error
+
+        variants = split_variants(hurl_code)
+        if len(variants) < 2:
+            error_message = (
+                "Error: %%bench needs at least two variants, each starting with "
+                "a '# variant: name' line\n"
+            )
+            return self._error_reply("ValueError", error_message.strip(), error_message, silent)
+
+        workdir = Path(tempfile.mkdtemp(prefix="hurl-bench-"))
+        display_id = f"hurl-bench-{uuid.uuid4().hex}"
+        try:
+            write_variant_files(variants, workdir)
+            cmd = ["hurl", "--json", "--no-color"]
+            cmd.extend(self._variables.command_args(workdir / "variables.env"))
+            cmd.extend(interleaved_order(variants, warmup + iterations))
+            parser = BenchOutputParser(variants, warmup)
 
-        hurl_sections = ['[QueryStringParams]', '[FormParams]', '[MultipartFormData]',
-                        '[Cookies]', '[Captures]', '[Asserts]', '[Options]', '[BasicAuth]']
+            last_update = 0.0
 
-        magic_lines = ['%%include', '%%verbose', '%%output=']
+            def on_output(name, text):
+                nonlocal last_update
+                parser.feed(name, text)
+                if not silent and time.monotonic() - last_update >= 1.0:
+                    last_update = time.monotonic()
+                    text, markup = format_comparison(compare(variants, alpha), running=True)
+                    self._send_display(
+                        {"text/plain": text, "text/html": markup}, display_id, update=True
+                    )
 
-        # Determine context and provide relevant completions
-        matches = []
+            if not silent:
+                text, markup = format_comparison(compare(variants, alpha), running=True)
+                self._send_display({"text/plain": text, "text/html": markup}, display_id)
+            stdout = StreamForwarder("stdout", on_output)
+            stderr = StreamForwarder("stderr", tail_size=STDERR_TAIL_SIZE)
+            process = StreamingProcess(cmd, stdout, stderr)
+            self._processes.add(process)
+            interrupted = False
+            try:
+                await process.run(timeout=timeout)
+            except (ProcessInterrupted, asyncio.TimeoutError):
+                interrupted = True
+            finally:
+                self._processes.discard(process)
+                self._record_process_metrics(process)
+                parser.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        rows = compare(variants, alpha)
+        if not silent:
+            text, markup = format_comparison(rows)
+            self._send_display(
+                {"text/plain": text, "text/html": markup}, display_id, update=True
+            )
+        if interrupted:
+            return self._error_reply(
+                "KeyboardInterrupt",
+                "Execution interrupted",
+                f"\nBenchmark stopped after {process.elapsed:.1f}s\n",
+                silent,
+            )
+        if any(not variant.samples for variant in variants):
+            error_message = "Error: some variants produced no successful run\n"
+            if stderr.tail:
+                error_message += stderr.tail
+            return self._error_reply("HurlExecutionError", error_message.strip(), error_message, silent)
+        return self._ok_reply()
+
+    async def _execute_baseline(self, hurl_code, argument, timeout, silent):
+        """Handle the %%baseline magic: save or check the latency of a cell.
+
+        '%%baseline save' runs the cell warmup=N (default 3) plus
+        iterations=N (default 20) times and saves the duration of each
+        entry; '%%baseline check [tolerance=15%] [alpha=0.05]' runs it again
+        and fails if an entry got slower than the baseline beyond the
+        tolerance, per the Mann-Whitney U test. Baselines belong to the
+        cell's code, or to name=NAME. '%%baseline list' and '%%baseline
+        delete' manage them.
+        """
+        try:
+            words, params = parse_magic_args(argument)
+            command = words[0].lower() if words else ''
+            iterations = int(params.get('iterations', DEFAULT_ITERATIONS))
+            warmup = int(params.get('warmup', DEFAULT_WARMUP))
+            alpha = float(params.get('alpha', DEFAULT_ALPHA))
+            tolerance = (
+                parse_tolerance(params['tolerance']) if 'tolerance' in params else DEFAULT_TOLERANCE
+            )
+            if iterations < 2 or warmup < 0 or not 0 < alpha < 1:
+                raise ValueError("iterations must be at least 2, warmup positive and alpha in (0, 1)")
+            if command not in ('save', 'check', 'list', 'delete'):
+                raise ValueError(
+                    f"unknown %%baseline command {command!r} (expected save, check, list or delete)"
+                )
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
 
-        # Check if we're at the start of a line (magic line)
-        if code_before_cursor.strip().startswith('%%') or current_word.startswith('%%'):
-            matches = [m for m in magic_lines if m.startswith(current_word)]
+        store = BaselineStore(self.baseline_dir or default_baseline_dir())
+        name = params.get('name')
+        key = baseline_key(hurl_code, name)
+        if command == 'list':
+            if not silent:
+                lines = [
+                    f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(baseline['created']))}  "
+                    f"{baseline['name'] or '(cell)'}: {len(baseline['entries'])} entries, "
+                    f"{baseline['code'].strip().splitlines()[0] if baseline['code'].strip() else ''}\n"
+                    for baseline in store.all()
+                ]
+                self._send_stream("stdout", "".join(lines) or "No baselines saved\n")
+            return self._ok_reply()
+        if command == 'delete':
+            deleted = store.delete(key)
+            if not silent:
+                self._send_stream("stdout", "Baseline deleted\n" if deleted else "No baseline to delete\n")
+            return self._ok_reply()
 
-        # Check if we're in a section header
-        elif '[' in code_before_cursor.split('\n')[-1]:
-            matches = [s for s in hurl_sections if s.lower().startswith(current_word.lower())]
+        if not hurl_code.strip():
+            return self._ok_reply()
+        baseline = None
+        if command == 'check':
+            baseline = store.load(key)
+            if baseline is None:
+                error_message = (
+                    "Error: no baseline saved for this cell"
+                    + (f" (name={name})" if name else "")
+                    + ": run it with %%baseline save first\n"
+                )
+                return self._error_reply("ValueError", error_message.strip(), error_message, silent)
+        error = self._unsupported("--json", "%%baseline", silent)
+        if error:
+            return error
 
-        # Check if we're on a line that looks like headers
-        elif ':' in code_before_cursor.split('\n')[-1] or any(h.split(':')[0] in current_word for h in common_headers):
-            # Suggest content types if typing Content-Type
-            if 'Content-Type' in code_before_cursor.split('\n')[-1]:
-                matches = [ct for ct in content_types if ct.lower().startswith(current_word.lower())]
+        parser = EntryTimingParser(warmup)
+        workdir = Path(tempfile.mkdtemp(prefix="hurl-baseline-"))
+        display_id = f"hurl-baseline-{uuid.uuid4().hex}"
+        runs = warmup + iterations
+        try:
+            hurl_file = workdir / "cell.hurl"
+            hurl_file.write_text(hurl_code)
+            cmd = ["hurl", "--json", "--no-color"]
+            cmd.extend(self._variables.command_args(workdir / "variables.env"))
+            cmd.extend(self._cookies.command_args(write=False))
+            if self.hurl_info.supports("--repeat"):
+                cmd.extend(["--repeat", str(runs), str(hurl_file)])
             else:
-                matches = [h for h in common_headers if h.lower().startswith(current_word.lower())]
+                cmd.extend([str(hurl_file)] * runs)
 
-        # Check if we're at the start of a line (HTTP method)
-        elif code_before_cursor.endswith('\n') or len(code_before_cursor.split('\n')[-1].strip()) == 0:
-            matches = http_methods + magic_lines
+            last_update = 0.0
 
-        # Default: suggest HTTP methods and common keywords
-        else:
-            all_completions = http_methods + common_headers + hurl_sections + magic_lines
-            matches = [c for c in all_completions if c.lower().startswith(current_word.lower())]
+            def on_output(name, text):
+                nonlocal last_update
+                parser.feed(name, text)
+                if not silent and time.monotonic() - last_update >= 1.0:
+                    last_update = time.monotonic()
+                    self._send_display(
+                        {"text/plain": f"Measuring... {parser.runs} of {runs} runs"},
+                        display_id, update=True,
+                    )
+
+            if not silent:
+                self._send_display({"text/plain": f"Measuring... 0 of {runs} runs"}, display_id)
+            stdout = StreamForwarder("stdout", on_output)
+            stderr = StreamForwarder("stderr", tail_size=STDERR_TAIL_SIZE)
+            process = StreamingProcess(cmd, stdout, stderr)
+            self._processes.add(process)
+            try:
+                await process.run(timeout=timeout)
+            except ProcessInterrupted:
+                return self._error_reply(
+                    "KeyboardInterrupt", "Execution interrupted",
+                    f"\nMeasurement stopped after {process.elapsed:.1f}s\n", silent,
+                )
+            except asyncio.TimeoutError:
+                error_message = f"\nError: Hurl command timed out (exceeded {timeout:g} seconds)\n"
+                return self._error_reply("HurlTimeout", "Command timed out", error_message, silent)
+            finally:
+                self._processes.discard(process)
+                self._record_process_metrics(process)
+                parser.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        if not parser.samples:
+            error_message = "Error: no successful run to measure\n" + stderr.tail
+            if not silent:
+                self._send_display({"text/plain": "No successful run"}, display_id, update=True)
+            return self._error_reply("HurlExecutionError", error_message.strip(), error_message, silent)
+        note = f"({parser.failures} failed runs were left out)\n" if parser.failures else ""
 
+        if command == 'save':
+            baseline = store.save(key, hurl_code, parser, name)
+            if not silent:
+                self._send_display({"text/plain": format_saved(baseline) + note}, display_id, update=True)
+            return self._ok_reply()
+
+        rows = check(baseline, parser, tolerance, alpha)
+        if not silent:
+            text, markup = format_check(rows, baseline, tolerance)
+            self._send_display(
+                {"text/plain": text + note, "text/html": markup}, display_id, update=True
+            )
+        regressed = [row for row in rows if row['regressed']]
+        if regressed:
+            summary = ", ".join(
+                f"#{row['index']} p50 {row['change50'] * 100:+.1f}%, p95 {row['change95'] * 100:+.1f}%"
+                for row in regressed
+            )
+            evalue = f"Latency regressed beyond {tolerance * 100:g}%: {summary}"
+            return self._error_reply("LatencyRegression", evalue, evalue + "\n", silent)
+        return self._ok_reply()
+
+    async def _execute_load(self, hurl_code, argument, silent):
+        """Handle the %%load magic: run the cell as a load test.
+
+        Arguments: concurrency=N (requests in flight, default 10),
+        duration=DURATION or iterations=N (default duration=10s),
+        rps=N (target runs of the cell per second), ramp-up=DURATION and
+        workers=N (processes, default one per core).
+        """
+        try:
+            _, params = parse_magic_args(argument)
+            concurrency = int(params.get('concurrency', 10))
+            iterations = int(params['iterations']) if 'iterations' in params else None
+            duration = parse_duration(params['duration']) if 'duration' in params else None
+            if duration is None and iterations is None:
+                duration = 10.0
+            rate = float(params['rps']) if 'rps' in params else None
+            ramp_up = parse_duration(params.get('ramp-up', '0'))
+            workers = int(params.get('workers', default_workers(concurrency)))
+            if concurrency < 1 or workers < 1 or (iterations is not None and iterations < 1):
+                raise ValueError("concurrency, workers and iterations must be positive")
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+
+        if not hurl_code.strip():
+            return self._ok_reply()
+        error = self._unsupported("--json", "%%load", silent)
+        if error:
+            return error
+
+        workdir = Path(tempfile.mkdtemp(prefix="hurl-load-"))
+        try:
+            hurl_file = workdir / "load.hurl"
+            hurl_file.write_text(hurl_code)
+            extra_args = self._variables.command_args(workdir / "variables.env")
+            # The runs are concurrent: they read the cookie jar but do not write it
+            extra_args.extend(self._cookies.command_args(write=False))
+            load = LoadTest(plan_workers(
+                str(hurl_file), extra_args, concurrency, workers, duration,
+                iterations, rate, ramp_up, self.hurl_info.features,
+            ))
+            display_id = f"hurl-load-{uuid.uuid4().hex}"
+            if not silent:
+                text, markup = format_summary(load.summary(), running=True)
+                self._send_display({"text/plain": text, "text/html": markup}, display_id)
+            load.start()
+            self._processes.add(load)
+            last_update = time.monotonic()
+            try:
+                while not load.poll():
+                    await asyncio.sleep(0.2)
+                    if not silent and time.monotonic() - last_update >= 1.0:
+                        last_update = time.monotonic()
+                        text, markup = format_summary(load.summary(), running=True)
+                        self._send_display(
+                            {"text/plain": text, "text/html": markup}, display_id, update=True
+                        )
+            finally:
+                self._processes.discard(load)
+                load.join()
+            summary = load.summary()
+            if not silent:
+                text, markup = format_summary(summary)
+                self._send_display(
+                    {"text/plain": text, "text/html": markup}, display_id, update=True
+                )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        if load.stop.is_set():
+            return self._error_reply(
+                "KeyboardInterrupt",
+                "Execution interrupted",
+                f"\nLoad test interrupted after {summary['elapsed']:.1f}s\n",
+                silent,
+            )
+        return self._ok_reply()
+
+    async def _execute_foreach(self, code, hurl_code, document, argument, engine, timeout, silent):
+        """Handle the %%foreach magic: run the cell once per row of a file.
+
+        Arguments: file=PATH (CSV or TSV with a header line, or JSONL; the
+        columns are bound as variables), format=csv|tsv|jsonl (if the
+        extension does not tell), concurrency=N (rows run at the same time,
+        default 4) and output=PATH (one JSON line per row, default
+        PATH.results.jsonl). The cell's timeout applies to each row.
+        """
+        try:
+            _, params = parse_magic_args(argument)
+            if not params.get('file'):
+                raise ValueError("%%foreach needs the file of rows: file=PATH")
+            source = Path(params['file']).expanduser()
+            fmt = row_format(source, params.get('format'))
+            concurrency = int(params.get('concurrency', 4))
+            if concurrency < 1:
+                raise ValueError("concurrency must be positive")
+            if 'output' in params:
+                output_path = Path(params['output']).expanduser()
+            else:
+                output_path = source.with_name(source.name + ".results.jsonl")
+            if not source.is_file():
+                raise ValueError(f"No such file: {source}")
+            rows = iter_rows(source, fmt)
+            # The columns of the first row tell whether the cell can run in-process
+            first = next(rows, None)
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+        if not hurl_code.strip() or first is None:
+            return self._ok_reply()
+
+        session = self._variables.as_dict()
+        in_process = engine == 'inprocess' and unsupported(
+            code, document, list(session) + list(first)
+        ) is None
+        if not in_process:
+            error = self._unsupported("--json", "%%foreach", silent)
+            if error:
+                return error
+
+        workdir = Path(tempfile.mkdtemp(prefix="hurl-foreach-"))
+        hurl_file = workdir / "cell.hurl"
+        hurl_file.write_text(hurl_code)
+        # Rows run concurrently: they read the cookie jar but do not write it
+        cmd = ["hurl", "--json", "--no-color", str(hurl_file)]
+        cmd.extend(self._variables.command_args(workdir / "variables.env"))
+        cmd.extend(self._cookies.command_args(write=False))
+        cookies = ReadOnlyCookieJar(self._cookies)
+
+        async def run_row(number, row):
+            stdout = StreamForwarder("stdout", tail_size=0 if in_process else REPORT_SIZE)
+            stderr = StreamForwarder("stderr", tail_size=STDERR_TAIL_SIZE)
+            if in_process:
+                process = InProcessRun(
+                    self.connection_pool, code, document, {**session, **row},
+                    cookies, stdout, stderr,
+                )
+            else:
+                row_args = [
+                    arg for name, value in row.items() for arg in ("--variable", f"{name}={value}")
+                ]
+                process = StreamingProcess(cmd + row_args, stdout, stderr)
+            run.processes.add(process)
+            try:
+                returncode = await process.run(timeout=timeout)
+            except asyncio.TimeoutError:
+                return {"success": False, "exit": None, "error": f"timed out after {timeout:g}s"}
+            finally:
+                run.processes.discard(process)
+            if in_process:
+                calls = process.calls
+            else:
+                try:
+                    result = json.loads(stdout.tail.strip().splitlines()[-1])
+                except (ValueError, IndexError):
+                    result = {}
+                calls = [call for _, call in iter_calls(result)]
+            calls = [(call_status(call), call_total_us(call)) for call in calls]
+            error = None
+            if returncode != 0 and stderr.tail.strip():
+                # The first line of a hurl error names the failure
+                error = stderr.tail.strip().splitlines()[0]
+            return {"success": returncode == 0, "exit": returncode, "calls": calls, "error": error}
+
+        run = ForEachRun(itertools.chain([first], rows), run_row, concurrency, output_path)
+        display_id = f"hurl-foreach-{uuid.uuid4().hex}"
+
+        def show(running, update=True):
+            if not silent:
+                text, markup = format_foreach(run.stats, source, output_path, running)
+                self._send_display(
+                    {"text/plain": text, "text/html": markup}, display_id, update=update
+                )
+
+        show(running=True, update=False)
+        task = asyncio.ensure_future(run.run())
+        self._processes.add(run)
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=1.0)
+                if not task.done():
+                    show(running=True)
+            task.result()
+        except (OSError, ValueError) as e:
+            show(running=False)
+            return self._error_reply(type(e).__name__, str(e), f"Error: {e}\n", silent)
+        finally:
+            self._processes.discard(run)
+            shutil.rmtree(workdir, ignore_errors=True)
+        show(running=False)
+
+        stats = run.stats
+        if run.interrupted:
+            return self._error_reply(
+                "KeyboardInterrupt", "Execution interrupted",
+                f"\nInterrupted after {stats.rows} rows ({stats.elapsed:.1f}s)\n", silent,
+            )
+        if stats.failed:
+            summary = f"{stats.failed} of {stats.rows} rows failed"
+            return self._error_reply("HurlExecutionError", summary, summary + "\n", silent)
+        return self._ok_reply()
+
+    async def _execute_batch(self, hurl_code, document, argument, timeout, silent):
+        """Handle the %%batch magic.
+
+        '%%batch' queues the cell, '%%batch run [jobs=N]' runs every queued
+        cell and updates the output of each queued cell in place,
+        '%%batch list' and '%%batch clear' inspect and empty the queue.
+
+        Queued cells are run with 'hurl --test --parallel', in waves: a cell
+        using a variable captured by another queued cell runs in a later
+        wave, with the captured value.
+        """
+        try:
+            words, params = parse_magic_args(argument)
+        except ValueError as e:
+            return self._error_reply("ValueError", str(e), f"Error: {e}\n", silent)
+        command = words[0].lower() if words else ''
+
+        if command == '':
+            if not hurl_code.strip():
+                return self._ok_reply()
+            entry = self._batch.add(
+                hurl_code, (capture.name for capture in document.captures), document.variables
+            )
+            if not silent:
+                self._send_display(
+                    {"text/plain": format_entry_status(entry)}, entry.display_id
+                )
+            return self._ok_reply()
+        if command == 'list':
+            if not silent:
+                lines = [
+                    f"#{entry.number}: {entry.code.strip().splitlines()[0]}"
+                    for entry in self._batch.entries
+                ]
+                self._send_stream(
+                    "stdout",
+                    f"{len(lines)} cell(s) queued\n" + "".join(f"{line}\n" for line in lines),
+                )
+            return self._ok_reply()
+
+        if command == 'clear':
+            count = self._batch.clear()
+            if not silent:
+                self._send_stream("stdout", f"Removed {count} queued cell(s)\n")
+            return self._ok_reply()
+
+        if command != 'run':
+            error_message = (
+                f"Error: unknown %%batch command {command!r} "
+                "(expected run, list or clear)\n"
+            )
+            return self._error_reply("ValueError", error_message.strip(), error_message, silent)
+
+        error = self._unsupported("--report-json", "%%batch run", silent)
+        if error:
+            return error
+
+        entries = self._batch.take()
+        if not entries:
+            if not silent:
+                self._send_stream("stdout", "No queued cells to run\n")
+            return self._ok_reply()
+
+        try:
+            jobs = int(params['jobs']) if 'jobs' in params else None
+        except ValueError:
+            error_message = f"Error: invalid jobs value {params['jobs']!r}\n"
+            return self._error_reply("ValueError", error_message.strip(), error_message, silent)
+
+        def update(entry):
+            if not silent:
+                self._send_display(
+                    {"text/plain": format_entry_status(entry)},
+                    entry.display_id,
+                    update=True,
+                )
+
+        waves = plan_waves(entries)
+        for entry in entries:
+            if entry.depends_on:
+                update(entry)
+        by_number = {entry.number: entry for entry in entries}
+        started = time.perf_counter()
+        returncode = 0
+        stderr_tail = ''
+        for wave in waves:
+            runnable = []
+            for entry in wave:
+                entry.skipped = [
+                    number for number in entry.depends_on if not by_number[number].success
+                ]
+                if entry.skipped:
+                    entry.success = False
+                else:
+                    runnable.append(entry)
+            remaining = None
+            if timeout:
+                remaining = max(timeout - (time.perf_counter() - started), 0.001)
+            try:
+                if runnable:
+                    code, tail = await self._run_batch_wave(runnable, jobs, remaining, update)
+                    returncode = returncode or code
+                    stderr_tail = tail or stderr_tail
+            except ProcessInterrupted:
+                return self._error_reply(
+                    "KeyboardInterrupt",
+                    "Execution interrupted",
+                    f"\nBatch interrupted after {time.perf_counter() - started:.1f}s\n",
+                    silent,
+                )
+            except asyncio.TimeoutError:
+                error_message = f"\nError: batch timed out (exceeded {timeout:g} seconds)\n"
+                return self._error_reply(
+                    "HurlTimeout", "Command timed out", error_message, silent
+                )
+
+        for entry in entries:
+            update(entry)
+        failed = [entry for entry in entries if not entry.success]
+        summary = (
+            f"Batch: {len(entries) - len(failed)}/{len(entries)} cell(s) succeeded "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        if len(waves) > 1:
+            summary += f", {len(waves)} waves"
+        details = [
+            f"{label}: {', '.join(f'#{entry.number}' for entry in group)}"
+            for label, group in (
+                ("failed", [entry for entry in failed if not entry.skipped]),
+                ("skipped", [entry for entry in failed if entry.skipped]),
+            )
+            if group
+        ]
+        if details:
+            summary += f" ({'; '.join(details)})"
+        if not silent:
+            self._send_stream("stdout", summary + "\n")
+        if returncode == 0 and not failed:
+            return self._ok_reply()
+        return {
+            "status": "error",
+            "execution_count": self.execution_count,
+            "ename": "HurlExecutionError",
+            "evalue": summary,
+            "traceback": [stderr_tail] if stderr_tail else [summary],
+        }
+
+    async def _run_batch_wave(self, entries, jobs, timeout, update):
+        """Run batch entries in one hurl invocation and keep their captures.
+
+        Returns:
+            tuple: (returncode, tail of hurl's stderr)
+
+        Raises:
+            ProcessInterrupted: If the kernel was interrupted
+            asyncio.TimeoutError: If hurl did not finish within timeout
+        """
+        with tempfile.TemporaryDirectory(prefix="hurl-batch-") as directory:
+            write_batch_files(entries, directory)
+            report_dir = Path(directory) / "report"
+            cmd = build_batch_command(
+                entries, jobs, report_dir, self.hurl_info.supports("--parallel")
+            )
+            cmd[1:1] = (
+                self._variables.command_args(Path(directory) / "variables.env")
+                + self._cookies.command_args(write=False)
+            )
+            parser = BatchOutputParser(entries, update)
+            stdout = StreamForwarder("stdout")
+            stderr = StreamForwarder("stderr", parser.feed, tail_size=STDERR_TAIL_SIZE)
+            process = StreamingProcess(cmd, stdout, stderr)
+            self._processes.add(process)
+            try:
+                returncode = await process.run(timeout=timeout)
+            finally:
+                self._processes.discard(process)
+                self._record_process_metrics(process)
+                parser.close()
+            apply_report(entries, report_dir)
+            self._collect_captures(report_dir)
+        return returncode, stderr.tail
+
+    def do_complete(self, code, cursor_pos):
+        """Provide autocompletion suggestions.
+
+        Args:
+            code: The code to complete
+            cursor_pos: The cursor position in the code
+
+        Returns:
+            dict: Completion results
+        """
+        matches, cursor_start = self._completer.complete(
+            code, cursor_pos, [name for name, _ in self._variables.items()]
+        )
         return {
             'matches': matches,
             'cursor_start': cursor_start,
@@ -338,6 +2227,24 @@ class HurlKernel(Kernel):
             'status': 'ok'
         }
 
+    def do_is_complete(self, code):
+        """Tell a console whether the cell is ready to run.
+
+        Args:
+            code: The code typed so far
+
+        Returns:
+            dict: 'incomplete' inside an unterminated multi-line string or
+                JSON body, 'invalid' if the cell has syntax errors, else
+                'complete'
+        """
+        document = self._parser.parse(code)
+        if document.incomplete:
+            return {'status': 'incomplete', 'indent': ''}
+        if document.errors:
+            return {'status': 'invalid'}
+        return {'status': 'complete'}
+
     def do_inspect(self, code, cursor_pos, detail_level=0):
         """Provide documentation/inspection for code.
 
@@ -359,7 +2266,11 @@ class HurlKernel(Kernel):
         while end < len(code) and code[end].isalnum():
             end += 1
 
-        word = code[start:end].upper()
+        name = code[start:end]
+        word = name.upper()
+        line_end = code.find('\n', start)
+        line = code[code.rfind('\n', 0, start) + 1:line_end if line_end != -1 else len(code)]
+        context = self._parser.parse(code).context_at(code.count('\n', 0, start) + 1)
 
         # Documentation for HTTP methods
         http_methods_docs = {
@@ -385,12 +2296,20 @@ class HurlKernel(Kernel):
         }
 
         # Check for magic lines
-        if word in ['INCLUDE', 'VERBOSE', 'OUTPUT']:
+        if word in ['INCLUDE', 'VERBOSE', 'OUTPUT'] or (word == 'TEST' and line.lstrip().startswith('%%')):
             doc_text = {
                 'INCLUDE': '%%include magic line\nShows response headers and body (equivalent to hurl --include flag)',
                 'VERBOSE': '%%verbose magic line\nShows all request/response details including headers, timing, etc. (equivalent to hurl --verbose flag)',
                 'OUTPUT': '%%output=filename magic line\nWrites the response body to the specified file (equivalent to hurl --output flag)\nExample: %%output=response.html',
+                'TEST': '%%test magic line\nRuns the asserts without sending the response bodies, and shows one pass/fail line per entry (equivalent to hurl --test flag)',
             }.get(word, '')
+        elif line.strip() == f'[{name}]' and word in sections_docs:
+            # [Options] is a section, OPTIONS at the start of a request a method
+            doc_text = sections_docs[word]
+        elif word in http_methods_docs and context == 'request':
+            doc_text = f"HTTP {word} Method\n\n{http_methods_docs[word]}"
+        elif context in ('Captures', 'Asserts') and name in QUERY_ARGS | FILTER_ARGS | PREDICATE_ARGS:
+            doc_text = self._grammar_doc(name, context, line)
         elif word in http_methods_docs:
             doc_text = f"HTTP {word} Method\n\n{http_methods_docs[word]}"
         elif word in sections_docs:
@@ -407,6 +2326,23 @@ class HurlKernel(Kernel):
             'metadata': {}
         }
 
+    @staticmethod
+    def _grammar_doc(name, context, line):
+        """Describe a query, filter or predicate of a [Captures] or [Asserts] line."""
+        words = line.split()
+        if context == 'Captures' and words:
+            words = words[1:]  # The variable name
+        if words and words[0] == name and name in QUERY_ARGS:
+            kind, count = 'query', QUERY_ARGS[name]
+        elif name in FILTER_ARGS:
+            kind, count = 'filter', FILTER_ARGS[name]
+        elif name in PREDICATE_ARGS:
+            kind, count = 'predicate', PREDICATE_ARGS[name]
+        else:
+            kind, count = 'query', QUERY_ARGS[name]
+        arguments = {0: 'no argument', 1: '1 argument'}.get(count, f'{count} arguments')
+        return f"{name} {kind} (takes {arguments})\nSee https://hurl.dev/docs/grammar.html"
+
 
 if __name__ == "__main__":
     from ipykernel.kernelapp import IPKernelApp
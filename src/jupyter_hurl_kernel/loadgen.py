@@ -0,0 +1,383 @@
+"""Multi-process load generator driving hurl."""
+
+import html
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+from .histogram import LatencyHistogram
+from .report import call_status, call_total_us, iter_calls
+
+# Length of a pacing round when a request rate is targeted
+ROUND_SECONDS = 1.0
+
+# Iterations per hurl invocation and per parallel job when no rate is targeted
+ITERATIONS_PER_JOB = 20
+
+# How often workers report progress
+PROGRESS_INTERVAL = 1.0
+
+# Number of distinct error messages kept per worker
+MAX_ERROR_SAMPLES = 5
+
+# Start of the error output of a hurl invocation kept to report its failure
+STDERR_HEAD_SIZE = 4096
+
+# How often a running invocation checks the stop event and the deadline
+STOP_CHECK_INTERVAL = 0.1
+
+
+@dataclass
+class WorkerSpec:
+    """What one load worker has to do."""
+
+    worker_id: int
+    hurl_file: str
+    extra_args: list
+    jobs: int
+    start_delay: float
+    duration: float | None
+    iterations: int | None
+    rate: float | None
+    features: frozenset = frozenset()
+
+
+def plan_workers(hurl_file, extra_args, concurrency, workers, duration,
+                 iterations, rate, ramp_up, features=frozenset()):
+    """Split a load test over worker processes.
+
+    Args:
+        hurl_file: Hurl file to run
+        extra_args: Additional hurl arguments (e.g. variables)
+        concurrency: Total number of requests in flight
+        workers: Number of worker processes
+        duration: Length of the test in seconds, or None
+        iterations: Total number of runs of the file, or None
+        rate: Target runs of the file per second over all workers, or None
+        ramp_up: Seconds over which the workers are started
+        features: hurl options supported by the installed binary
+
+    Returns:
+        list: One WorkerSpec per worker
+    """
+    workers = max(1, min(workers, concurrency))
+    specs = []
+    for worker_id in range(workers):
+        # Spread the remainders over the first workers
+        jobs = concurrency // workers + (worker_id < concurrency % workers)
+        share = None
+        if iterations is not None:
+            share = iterations // workers + (worker_id < iterations % workers)
+        specs.append(WorkerSpec(
+            worker_id=worker_id,
+            hurl_file=hurl_file,
+            extra_args=list(extra_args),
+            jobs=jobs,
+            start_delay=ramp_up * worker_id / workers,
+            duration=duration,
+            iterations=share,
+            rate=rate * jobs / concurrency if rate else None,
+            features=frozenset(features),
+        ))
+    return specs
+
+
+class _WorkerState:
+    """Counters of a worker, sent back to the kernel as plain data."""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.histogram = LatencyHistogram()
+        self.runs = 0
+        self.failed_runs = 0
+        self.requests = 0
+        self.statuses = {}
+        self.errors = []
+
+    def record(self, result):
+        self.runs += 1
+        if not result.get("success", False):
+            self.failed_runs += 1
+        for _, call in iter_calls(result):
+            self.requests += 1
+            total = call_total_us(call)
+            if total is not None:
+                self.histogram.record(total)
+            status = str(call_status(call) or "none")
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def error(self, message):
+        message = message.strip()
+        if message and message not in self.errors and len(self.errors) < MAX_ERROR_SAMPLES:
+            self.errors.append(message)
+
+    def to_dict(self):
+        return {
+            "worker_id": self.worker_id,
+            "histogram": self.histogram.to_dict(),
+            "runs": self.runs,
+            "failed_runs": self.failed_runs,
+            "requests": self.requests,
+            "statuses": self.statuses,
+            "errors": self.errors,
+        }
+
+
+def _run_round(spec, state, repeat, stop, deadline):
+    """Run the file `repeat` times in one hurl invocation."""
+    cmd = ["hurl", "--json", "--no-color"]
+    if spec.jobs > 1 and "--parallel" in spec.features:
+        cmd.extend(["--parallel", "--jobs", str(spec.jobs)])
+    cmd.extend(spec.extra_args)
+    if "--repeat" in spec.features:
+        cmd.extend(["--repeat", str(repeat), spec.hurl_file])
+    else:
+        # Older hurl: the same file can be given several times
+        cmd.extend([spec.hurl_file] * repeat)
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=(os.name == "posix"),
+    )
+    # stderr is drained while stdout is read, so that a hurl writing many
+    # errors never blocks on a full pipe; the watchdog stops the process even
+    # if it prints nothing
+    head = bytearray()
+    killed = threading.Event()
+    threads = [
+        threading.Thread(target=_drain, args=(process.stderr, head), daemon=True),
+        threading.Thread(
+            target=_watchdog, args=(process, stop, deadline, killed), daemon=True
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for line in process.stdout:
+            try:
+                state.record(json.loads(line))
+            except ValueError:
+                continue
+        returncode = process.wait()
+        threads[0].join()
+        stderr = head.decode("utf-8", errors="replace").strip()
+        if returncode != 0 and stderr and not killed.is_set():
+            # The first line of a hurl error names the failure
+            state.error(stderr.splitlines()[0])
+    finally:
+        if process.poll() is None:
+            _kill(process)
+            process.wait()
+        for thread in threads:
+            thread.join()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def _drain(pipe, head):
+    """Read a pipe until EOF, keeping its first STDERR_HEAD_SIZE bytes in `head`."""
+    while True:
+        data = pipe.read1(64 * 1024)
+        if not data:
+            return
+        head.extend(data[:STDERR_HEAD_SIZE - len(head)])
+
+
+def _watchdog(process, stop, deadline, killed):
+    """Kill a hurl invocation once the test is stopped or past its deadline.
+
+    Returns when the process exits; sets `killed` if it killed it.
+    """
+    while process.poll() is None:
+        if stop.wait(STOP_CHECK_INTERVAL) or (
+            deadline is not None and time.monotonic() >= deadline
+        ):
+            killed.set()
+            _kill(process)
+            return
+
+
+def _kill(process):
+    """Kill a hurl invocation with its process group, which holds its pipes."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass  # Already gone
+
+
+def worker_main(spec, results, stop):
+    """Entry point of a load worker process."""
+    # Interrupts are handled by the kernel, which sets `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    state = _WorkerState(spec.worker_id)
+    if stop.wait(spec.start_delay):
+        results.put(("done", state.to_dict()))
+        return
+    started = time.monotonic()
+    deadline = started + spec.duration if spec.duration else None
+    remaining = spec.iterations
+    last_progress = started
+    while not stop.is_set():
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            break
+        if remaining is not None and remaining <= 0:
+            break
+        if spec.rate:
+            repeat = max(1, round(spec.rate * ROUND_SECONDS))
+        else:
+            repeat = spec.jobs * ITERATIONS_PER_JOB
+        if remaining is not None:
+            repeat = min(repeat, remaining)
+        runs_before = state.runs
+        _run_round(spec, state, repeat, stop, deadline)
+        if remaining is not None:
+            remaining -= max(state.runs - runs_before, 1)
+        if spec.rate:
+            # Wait for the end of the round to hold the target rate
+            pause = now + ROUND_SECONDS - time.monotonic()
+            if deadline is not None:
+                pause = min(pause, deadline - time.monotonic())
+            if pause > 0 and stop.wait(pause):
+                break
+        if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+            last_progress = time.monotonic()
+            results.put(("progress", state.to_dict()))
+    results.put(("done", state.to_dict()))
+
+
+class LoadTest:
+    """A set of worker processes running the same hurl file."""
+
+    def __init__(self, specs):
+        # Never fork the kernel: it runs threads and holds ZMQ sockets
+        self._context = multiprocessing.get_context("spawn")
+        self.specs = specs
+        self.results = self._context.Queue()
+        self.stop = self._context.Event()
+        self.started_at = None
+        self._processes = []
+        self.workers = {}
+
+    def start(self):
+        """Start the workers."""
+        self.started_at = time.monotonic()
+        for spec in self.specs:
+            process = self._context.Process(
+                target=worker_main, args=(spec, self.results, self.stop), daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+    def interrupt(self):
+        """Ask every worker to stop; safe to call from a signal handler."""
+        self.stop.set()
+
+    @property
+    def elapsed(self):
+        """Seconds since the workers were started."""
+        return time.monotonic() - self.started_at if self.started_at else 0.0
+
+    def poll(self):
+        """Collect pending worker messages.
+
+        Returns:
+            bool: True once every worker has finished
+        """
+        while True:
+            try:
+                kind, data = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.workers[data["worker_id"]] = (kind, data)
+        done = sum(kind == "done" for kind, _ in self.workers.values())
+        if done < len(self.specs) and not any(p.is_alive() for p in self._processes):
+            # A worker died without reporting; do not wait for it forever
+            return True
+        return done == len(self.specs)
+
+    def join(self, timeout=1.0):
+        """Reap the worker processes."""
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def summary(self):
+        """Merge the results reported so far."""
+        histogram = LatencyHistogram()
+        totals = {"runs": 0, "failed_runs": 0, "requests": 0}
+        statuses = {}
+        errors = []
+        for _, data in self.workers.values():
+            histogram.merge(LatencyHistogram.from_dict(data["histogram"]))
+            for key in totals:
+                totals[key] += data[key]
+            for status, count in data["statuses"].items():
+                statuses[status] = statuses.get(status, 0) + count
+            errors.extend(e for e in data["errors"] if e not in errors)
+        elapsed = self.elapsed
+        return {
+            "elapsed": elapsed,
+            "histogram": histogram,
+            "statuses": statuses,
+            "errors": errors,
+            "throughput": totals["requests"] / elapsed if elapsed else 0.0,
+            "error_rate": totals["failed_runs"] / totals["runs"] if totals["runs"] else 0.0,
+            **totals,
+        }
+
+
+def format_summary(summary, running=False):
+    """Render a load test summary as (text, html)."""
+    histogram = summary["histogram"]
+
+    def ms(value):
+        return "-" if value is None else f"{value / 1000:.2f}"
+
+    rows = [
+        ("Elapsed", f"{summary['elapsed']:.1f} s"),
+        ("Requests", f"{summary['requests']}"),
+        ("Throughput", f"{summary['throughput']:.1f} req/s"),
+        ("Runs (failed)", f"{summary['runs']} ({summary['failed_runs']})"),
+        ("Error rate", f"{100 * summary['error_rate']:.2f} %"),
+        ("Latency min / mean / max", f"{ms(histogram.min)} / {ms(histogram.mean)} / {ms(histogram.max)} ms"),
+    ]
+    for percent in (50, 90, 99, 99.9):
+        rows.append((f"p{percent:g}", f"{ms(histogram.percentile(percent))} ms"))
+    if summary["statuses"]:
+        statuses = ", ".join(
+            f"{status}: {count}" for status, count in sorted(summary["statuses"].items())
+        )
+        rows.append(("Status codes", statuses))
+    title = "Load test running..." if running else "Load test results"
+    width = max(len(label) for label, _ in rows)
+    text = title + "\n" + "".join(f"{label:<{width}}  {value}\n" for label, value in rows)
+    html_rows = "".join(
+        f"<tr><th style='text-align:left'>{label}</th><td>{value}</td></tr>"
+        for label, value in rows
+    )
+    markup = f"<b>{title}</b><table>{html_rows}</table>"
+    if summary["errors"]:
+        text += "Errors:\n" + "".join(f"  {error}\n" for error in summary["errors"])
+        markup += "<b>Errors</b><ul>" + "".join(
+            f"<li><code>{html.escape(error)}</code></li>" for error in summary["errors"]
+        ) + "</ul>"
+    return text, markup
+
+
+def default_workers(concurrency):
+    """Number of worker processes for a given concurrency: one per core at most."""
+    return max(1, min(os.cpu_count() or 1, concurrency))
@@ -0,0 +1,74 @@
+"""Helpers for parsing the arguments of %% magic lines."""
+
+import re
+import shlex
+
+_SIZE_UNITS = {
+    "": 1,
+    "b": 1,
+    "k": 1024,
+    "kb": 1024,
+    "m": 1024 ** 2,
+    "mb": 1024 ** 2,
+    "g": 1024 ** 3,
+    "gb": 1024 ** 3,
+}
+
+_DURATION_UNITS = {
+    "": 1.0,
+    "ms": 0.001,
+    "s": 1.0,
+    "m": 60.0,
+    "min": 60.0,
+    "h": 3600.0,
+    "d": 86400.0,
+}
+
+_NUMBER_WITH_UNIT = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$")
+
+
+def parse_magic_args(text):
+    """Split the arguments of a magic line.
+
+    Args:
+        text: Everything after the magic name, e.g. 'save ttl=600 name="a b"'
+
+    Returns:
+        tuple: (words, params) where words is the list of bare arguments and
+            params maps each key=value argument to its (unquoted) value
+    """
+    words = []
+    params = {}
+    for token in shlex.split(text or ""):
+        key, sep, value = token.partition("=")
+        if sep and key:
+            params[key] = value
+        else:
+            words.append(token)
+    return words, params
+
+
+def parse_size(value):
+    """Parse a byte size such as '512', '64KB' or '10MB'.
+
+    Raises:
+        ValueError: If the value is not a valid size
+    """
+    match = _NUMBER_WITH_UNIT.match(str(value))
+    unit = match.group(2).lower() if match else None
+    if unit not in _SIZE_UNITS:
+        raise ValueError(f"Invalid size: {value!r} (expected e.g. 512, 64KB, 10MB)")
+    return int(float(match.group(1)) * _SIZE_UNITS[unit])
+
+
+def parse_duration(value):
+    """Parse a duration in seconds such as '30', '500ms', '5s' or '2m'.
+
+    Raises:
+        ValueError: If the value is not a valid duration
+    """
+    match = _NUMBER_WITH_UNIT.match(str(value))
+    unit = match.group(2).lower() if match else None
+    if unit not in _DURATION_UNITS:
+        raise ValueError(f"Invalid duration: {value!r} (expected e.g. 30, 500ms, 5s, 2m)")
+    return float(match.group(1)) * _DURATION_UNITS[unit]
@@ -0,0 +1,234 @@
+"""Per-cell execution metrics of the kernel."""
+
+import html
+import json
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Timed phases of a cell, in execution order
+PHASES = ("parse", "write", "spawn", "hurl", "send", "total")
+
+PHASE_DESCRIPTIONS = {
+    "parse": "magic parsing",
+    "write": "temporary files",
+    "spawn": "process spawn",
+    "hurl": "hurl wall time",
+    "send": "iopub sends",
+    "total": "whole cell",
+}
+
+_STREAMS = ("stdout", "stderr")
+
+_QUANTILES = (0.5, 0.9, 0.99)
+
+
+@dataclass
+class CellMetrics:
+    """What one cell execution cost.
+
+    Phases are in seconds; a phase the cell did not go through (e.g. spawn
+    for a cached result) is absent.
+    """
+
+    started: float = field(default_factory=time.time)
+    kind: str = "normal"
+    status: str = "ok"
+    phases: dict = field(default_factory=dict)
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+
+    def add(self, phase, seconds):
+        """Add time to a phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class MetricsRecorder:
+    """Keeps the metrics of the last cells in a ring buffer.
+
+    Totals since the kernel started are kept besides the buffer, so that
+    exported counters never go backwards. Every cell can also be appended
+    to a JSON-lines log.
+    """
+
+    def __init__(self, capacity=1000, log_path=None):
+        self.cells = deque(maxlen=capacity)
+        self.log_path = log_path
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._sums = {phase: 0.0 for phase in PHASES}
+        self._phase_counts = {phase: 0 for phase in PHASES}
+        self._bytes = {name: 0 for name in _STREAMS}
+
+    def record(self, metrics):
+        """Store the metrics of a finished cell."""
+        with self._lock:
+            self.cells.append(metrics)
+            key = (metrics.kind, metrics.status)
+            self._counts[key] = self._counts.get(key, 0) + 1
+            for phase, seconds in metrics.phases.items():
+                self._sums[phase] += seconds
+                self._phase_counts[phase] += 1
+            self._bytes["stdout"] += metrics.stdout_bytes
+            self._bytes["stderr"] += metrics.stderr_bytes
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(metrics)) + "\n")
+            except OSError:
+                pass  # Metrics must never break a cell
+
+    def clear(self):
+        """Empty the ring buffer (the exported totals are kept)."""
+        with self._lock:
+            self.cells.clear()
+
+    def summary(self):
+        """Aggregate the buffered cells.
+
+        Returns:
+            dict: 'cells' (count), 'kinds' ({(kind, status): count}), and for
+                every phase and byte stream with samples, a dict with count,
+                mean, the 50th, 90th and 99th percentiles and max
+        """
+        with self._lock:
+            cells = list(self.cells)
+        kinds = {}
+        for cell in cells:
+            kinds[(cell.kind, cell.status)] = kinds.get((cell.kind, cell.status), 0) + 1
+        series = {phase: [c.phases[phase] for c in cells if phase in c.phases] for phase in PHASES}
+        for name in _STREAMS:
+            series[f"{name}_bytes"] = [getattr(c, f"{name}_bytes") for c in cells]
+        stats = {}
+        for name, values in series.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            stats[name] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": percentile(ordered, 0.5),
+                "p90": percentile(ordered, 0.9),
+                "p99": percentile(ordered, 0.99),
+                "max": ordered[-1],
+            }
+        return {"cells": len(cells), "kinds": kinds, "stats": stats}
+
+    def prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        summary = self.summary()
+        with self._lock:
+            counts = dict(self._counts)
+            sums = dict(self._sums)
+            phase_counts = dict(self._phase_counts)
+            output_bytes = dict(self._bytes)
+        lines = [
+            "# HELP hurl_kernel_cells_total Cells executed since the kernel started.",
+            "# TYPE hurl_kernel_cells_total counter",
+        ]
+        for (kind, status), count in sorted(counts.items()):
+            lines.append(f'hurl_kernel_cells_total{{kind="{kind}",status="{status}"}} {count}')
+        lines += [
+            "# HELP hurl_kernel_cell_phase_seconds Time spent in each phase of a cell; "
+            "quantiles cover the most recent cells.",
+            "# TYPE hurl_kernel_cell_phase_seconds summary",
+        ]
+        for phase in PHASES:
+            stats = summary["stats"].get(phase)
+            if stats:
+                for quantile in _QUANTILES:
+                    value = stats[f"p{quantile * 100:g}"]
+                    lines.append(
+                        f'hurl_kernel_cell_phase_seconds{{phase="{phase}",quantile="{quantile:g}"}} {value:.6f}'
+                    )
+            lines.append(f'hurl_kernel_cell_phase_seconds_sum{{phase="{phase}"}} {sums[phase]:.6f}')
+            lines.append(f'hurl_kernel_cell_phase_seconds_count{{phase="{phase}"}} {phase_counts[phase]}')
+        lines += [
+            "# HELP hurl_kernel_output_bytes_total Bytes of hurl output received.",
+            "# TYPE hurl_kernel_output_bytes_total counter",
+        ]
+        for name in _STREAMS:
+            lines.append(f'hurl_kernel_output_bytes_total{{stream="{name}"}} {output_bytes[name]}')
+        lines += [
+            "# HELP hurl_kernel_start_time_seconds Start time of the kernel since the epoch.",
+            "# TYPE hurl_kernel_start_time_seconds gauge",
+            f"hurl_kernel_start_time_seconds {self.started:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def format_stats(summary):
+    """Render a metrics summary as (text, html)."""
+    if not summary["cells"]:
+        text = "No cells recorded yet\n"
+        return text, f"<pre>{text}</pre>"
+    columns = ("Metric", "Count", "Mean", "p50", "p90", "p99", "Max")
+    rows = []
+    for name, stats in summary["stats"].items():
+        if name.endswith("_bytes"):
+            label = name.replace("_", " ")
+            values = [f"{stats[key]:.0f}" for key in ("mean", "p50", "p90", "p99", "max")]
+        else:
+            label = f"{name} ({PHASE_DESCRIPTIONS[name]}), ms"
+            values = [f"{stats[key] * 1000:.2f}" for key in ("mean", "p50", "p90", "p99", "max")]
+        rows.append([label, str(stats["count"])] + values)
+    widths = [max(len(c), *(len(r[i]) for r in rows)) for i, c in enumerate(columns)]
+    kinds = ", ".join(
+        f"{kind} {status}: {count}" for (kind, status), count in sorted(summary["kinds"].items())
+    )
+    title = f"Kernel metrics over the last {summary['cells']} cell(s) ({kinds})"
+    text = title + "\n" + "  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip() + "\n"
+    text += "".join(
+        "  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() + "\n" for r in rows
+    )
+    header = "".join(f"<th>{c}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(v)}</td>" for v in r) + "</tr>" for r in rows
+    )
+    return text, f"<b>{html.escape(title)}</b><table><tr>{header}</tr>{body}</table>"
+
+
+class MetricsServer:
+    """Serves the metrics to Prometheus on http://host:port/metrics."""
+
+    def __init__(self, recorder, port, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="hurl-metrics", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def port(self):
+        """Port the server listens on."""
+        return self._server.server_address[1]
+
+    def close(self):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,708 @@
+"""Tolerant, incremental parser of Hurl files.
+
+The parser turns a cell into a Document of entries (request, optional
+response, their sections, captures and asserts) and never raises: problems
+are collected as ParseError with a line and column, so that the same
+Document can drive completion while the user is typing and validation
+before execution.
+
+Entries are parsed independently and cached by content, so editing one
+entry of a large cell only re-parses that entry.
+"""
+
+import bisect
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+# Queries and the number of arguments they take
+QUERY_ARGS = {
+    'status': 0, 'version': 0, 'url': 0, 'body': 0, 'bytes': 0, 'duration': 0,
+    'sha256': 0, 'md5': 0, 'ip': 0, 'redirects': 0,
+    'header': 1, 'cookie': 1, 'xpath': 1, 'jsonpath': 1, 'regex': 1,
+    'variable': 1, 'certificate': 1,
+}
+
+# Filters and the number of arguments they take
+FILTER_ARGS = {
+    'base64Decode': 0, 'base64Encode': 0, 'base64UrlSafeDecode': 0,
+    'base64UrlSafeEncode': 0, 'charsetDecode': 1, 'count': 0, 'dateFormat': 1,
+    'daysAfterNow': 0, 'daysBeforeNow': 0, 'decode': 1, 'first': 0, 'format': 1, 'htmlEscape': 0, 'htmlUnescape': 0,
+    'jsonpath': 1, 'last': 0, 'location': 0, 'nth': 1, 'regex': 1, 'replace': 2,
+    'replaceRegex': 2, 'split': 1, 'toDate': 1, 'toFloat': 0, 'toHex': 0,
+    'toInt': 0, 'toString': 0, 'urlDecode': 0, 'urlEncode': 0,
+    'urlQueryParam': 1, 'utf8Decode': 0, 'utf8Encode': 0, 'xpath': 1,
+}
+
+# Predicates and the number of values they take
+PREDICATE_ARGS = {
+    '==': 1, '!=': 1, '>': 1, '>=': 1, '<': 1, '<=': 1, 'startsWith': 1,
+    'endsWith': 1, 'contains': 1, 'includes': 1, 'matches': 1, 'exists': 0,
+    'isBoolean': 0, 'isCollection': 0, 'isDate': 0, 'isEmpty': 0, 'isFloat': 0,
+    'isInteger': 0, 'isIpv4': 0, 'isIpv6': 0, 'isIsoDate': 0, 'isList': 0,
+    'isNumber': 0, 'isObject': 0, 'isString': 0, 'isUuid': 0,
+}
+
+# Keys of an [Options] section
+OPTION_NAMES = (
+    'aws-sigv4', 'cacert', 'cert', 'compressed', 'connect-timeout', 'connect-to',
+    'delay', 'header', 'http1.0', 'http1.1', 'http2', 'http3', 'insecure', 'ipv4',
+    'ipv6', 'key', 'limit-rate', 'location', 'location-trusted', 'max-redirs',
+    'max-time', 'netrc', 'netrc-file', 'netrc-optional', 'output', 'path-as-is',
+    'pinnedpubkey', 'proxy', 'repeat', 'resolve', 'retry', 'retry-interval',
+    'skip', 'unix-socket', 'user', 'variable', 'verbose', 'very-verbose',
+)
+
+# Sections of a request, with their aliases, and of a response
+REQUEST_SECTIONS = (
+    'QueryStringParams', 'Query', 'FormParams', 'Form', 'MultipartFormData',
+    'Multipart', 'Cookies', 'BasicAuth', 'Options',
+)
+RESPONSE_SECTIONS = ('Captures', 'Asserts')
+
+# Functions that can be used in templates instead of a variable
+TEMPLATE_FUNCTIONS = ('newDate', 'newUuid', 'getEnv')
+
+_REQUEST_LINE = re.compile(r"^\s*(?P<method>[A-Z]+)(?:\s+(?P<url>\S.*?))?\s*$")
+_STATUS_LINE = re.compile(r"^\s*(?P<version>HTTP(?:/[\d.]+)?)(?:\s+(?P<status>\S+))?\s*$")
+_SECTION_LINE = re.compile(r"^\s*\[(?P<name>[A-Za-z]+)\]\s*$")
+_KEY_VALUE = re.compile(r"^\s*(?P<key>[^\s:]+)\s*:(?P<value>.*)$")
+_CAPTURE = re.compile(r"^\s*(?P<name>[A-Za-z_][\w-]*)\s*:(?P<rest>.*)$")
+_TEMPLATE = re.compile(r"\{\{\s*([A-Za-z_][\w-]*)")
+_FENCE = "```"
+
+# The error report of hurl and hurlfmt: "error: <message>", a "--> file:line:column"
+# location, then the source line with a caret and a detail under it
+_HURL_ERROR_START = re.compile(r"^(?=error:)", re.MULTILINE)
+_HURL_LOCATION = re.compile(r"^\s*-->\s*(?:.*:)?(\d+):(\d+)\s*$", re.MULTILINE)
+_HURL_CARET = re.compile(r"^\s*\|\s*\^+ *(.*)$", re.MULTILINE)
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<unterminated>"(?:[^"\\]|\\.)*$)
+  | (?P<template>\{\{.*?\}\})
+  | (?P<multiline>```.*?```|`[^`]*`)
+  | (?P<regex>/(?:[^/\\\s]|\\.)(?:[^/\\]|\\.)*/)
+  | (?P<comment>\#.*)
+  | (?P<word>[^\s"]+)
+""", re.VERBOSE)
+
+_NO_ENTRY = object()
+
+
+@dataclass
+class ParseError:
+    """A problem found in the code, at a 1-based line and column.
+
+    `incomplete` is True when more input could fix it, e.g. an unterminated
+    multi-line string.
+    """
+
+    line: int
+    column: int
+    message: str
+    incomplete: bool = False
+
+
+@dataclass
+class Token:
+    """A token of a capture or assert line."""
+
+    kind: str
+    text: str
+    column: int
+
+
+@dataclass
+class Query:
+    type: str
+    argument: str | None = None
+
+
+@dataclass
+class Filter:
+    name: str
+    arguments: list = field(default_factory=list)
+
+
+@dataclass
+class Predicate:
+    name: str
+    value: str | None = None
+    negated: bool = False
+
+
+# Line numbers below are relative to the first line of their entry (0)
+
+
+@dataclass
+class KeyValue:
+    """A header, or an item of a key-value section."""
+
+    line: int
+    key: str
+    value: str
+
+
+@dataclass
+class Capture:
+    line: int
+    name: str
+    query: Query
+    filters: list = field(default_factory=list)
+    redact: bool = False
+
+
+@dataclass
+class Assert:
+    line: int
+    query: Query
+    filters: list = field(default_factory=list)
+    predicate: Predicate | None = None
+
+
+@dataclass
+class Section:
+    line: int
+    name: str
+    items: list = field(default_factory=list)
+
+
+@dataclass
+class Body:
+    line: int
+    end_line: int
+    kind: str
+    text: str
+
+
+@dataclass
+class Response:
+    line: int
+    version: str
+    status: str
+    headers: list = field(default_factory=list)
+    sections: list = field(default_factory=list)
+    body: Body | None = None
+
+
+@dataclass
+class Entry:
+    """A request and its optional response.
+
+    `line` is the absolute, 1-based line of the request; the line numbers of
+    everything inside the entry are relative to it.
+    """
+
+    line: int
+    line_count: int
+    method: str
+    url: str
+    headers: list = field(default_factory=list)
+    sections: list = field(default_factory=list)
+    body: Body | None = None
+    response: Response | None = None
+    variables: frozenset = frozenset()
+    # (relative line, context) pairs, see Document.context_at
+    regions: list = field(default_factory=list)
+
+    @property
+    def captures(self):
+        """Captures of the entry's response."""
+        if self.response is None:
+            return []
+        return [
+            item for section in self.response.sections if section.name == 'Captures'
+            for item in section.items
+        ]
+
+    @property
+    def asserts(self):
+        """Explicit asserts of the entry's response."""
+        if self.response is None:
+            return []
+        return [
+            item for section in self.response.sections if section.name == 'Asserts'
+            for item in section.items
+        ]
+
+
+@dataclass
+class Document:
+    """A parsed cell."""
+
+    entries: list
+    errors: list
+    # (line, text) of the magic lines, which the parser otherwise ignores
+    magics: list
+
+    @property
+    def methods(self):
+        """Methods of the requests, in order."""
+        return [entry.method for entry in self.entries]
+
+    @property
+    def captures(self):
+        """Every capture of the cell, in order."""
+        return [capture for entry in self.entries for capture in entry.captures]
+
+    @property
+    def has_captures(self):
+        """True if the cell captures values."""
+        return any(entry.captures for entry in self.entries)
+
+    @property
+    def variables(self):
+        """Names of the variables the cell refers to."""
+        return set().union(*(entry.variables for entry in self.entries))
+
+    @property
+    def incomplete(self):
+        """True if the cell ends inside an unterminated construct."""
+        return any(error.incomplete for error in self.errors)
+
+    def entry_at(self, line):
+        """Return the entry holding a 1-based line, or None."""
+        index = bisect.bisect_right([entry.line for entry in self.entries], line) - 1
+        if index < 0:
+            return None
+        entry = self.entries[index]
+        return entry if line < entry.line + entry.line_count else None
+
+    def context_at(self, line):
+        """Describe where a 1-based line is.
+
+        Returns:
+            str: None outside of any entry, 'request' on the request line and
+                its headers, 'body' in a body, 'response' on the status line
+                and the response headers, or the name of the section
+                (e.g. 'Asserts')
+        """
+        entry = self.entry_at(line)
+        if entry is None:
+            return None
+        relative = line - entry.line
+        index = bisect.bisect_right([start for start, _ in entry.regions], relative) - 1
+        return entry.regions[index][1]
+
+
+def tokenize(text, column=1):
+    """Split a capture or assert line into tokens, dropping spaces and comments."""
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        kind = match.lastgroup
+        if kind not in ('space', 'comment'):
+            tokens.append(Token(kind, match.group(), column + position))
+        position = match.end()
+    return tokens
+
+
+class _EntryParser:
+    """Parses the lines of one entry; line numbers are relative to it."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.errors = []
+        self.regions = []
+
+    def error(self, line, column, message, incomplete=False):
+        self.errors.append(ParseError(line, column, message, incomplete))
+
+    def parse(self):
+        lines = self.lines
+        request = _REQUEST_LINE.match(lines[0])
+        url = request.group('url') or ''
+        if not url:
+            self.error(0, len(lines[0].rstrip()) + 1, f"expected a URL after {request.group('method')}")
+        entry = Entry(line=0, line_count=len(lines), method=request.group('method'), url=url)
+        self.regions.append((0, 'request'))
+        target = entry            # receives headers, sections and body
+        section = None
+        after_body = False
+        index = 1
+        while index < len(lines):
+            line = lines[index]
+            stripped = line.strip()
+            column = len(line) - len(line.lstrip()) + 1
+            if not stripped or stripped.startswith(('#', '%%')):
+                index += 1
+                continue
+
+            status = _STATUS_LINE.match(line)
+            if status:
+                if entry.response is not None:
+                    self.error(index, column, "duplicate HTTP status line")
+                status_code = status.group('status') or ''
+                if not (status_code == '*' or (status_code.isdigit() and len(status_code) == 3)):
+                    self.error(index, column, "expected a status code such as 200 or * after HTTP")
+                entry.response = Response(index, status.group('version'), status_code)
+                self.regions.append((index, 'response'))
+                target, section, after_body = entry.response, None, False
+                index += 1
+                continue
+
+            if after_body:
+                self.error(index, column, "unexpected content after the body")
+                index += 1
+                continue
+
+            # '[true]' or a lone '[' start a JSON body: only known section
+            # names, or names no JSON value can spell, make a section header
+            header = _SECTION_LINE.match(line)
+            if header and not _is_section_name(header.group('name')):
+                header = None
+            if header:
+                name = header.group('name')
+                in_response = target is entry.response
+                if name in RESPONSE_SECTIONS and not in_response:
+                    self.error(index, column, f"[{name}] must follow an HTTP status line")
+                elif name in REQUEST_SECTIONS and in_response:
+                    self.error(index, column, f"[{name}] must come before the HTTP status line")
+                elif name not in REQUEST_SECTIONS + RESPONSE_SECTIONS:
+                    self.error(index, column, f"unknown section [{name}]")
+                section = Section(index, name)
+                target.sections.append(section)
+                self.regions.append((index, name))
+                index += 1
+                continue
+
+            if re.match(r"\[[A-Z][A-Za-z]*$", stripped):
+                self.error(index, column + len(stripped), "expected ']' to close the section name")
+                index += 1
+                continue
+
+            if stripped[0] in '{["<`' or re.match(r"(file|base64|hex),", stripped):
+                body, index = self.parse_body(index)
+                target.body = body
+                self.regions.append((body.line, 'body'))
+                after_body = True
+                if body.end_line + 1 < len(lines):
+                    self.regions.append((body.end_line + 1, 'response' if target is entry.response else 'request'))
+                continue
+
+            if section is None:
+                match = _KEY_VALUE.match(line)
+                if match:
+                    target.headers.append(KeyValue(index, match.group('key'), match.group('value').strip()))
+                else:
+                    self.error(index, column, "expected a header (name: value), a section or a body")
+            elif section.name == 'Captures':
+                self.parse_capture(section, index, line)
+            elif section.name == 'Asserts':
+                self.parse_assert(section, index, line)
+            elif section.name not in REQUEST_SECTIONS:
+                pass  # The items of an unknown section, already reported
+            else:
+                match = _KEY_VALUE.match(line)
+                if not match:
+                    self.error(index, column, f"expected 'name: value' in [{section.name}]")
+                elif section.name == 'Options' and match.group('key') not in OPTION_NAMES:
+                    self.error(index, column, f"unknown option {match.group('key')!r}")
+                else:
+                    section.items.append(KeyValue(index, match.group('key'), match.group('value').strip()))
+            index += 1
+
+        entry.regions = self.regions
+        return entry
+
+    def parse_body(self, index):
+        """Parse a body starting at index, returning (Body, next index)."""
+        lines = self.lines
+        first = lines[index]
+        stripped = first.strip()
+        column = len(first) - len(first.lstrip()) + 1
+        if stripped.startswith(_FENCE):
+            if len(stripped) > 3 and stripped.endswith(_FENCE) and stripped.count(_FENCE) >= 2:
+                return Body(index, index, 'multiline', stripped), index + 1
+            for end in range(index + 1, len(lines)):
+                if lines[end].strip().endswith(_FENCE):
+                    return Body(index, end, 'multiline', "\n".join(lines[index:end + 1])), end + 1
+            self.error(index, column, "unterminated multi-line string (missing ```)", incomplete=True)
+            return Body(index, len(lines) - 1, 'multiline', "\n".join(lines[index:])), len(lines)
+        if stripped.startswith('`'):
+            if len(stripped) < 2 or not stripped.endswith('`'):
+                self.error(index, column, "unterminated string (missing `)")
+            return Body(index, index, 'oneline', stripped), index + 1
+        if stripped.startswith(('file,', 'base64,', 'hex,')):
+            if not stripped.endswith(';'):
+                self.error(index, column + len(stripped), "expected ';' at the end of the body")
+            return Body(index, index, stripped.split(',', 1)[0], stripped), index + 1
+        if stripped.startswith('<'):
+            end = index
+            while end + 1 < len(lines) and not _STATUS_LINE.match(lines[end + 1]):
+                end += 1
+            return Body(index, end, 'xml', "\n".join(lines[index:end + 1])), end + 1
+        return self.parse_json(index, column)
+
+    def parse_json(self, index, column):
+        """Parse a JSON body by balancing brackets outside of strings."""
+        lines = self.lines
+        depth = 0
+        in_string = False
+        escaped = False
+        for end in range(index, len(lines)):
+            for char in lines[end]:
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == '\\':
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char in '{[':
+                    depth += 1
+                elif char in '}]':
+                    depth -= 1
+            if depth <= 0 and not in_string:
+                return Body(index, end, 'json', "\n".join(lines[index:end + 1])), end + 1
+        self.error(index, column, "unterminated JSON body", incomplete=True)
+        return Body(index, len(lines) - 1, 'json', "\n".join(lines[index:])), len(lines)
+
+    def parse_query(self, tokens, index):
+        """Parse the query at the start of tokens, returning (Query, rest)."""
+        if not tokens:
+            return None, tokens
+        token = tokens[0]
+        if token.kind != 'word' or token.text not in QUERY_ARGS:
+            self.error(index, token.column, f"unknown query {token.text!r}")
+            return None, tokens
+        query = Query(token.text)
+        rest = tokens[1:]
+        if QUERY_ARGS[token.text]:
+            if not rest or rest[0].kind not in ('string', 'regex', 'template'):
+                column = rest[0].column if rest else token.column + len(token.text)
+                self.error(index, column, f"query '{token.text}' expects a quoted argument")
+                return query, rest
+            query.argument = rest[0].text
+            rest = rest[1:]
+        return query, rest
+
+    def parse_filters(self, tokens, index):
+        """Parse the filters at the start of tokens, returning (filters, rest)."""
+        filters = []
+        while tokens and tokens[0].kind == 'word' and tokens[0].text in FILTER_ARGS:
+            name = tokens[0].text
+            count = FILTER_ARGS[name]
+            arguments = [token.text for token in tokens[1:1 + count]]
+            if len(arguments) < count:
+                self.error(index, tokens[0].column, f"filter '{name}' expects {count} argument(s)")
+            filters.append(Filter(name, arguments))
+            tokens = tokens[1 + count:]
+        return filters, tokens
+
+    def check_tokens(self, tokens, index):
+        for token in tokens:
+            if token.kind == 'unterminated':
+                self.error(index, token.column, "unterminated string (missing \")")
+                return False
+        return True
+
+    def parse_capture(self, section, index, line):
+        match = _CAPTURE.match(line)
+        if not match:
+            self.error(index, len(line) - len(line.lstrip()) + 1, "expected 'name: query' in [Captures]")
+            return
+        tokens = tokenize(match.group('rest'), match.start('rest') + 1)
+        if not self.check_tokens(tokens, index):
+            return
+        if not tokens:
+            self.error(index, match.end('rest') + 1, f"expected a query for capture {match.group('name')!r}")
+            return
+        query, tokens = self.parse_query(tokens, index)
+        if query is None:
+            return
+        filters, tokens = self.parse_filters(tokens, index)
+        redact = bool(tokens) and tokens[0].text == 'redact'
+        if redact:
+            tokens = tokens[1:]
+        if tokens:
+            self.error(index, tokens[0].column, f"unexpected {tokens[0].text!r}")
+        section.items.append(Capture(index, match.group('name'), query, filters, redact))
+
+    def parse_assert(self, section, index, line):
+        tokens = tokenize(line)
+        if not self.check_tokens(tokens, index):
+            return
+        query, tokens = self.parse_query(tokens, index)
+        if query is None:
+            return
+        filters, tokens = self.parse_filters(tokens, index)
+        negated = bool(tokens) and tokens[0].text == 'not'
+        if negated:
+            tokens = tokens[1:]
+        if not tokens:
+            self.error(index, len(line.rstrip()) + 1, "expected a predicate (==, contains, exists, ...)")
+            section.items.append(Assert(index, query, filters))
+            return
+        name = tokens[0].text
+        if name not in PREDICATE_ARGS:
+            self.error(index, tokens[0].column, f"unknown predicate {name!r}")
+            return
+        value = None
+        if PREDICATE_ARGS[name]:
+            if len(tokens) < 2:
+                self.error(index, len(line.rstrip()) + 1, f"predicate '{name}' expects a value")
+            else:
+                value = tokens[1].text
+        extra = tokens[1 + PREDICATE_ARGS[name]:]
+        if extra:
+            self.error(index, extra[0].column, f"unexpected {extra[0].text!r}")
+        section.items.append(Assert(index, query, filters, Predicate(name, value, negated)))
+
+
+def _is_section_name(name):
+    """Return whether '[name]' is a section header rather than a JSON array.
+
+    Known sections are headers, and so are other capitalized names, to
+    report a misspelled section: a JSON array cannot hold a bare word.
+    """
+    return name in REQUEST_SECTIONS + RESPONSE_SECTIONS or name[0].isupper()
+
+
+def _is_request_line(line):
+    match = _REQUEST_LINE.match(line)
+    return match is not None and not line.lstrip().startswith('HTTP')
+
+
+def split_entries(lines):
+    """Return the 0-based indexes at which entries start.
+
+    A request line inside a multi-line string does not start an entry.
+    """
+    starts = []
+    in_fence = False
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if in_fence:
+            if stripped.endswith(_FENCE):
+                in_fence = False
+            continue
+        if stripped.startswith(_FENCE) and not (len(stripped) > 3 and stripped.endswith(_FENCE)):
+            in_fence = True
+        elif stripped and stripped[0].isupper() and _is_request_line(line):
+            starts.append(index)
+    return starts
+
+
+def _parse_prelude(lines):
+    """Check the lines before the first entry: magics, comments and blanks."""
+    errors = []
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped and not stripped.startswith(('#', '%%')):
+            column = len(line) - len(line.lstrip()) + 1
+            errors.append(ParseError(index + 1, column, "expected a request line (METHOD URL)"))
+    return errors
+
+
+def _parse_entry(lines):
+    parser = _EntryParser(lines)
+    entry = parser.parse()
+    entry.variables = frozenset(
+        name for name in _TEMPLATE.findall("\n".join(lines))
+        if name not in TEMPLATE_FUNCTIONS
+    )
+    return entry, parser.errors
+
+
+class HurlParser:
+    """Parses cells, caching whole documents and individual entries."""
+
+    def __init__(self, max_documents=32, max_entries=1024):
+        self._documents = OrderedDict()
+        self._entries = OrderedDict()
+        self.max_documents = max_documents
+        self.max_entries = max_entries
+
+    @staticmethod
+    def _remember(cache, key, value, limit):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def parse(self, code):
+        """Parse a cell.
+
+        Returns:
+            Document: The parsed cell; treat it as read-only, it is shared
+                with later calls for the same code
+        """
+        key = hashlib.sha256(code.encode("utf-8", "surrogatepass")).digest()
+        document = self._documents.get(key)
+        if document is not None:
+            self._documents.move_to_end(key)
+            return document
+
+        lines = code.split("\n")
+        starts = split_entries(lines)
+        bounds = list(zip(starts, starts[1:] + [len(lines)]))
+        errors = _parse_prelude(lines[:starts[0] if starts else len(lines)])
+        magics = [
+            (index + 1, line.strip()) for index, line in enumerate(lines)
+            if line.lstrip().startswith('%%')
+        ]
+        entries = []
+        for start, end in bounds:
+            chunk = lines[start:end]
+            chunk_key = "\n".join(chunk)
+            cached = self._entries.get(chunk_key)
+            if cached is None:
+                cached = _parse_entry(chunk)
+            self._remember(self._entries, chunk_key, cached, self.max_entries)
+            entry, entry_errors = cached
+            entries.append(replace(entry, line=start + 1))
+            errors.extend(replace(error, line=error.line + start + 1) for error in entry_errors)
+
+        document = Document(entries, errors, magics)
+        self._remember(self._documents, key, document, self.max_documents)
+        return document
+
+
+def parse(code):
+    """Parse a cell without caching."""
+    return HurlParser(max_documents=0, max_entries=0).parse(code)
+
+
+def format_errors(code, errors):
+    """Render parse errors as compiler-style diagnostics.
+
+    Returns:
+        list: One string per error: "line L, column C: message", then the
+            offending line and a caret under the column
+    """
+    lines = code.split("\n")
+    rendered = []
+    for error in errors:
+        source = lines[error.line - 1] if 0 < error.line <= len(lines) else ""
+        rendered.append(
+            f"line {error.line}, column {error.column}: {error.message}\n"
+            f"    {source}\n"
+            f"    {' ' * (error.column - 1)}^"
+        )
+    return rendered
+
+
+def parse_hurl_errors(output):
+    """Read the errors reported by hurl or hurlfmt, without colours.
+
+    Returns:
+        list: ParseError for every error that gives a line and column
+    """
+    errors = []
+    for block in _HURL_ERROR_START.split(output):
+        location = _HURL_LOCATION.search(block)
+        if not block.startswith("error:") or location is None:
+            continue
+        message = block.split("\n", 1)[0][len("error:"):].strip()
+        detail = _HURL_CARET.search(block)
+        if detail and detail.group(1).strip():
+            message = f"{message}: {detail.group(1).strip()}"
+        errors.append(ParseError(int(location.group(1)), int(location.group(2)), message))
+    return errors
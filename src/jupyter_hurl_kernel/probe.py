@@ -0,0 +1,126 @@
+"""Detection of the installed hurl binary and of the options it supports."""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Options the kernel adapts to, newest hurl releases support all of them
+FEATURES = ("--parallel", "--json", "--report-json", "--repeat")
+
+# Seconds allowed for each of 'hurl --version' and 'hurl --help'
+PROBE_TIMEOUT = 5
+
+_OPTION = re.compile(r"(?<![\w-])(--[a-z][a-z0-9-]*)")
+
+
+def default_probe_cache():
+    """Return the file caching the result of the last probe."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "jupyter-hurl-kernel" / "hurl-probe.json"
+
+
+@dataclass
+class HurlInfo:
+    """What the kernel knows about the hurl binary.
+
+    `path` and `version` are None when hurl is not installed.
+    """
+
+    path: str | None = None
+    version: str | None = None
+    features: set = field(default_factory=set)
+
+    def supports(self, option):
+        """Return True if hurl accepts the given option (e.g. '--parallel')."""
+        return option in self.features
+
+
+def _binary_key(path):
+    """Identify a binary by its resolved path, size and modification time."""
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _run(path, option):
+    result = subprocess.run(
+        [path, option], capture_output=True, text=True, timeout=PROBE_TIMEOUT
+    )
+    return result.returncode, result.stdout
+
+
+def probe_hurl(cache_file=None):
+    """Find hurl in PATH and detect its version and supported options.
+
+    The result is cached on disk for as long as the binary is unchanged, so
+    the probe only runs hurl after an installation or an upgrade.
+
+    Args:
+        cache_file: File caching the result, see default_probe_cache()
+
+    Returns:
+        HurlInfo: The detected binary
+    """
+    located = shutil.which("hurl")
+    if located is None:
+        return HurlInfo()
+    path = os.path.realpath(located)
+    cache_file = Path(cache_file or default_probe_cache())
+    try:
+        key = _binary_key(path)
+    except OSError:
+        return HurlInfo()
+
+    try:
+        cached = json.loads(cache_file.read_text())
+        if cached["key"] == key:
+            return HurlInfo(path, cached["version"], set(cached["features"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    try:
+        returncode, output = _run(path, "--version")
+        version = output.strip() if returncode == 0 else "unknown"
+        returncode, output = _run(path, "--help")
+    except (OSError, subprocess.TimeoutExpired):
+        return HurlInfo()
+    options = set(_OPTION.findall(output)) if returncode == 0 else set()
+    info = HurlInfo(path, version, {option for option in FEATURES if option in options})
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temporary = cache_file.with_name(f".{cache_file.name}.{os.getpid()}")
+        temporary.write_text(json.dumps(
+            {"key": key, "version": info.version, "features": sorted(info.features)}
+        ))
+        os.replace(temporary, cache_file)
+    except OSError:
+        pass  # The probe just runs again next time
+    return info
+
+
+class BackgroundProbe:
+    """Runs probe_hurl in a thread so that it does not delay kernel start-up."""
+
+    def __init__(self, cache_file=None):
+        self._cache_file = cache_file
+        self._info = None
+        self._thread = threading.Thread(
+            target=self._probe, name="hurl-probe", daemon=True
+        )
+        self._thread.start()
+
+    def _probe(self):
+        try:
+            self._info = probe_hurl(self._cache_file)
+        except Exception:
+            self._info = HurlInfo()
+
+    def result(self):
+        """Return the probe result, waiting for the probe if it still runs."""
+        self._thread.join()
+        return self._info
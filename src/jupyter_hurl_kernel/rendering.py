@@ -0,0 +1,411 @@
+"""Content-type-aware rendering of response bodies as rich display data."""
+
+import html
+import json
+import re
+import tempfile
+import xml.sax
+from xml.sax.handler import ContentHandler, LexicalHandler, property_lexical_handler
+from xml.sax.saxutils import escape, quoteattr
+
+# Largest body held back to be rendered; larger ones are streamed as text.
+# The kernel also keeps it within max_output, whose memory bound it shares
+DEFAULT_MAX_SIZE = 5 * 1024 * 1024
+
+# Amount of a rendered body sent to the frontend; the first page of larger
+# bodies is shown, and the whole body is written to a file
+DEFAULT_PAGE_SIZE = 1024 * 1024
+
+# Characters of a long JSON string kept in a page
+MAX_STRING = 1000
+
+# Height in pixels of the HTML previews
+PREVIEW_HEIGHT = 400
+
+# Size of the chunks fed to the XML parser, between checks of the page size
+_XML_CHUNK = 64 * 1024
+
+# Colour escapes of hurl --color
+_ANSI = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]")
+
+# Start of an HTML document, or of a fragment the XML parser rejects
+_HTML = re.compile(r"<(?:!doctype\s+html|html|head|body|div|p|table)\b", re.IGNORECASE)
+
+# Characters read before giving up on finding the start of a body
+_SNIFF_SIZE = 64
+
+# Characters the JSON scanner looks at: brackets, quotes and escapes
+_JSON_STRUCTURE = re.compile(r'[{}\[\]"\\]')
+
+# An escape sequence cut at the end of a chunk
+_ANSI_PARTIAL = re.compile(r"\x1b(?:\[[0-9;?]*[ -/]*)?$")
+
+
+class _JsonScanner:
+    """Follow the nesting of JSON text fed in chunks.
+
+    Tells when a second top-level value starts after the first one, as in
+    JSON lines or a stream of events: such output is not one document.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        # True once the first top-level value is closed
+        self.closed = False
+        self._carry = ""
+
+    def feed(self, text):
+        """Scan a chunk; return True if it starts a second top-level value."""
+        text = _ANSI.sub("", self._carry + text)
+        partial = _ANSI_PARTIAL.search(text)
+        self._carry = partial.group() if partial else ""
+        if partial:
+            text = text[:partial.start()]
+        position = 0
+        while position < len(text):
+            if self.closed:
+                return bool(text[position:].strip())
+            if self.in_string:
+                match = _JSON_STRUCTURE.search(text, position)
+                if match is None:
+                    self.escaped = False
+                    return False
+                char = match.group()
+                if self.escaped:
+                    # The escaped character is the first one after the backslash
+                    self.escaped = False
+                    if match.start() == position:
+                        position += 1
+                        continue
+                if char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                position = match.end()
+                continue
+            match = _JSON_STRUCTURE.search(text, position)
+            if match is None:
+                return False
+            char = match.group()
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                self.closed = self.depth <= 0
+            position = match.end()
+        return False
+
+
+class RichOutput:
+    """Render JSON, XML and HTML bodies as rich display data instead of text.
+
+    Wraps the send callable of the stdout and stderr StreamForwarders. The
+    first characters of stdout decide: output that cannot be a JSON, XML or
+    HTML body is passed through at once, so plain text still streams as it
+    arrives; a body that may be one is held back, up to `max_size`
+    characters, and rendered by `finish`. A JSON body is released as text
+    as soon as a second value follows the first one, so that JSON lines and
+    event streams keep streaming. Only a page of a rendered body is
+    sent: a JSON tree is pruned to its first values, XML and HTML are cut,
+    and the whole body is written to a file.
+    """
+
+    def __init__(self, send, display, max_size=DEFAULT_MAX_SIZE,
+                 page_size=DEFAULT_PAGE_SIZE, spill_dir=None):
+        """Create a renderer.
+
+        Args:
+            send: Callable taking (name, text) that forwards text output
+            display: Callable taking (data, metadata) that sends display data
+            max_size: Number of characters held back, beyond which the body
+                is sent as text
+            page_size: Number of characters of a rendered body sent
+            spill_dir: Directory of the files receiving large bodies,
+                defaults to the temp dir
+        """
+        self._send = send
+        self._display = display
+        self.max_size = max_size
+        self.page_size = page_size
+        self.spill_dir = spill_dir or None
+        self.spill_path = None
+        # 'sniff' until the start of stdout is known, then 'hold' or 'pass'
+        self.state = "sniff"
+        self._held = []
+        self._held_size = 0
+        # Follows a held JSON body, None for markup
+        self._scanner = None
+
+    def __call__(self, name, text):
+        """Forward text, holding back stdout while it may be a rich body."""
+        if name != "stdout" or self.state == "pass":
+            self._send(name, text)
+            return
+        self._held.append(text)
+        self._held_size += len(text)
+        if self.state == "sniff":
+            start = _ANSI.sub("", "".join(self._held)).lstrip()
+            if not start and self._held_size < _SNIFF_SIZE:
+                return
+            if start[:1] in ("{", "[", "<"):
+                self.state = "hold"
+                if start[0] != "<":
+                    self._scanner = _JsonScanner()
+                    text = "".join(self._held)
+            elif start[:1] == "\x1b" and self._held_size < _SNIFF_SIZE:
+                return  # An escape sequence cut between two chunks
+            else:
+                self._release()
+                return
+        if self._scanner is not None and self._scanner.feed(text):
+            # A second value: JSON lines or events, streamed as they come
+            self._release()
+        elif self._held_size > self.max_size:
+            self._release()
+
+    def finish(self):
+        """Render the held-back body, or send it as text if it is not one.
+
+        Returns:
+            str: A notice telling where the whole body was written, or '' if
+            it was sent whole
+        """
+        if self.state != "hold":
+            self._release()
+            return ""
+        raw = "".join(self._held)
+        self._held = []
+        self._held_size = 0
+        self.state = "pass"
+        text = _ANSI.sub("", raw).strip()
+        rendered = None
+        if text.startswith(("{", "[")):
+            try:
+                rendered = self._render_json(json.loads(text), len(text))
+            except (ValueError, RecursionError):
+                pass
+        elif text.startswith("<"):
+            rendered = self._render_markup(text)
+        if rendered is None:
+            self._send("stdout", raw)
+            return ""
+        data, metadata, notice, suffix = rendered
+        if notice:
+            self._spill(text, suffix)
+            notice += f"; the whole body was written to {self.spill_path}"
+        self._display(data, metadata)
+        return notice
+
+    def _release(self):
+        """Stop holding back stdout, and send what was held as text."""
+        self.state = "pass"
+        if self._held:
+            text = "".join(self._held)
+            self._held = []
+            self._held_size = 0
+            self._send("stdout", text)
+
+    def _render_json(self, value, size):
+        notice = ""
+        if size > self.page_size:
+            value, dropped = prune_json(value, self.page_size)
+            notice = (
+                f"Response body of {size} characters: {dropped} values are not shown"
+            )
+        text = json.dumps(value, indent=2, ensure_ascii=False)
+        if len(text) > self.page_size:
+            # Indentation makes the text larger than the page it shows
+            text = text[:self.page_size] + "\n…"
+        data = {"application/json": value, "text/plain": text}
+        metadata = {"application/json": {"expanded": False, "root": "response"}}
+        return data, metadata, notice, ".json"
+
+    def _render_markup(self, text):
+        if _HTML.search(text[:1024]):
+            return self._render_html(text)
+        try:
+            pretty, complete = indent_xml(text, self.page_size)
+        except xml.sax.SAXException:
+            if _HTML.search(text[:4096]):
+                return self._render_html(text)
+            return None
+        notice = ""
+        if not complete:
+            notice = f"Response body of {len(text)} characters: showing its first {self.page_size}"
+        return {"text/plain": pretty}, {}, notice, ".xml"
+
+    def _render_html(self, text):
+        notice = ""
+        if len(text) > self.page_size:
+            notice = f"Response body of {len(text)} characters: previewing its first {self.page_size}"
+            text = text[:self.page_size]
+        data = {"text/html": preview_html(text), "text/plain": text}
+        return data, {}, notice, ".html"
+
+    def _spill(self, text, suffix):
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            encoding="utf-8",
+            prefix="hurl-body-",
+            suffix=suffix,
+            dir=self.spill_dir,
+            delete=False,
+        ) as f:
+            f.write(text)
+            self.spill_path = f.name
+
+
+def prune_json(value, budget, max_string=MAX_STRING):
+    """Copy a JSON value, keeping its first values until about `budget` characters.
+
+    Containers cut short end with a '… N more items' marker, and strings
+    longer than `max_string` are cut, so the copy can be sent whole and
+    browsed in a tree whatever the size of the value.
+
+    Returns:
+        tuple: (copy, dropped) with dropped the number of values left out
+    """
+    remaining = budget
+    dropped = 0
+
+    def copy(node):
+        nonlocal remaining, dropped
+        if isinstance(node, dict):
+            result = {}
+            for position, (key, item) in enumerate(node.items()):
+                if remaining <= 0:
+                    dropped += len(node) - position
+                    result["…"] = f"{len(node) - position} more keys"
+                    break
+                remaining -= len(key) + 4
+                result[key] = copy(item)
+            return result
+        if isinstance(node, list):
+            result = []
+            for position, item in enumerate(node):
+                if remaining <= 0:
+                    dropped += len(node) - position
+                    result.append(f"… {len(node) - position} more items")
+                    break
+                remaining -= 2
+                result.append(copy(item))
+            return result
+        if isinstance(node, str):
+            if len(node) > max_string:
+                remaining -= max_string
+                return node[:max_string] + f"… ({len(node) - max_string} more characters)"
+            remaining -= len(node) + 2
+            return node
+        remaining -= 8
+        return node
+
+    return copy(value), dropped
+
+
+class _PageFull(Exception):
+    """Raised by the XML indenter once a page has been written."""
+
+
+class _XmlIndenter(ContentHandler, LexicalHandler):
+    """Write the events of a SAX parser back as indented XML.
+
+    Namespace processing is off, so elements keep their prefixes as written.
+    An element holding only text stays on one line.
+    """
+
+    def __init__(self, page_size):
+        super().__init__()
+        self.page_size = page_size
+        self.lines = []
+        self.size = 0
+        self.depth = 0
+        # Start tag not written yet, waiting to know whether it has children
+        self._open = None
+        self._text = []
+
+    def _write(self, line):
+        self.lines.append("  " * self.depth + line)
+        self.size += len(line) + 2 * self.depth + 1
+        if self.size >= self.page_size:
+            raise _PageFull()
+
+    def _flush(self):
+        """Write the pending start tag and text before a child node."""
+        text = "".join(self._text).strip()
+        self._text = []
+        if self._open is not None:
+            self._write(self._open)
+            self._open = None
+            self.depth += 1
+        if text:
+            self._write(escape(text))
+
+    def startElement(self, name, attrs):
+        self._flush()
+        attributes = "".join(f" {key}={quoteattr(value)}" for key, value in attrs.items())
+        self._open = f"<{name}{attributes}>"
+
+    def endElement(self, name):
+        text = "".join(self._text).strip()
+        self._text = []
+        if self._open is not None:
+            tag, self._open = self._open, None
+            self._write(f"{tag}{escape(text)}</{name}>" if text else tag[:-1] + "/>")
+            return
+        if text:
+            self._write(escape(text))
+        self.depth -= 1
+        self._write(f"</{name}>")
+
+    def characters(self, content):
+        self._text.append(content)
+
+    def processingInstruction(self, target, data):
+        self._flush()
+        self._write(f"<?{target} {data}?>")
+
+    def comment(self, content):
+        self._flush()
+        self._write(f"<!--{content}-->")
+
+
+def indent_xml(text, page_size=DEFAULT_PAGE_SIZE):
+    """Pretty-print an XML document, stopping after about `page_size` characters.
+
+    The document is parsed as it is written, so only the page is built
+    whatever its size.
+
+    Returns:
+        tuple: (text, complete) with complete False if the page was cut
+
+    Raises:
+        xml.sax.SAXException: If the text is not well-formed XML
+    """
+    handler = _XmlIndenter(page_size)
+    parser = xml.sax.make_parser()
+    parser.setContentHandler(handler)
+    parser.setProperty(property_lexical_handler, handler)
+    try:
+        for start in range(0, len(text), _XML_CHUNK):
+            parser.feed(text[start:start + _XML_CHUNK])
+        parser.close()
+    except _PageFull:
+        return "\n".join(handler.lines + ["…"]), False
+    return "\n".join(handler.lines), True
+
+
+def preview_html(text, height=PREVIEW_HEIGHT):
+    """Wrap an HTML document in a sandboxed iframe.
+
+    The empty sandbox attribute runs the document without scripts, forms,
+    plugins or access to the notebook's origin.
+    """
+    return (
+        f'<iframe sandbox="" referrerpolicy="no-referrer" srcdoc="{html.escape(text)}" '
+        f'style="width:100%;height:{height}px;border:1px solid #ccc;background:#fff">'
+        "</iframe>"
+    )
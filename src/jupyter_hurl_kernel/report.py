@@ -0,0 +1,45 @@
+"""Reading the JSON reports produced by hurl --report-json."""
+
+import json
+from pathlib import Path
+
+REPORT_FILENAME = "report.json"
+
+
+def read_report(report_dir):
+    """Load the JSON report written by hurl into report_dir.
+
+    Returns:
+        list: One result dict per executed file, or None if no report exists
+    """
+    try:
+        return json.loads((Path(report_dir) / REPORT_FILENAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def iter_captures(report):
+    """Yield (name, value) for every capture in a report, in execution order."""
+    for result in report or []:
+        for entry in result.get("entries", []):
+            for capture in entry.get("captures", []):
+                if "name" in capture:
+                    yield capture["name"], capture.get("value")
+
+
+def iter_calls(result):
+    """Yield (entry, call) for every HTTP call of a file result."""
+    for entry in result.get("entries", []):
+        for call in entry.get("calls", []):
+            yield entry, call
+
+
+def call_total_us(call):
+    """Return the total duration of a call in microseconds, or None."""
+    total = call.get("timings", {}).get("total")
+    return int(total) if total is not None else None
+
+
+def call_status(call):
+    """Return the HTTP status of a call, or None if there was no response."""
+    return call.get("response", {}).get("status")
@@ -0,0 +1,374 @@
+"""Incremental execution of hurl with output streamed to the notebook."""
+
+import asyncio
+import codecs
+import collections
+import os
+import signal
+import tempfile
+import time
+
+# Size of a single read from the hurl pipes
+READ_CHUNK_SIZE = 64 * 1024
+
+# How long small chunks are held back before being sent to the frontend
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+# Flush immediately once this many characters are pending
+DEFAULT_MAX_BUFFER = 256 * 1024
+
+# Time a terminated process gets to exit before it is killed
+KILL_GRACE_PERIOD = 0.2
+
+# Amount of stderr kept around to build the error traceback
+STDERR_TAIL_SIZE = 8 * 1024
+
+
+class StreamForwarder:
+    """Decode a byte stream incrementally and forward it in coalesced chunks.
+
+    Bytes are decoded as UTF-8 without ever splitting a multi-byte character,
+    and the resulting text is held in a small buffer until either the flush
+    interval has elapsed or the buffer is full. Only a bounded tail of the
+    stream is retained once it has been forwarded.
+    """
+
+    def __init__(
+        self,
+        name,
+        send=None,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        max_buffer=DEFAULT_MAX_BUFFER,
+        tail_size=0,
+        sink=None,
+    ):
+        """Create a forwarder.
+
+        Args:
+            name: Stream name reported to the frontend ('stdout' or 'stderr')
+            send: Callable taking (name, text), or None to discard output
+            flush_interval: Maximum delay in seconds before pending text is sent
+            max_buffer: Number of pending characters that forces a flush
+            tail_size: Number of trailing characters to keep in `tail`
+            sink: Binary file receiving a copy of the raw bytes, or None
+        """
+        self.name = name
+        self._send = send
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.tail_size = tail_size
+        self.tail = ""
+        self.total_bytes = 0
+        self.sink = sink
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = []
+        self._pending_size = 0
+        self._last_flush = time.monotonic()
+
+    def feed(self, data):
+        """Add a chunk of raw bytes read from the process."""
+        self.total_bytes += len(data)
+        if self.sink is not None:
+            self.sink.write(data)
+        self._append(self._decoder.decode(data))
+        if self._pending_size >= self.max_buffer or self.is_due():
+            self.flush()
+
+    def is_due(self):
+        """Return True if pending text has waited longer than the flush interval."""
+        return (
+            self._pending_size > 0
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def flush(self):
+        """Send all pending text to the frontend."""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        if self._send is not None:
+            self._send(self.name, text)
+
+    def close(self):
+        """Flush the decoder and any remaining text."""
+        self._append(self._decoder.decode(b"", final=True))
+        self.flush()
+
+    def _append(self, text):
+        if not text:
+            return
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self.tail_size:
+            self.tail = (self.tail + text)[-self.tail_size:]
+
+
+class OutputLimiter:
+    """Cap the amount of output forwarded to the frontend.
+
+    Wraps the send callable of one or more StreamForwarders. The first
+    `max_bytes` of output are forwarded as usual; what comes after is either
+    reduced to a bounded tail preview ('truncate') or written to a spill file
+    on disk ('spill'), so memory use stays constant whatever the response size.
+    """
+
+    def __init__(self, send, max_bytes, overflow="truncate", spill_dir=None):
+        """Create a limiter.
+
+        Args:
+            send: Callable taking (name, text) that forwards to the frontend
+            max_bytes: Number of bytes to forward, 0 for no limit
+            overflow: 'truncate' or 'spill'
+            spill_dir: Directory for spill files, defaults to the temp dir
+        """
+        self._send = send
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.spill_dir = spill_dir or None
+        # In truncate mode a quarter of the budget is kept for the tail
+        self.tail_size = max_bytes // 4 if overflow == "truncate" else 0
+        self.forwarded = 0
+        self.overflow_bytes = 0
+        self.spill_path = None
+        self._spill = None
+        self._tail = collections.deque()
+        self._tail_length = 0
+
+    @property
+    def truncated(self):
+        """True if some output was not forwarded to the frontend."""
+        return self.overflow_bytes > 0
+
+    def __call__(self, name, text):
+        """Forward text, diverting it once the budget has been used."""
+        if self.max_bytes <= 0:
+            self._send(name, text)
+            return
+        remaining = self.max_bytes - self.tail_size - self.forwarded
+        if remaining > 0:
+            data = text.encode("utf-8")
+            if len(data) <= remaining:
+                self._send(name, text)
+                self.forwarded += len(data)
+                return
+            head = data[:remaining].decode("utf-8", errors="ignore")
+            self._send(name, head)
+            self.forwarded += len(head.encode("utf-8"))
+            text = text[len(head):]
+        self._divert(name, text)
+
+    def finish(self):
+        """Send the tail preview, close the spill file and report what was dropped.
+
+        Returns:
+            str: A notice describing the truncation, or '' if nothing was dropped
+        """
+        if not self.truncated:
+            return ""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            return (
+                f"Output exceeded {self.max_bytes} bytes; the remaining "
+                f"{self.overflow_bytes} bytes were written to {self.spill_path}"
+            )
+        tail = list(self._tail)
+        self._tail.clear()
+        shown = sum(len(text.encode("utf-8")) for _, text in tail)
+        omitted = self.overflow_bytes - shown
+        if omitted > 0:
+            self._send("stderr", f"\n... [{omitted} bytes omitted] ...\n")
+        for name, text in tail:
+            self._send(name, text)
+        return (
+            f"Output exceeded {self.max_bytes} bytes; {omitted} bytes in the "
+            f"middle were omitted"
+        )
+
+    def _divert(self, name, text):
+        self.overflow_bytes += len(text.encode("utf-8"))
+        if self.overflow == "spill":
+            if self._spill is None:
+                self._spill = tempfile.NamedTemporaryFile(
+                    mode="w",
+                    encoding="utf-8",
+                    prefix="hurl-output-",
+                    suffix=".txt",
+                    dir=self.spill_dir,
+                    delete=False,
+                )
+                self.spill_path = self._spill.name
+            self._spill.write(text)
+            return
+        self._tail.append((name, text))
+        self._tail_length += len(text)
+        while self._tail_length > self.tail_size and self._tail:
+            excess = self._tail_length - self.tail_size
+            first_name, first_text = self._tail[0]
+            if len(first_text) <= excess:
+                self._tail.popleft()
+                self._tail_length -= len(first_text)
+            else:
+                self._tail[0] = (first_name, first_text[excess:])
+                self._tail_length -= excess
+
+
+async def _pump(reader, forwarder):
+    """Copy a process pipe into a forwarder until EOF."""
+    while True:
+        data = await reader.read(READ_CHUNK_SIZE)
+        if not data:
+            break
+        forwarder.feed(data)
+    forwarder.close()
+
+
+async def _tick(forwarders, interval):
+    """Periodically flush forwarders so quiet streams are not held back."""
+    while True:
+        await asyncio.sleep(interval)
+        for forwarder in forwarders:
+            if forwarder.is_due():
+                forwarder.flush()
+
+
+class ProcessInterrupted(Exception):
+    """Raised when a running process was stopped by an interrupt or shutdown."""
+
+
+class StreamingProcess:
+    """A hurl process whose output is streamed through forwarders.
+
+    On POSIX the process is started in its own session, hence its own
+    process group, so that it can be terminated together with anything it
+    spawned, and so that the SIGINT Jupyter sends to the kernel's group does
+    not reach it behind the kernel's back.
+    """
+
+    def __init__(self, cmd, stdout, stderr):
+        """Create a process; nothing is started until `run` is awaited.
+
+        Args:
+            cmd: Command line to execute
+            stdout: StreamForwarder receiving the process stdout
+            stderr: StreamForwarder receiving the process stderr
+        """
+        self.cmd = cmd
+        self.stdout = stdout
+        self.stderr = stderr
+        self.started_at = None
+        self.ended_at = None
+        # Seconds create_subprocess_exec took to return
+        self.spawn_time = None
+        self._process = None
+        self.interrupted = False
+        self._loop = None
+        self._stop = None
+
+    @property
+    def elapsed(self):
+        """Seconds the process has been running (or ran, once finished)."""
+        if self.started_at is None:
+            return 0.0
+        return (self.ended_at or time.monotonic()) - self.started_at
+
+    async def run(self, timeout=None):
+        """Run the process to completion.
+
+        Args:
+            timeout: Wall-clock limit in seconds, or None for no limit
+
+        Returns:
+            int: The process exit code
+
+        Raises:
+            asyncio.TimeoutError: If the process exceeded `timeout`
+            ProcessInterrupted: If `interrupt` was called while running
+
+            In both cases the process group has been killed and the output
+            received so far has been forwarded.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if self.interrupted:
+            raise ProcessInterrupted()
+        self.started_at = time.monotonic()
+        self._process = await asyncio.create_subprocess_exec(
+            *self.cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=(os.name == "posix"),
+        )
+        self.spawn_time = time.monotonic() - self.started_at
+        forwarders = (self.stdout, self.stderr)
+        ticker = asyncio.create_task(
+            _tick(forwarders, min(f.flush_interval for f in forwarders))
+        )
+        communicate = asyncio.ensure_future(self._communicate())
+        stop = asyncio.ensure_future(self._stop.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {communicate, stop},
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if communicate in done:
+                return communicate.result()
+            await self._kill()
+            try:
+                await asyncio.wait_for(communicate, KILL_GRACE_PERIOD)
+            except asyncio.TimeoutError:
+                pass  # A grandchild is still holding the pipes open
+            self.stdout.close()
+            self.stderr.close()
+            if stop in done:
+                raise ProcessInterrupted()
+            raise asyncio.TimeoutError()
+        finally:
+            self.ended_at = time.monotonic()
+            ticker.cancel()
+            stop.cancel()
+            communicate.cancel()
+
+    def interrupt(self):
+        """Request the process to stop.
+
+        Safe to call from a signal handler or another thread.
+        """
+        self.interrupted = True
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def _communicate(self):
+        await asyncio.gather(
+            _pump(self._process.stdout, self.stdout),
+            _pump(self._process.stderr, self.stderr),
+        )
+        return await self._process.wait()
+
+    async def _kill(self):
+        """Terminate the process group, escalating to SIGKILL if needed."""
+        process = self._process
+        if process.returncode is not None:
+            return
+        _signal_group(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            _signal_group(process, signal.SIGKILL if os.name == "posix" else signal.SIGTERM)
+            await process.wait()
+
+
+def _signal_group(process, sig):
+    """Send a signal to a process group started by StreamingProcess."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, sig)
+        else:
+            process.send_signal(sig)
+    except (ProcessLookupError, PermissionError):
+        pass  # Already gone
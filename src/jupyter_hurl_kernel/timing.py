@@ -0,0 +1,164 @@
+"""Per-request timing breakdown built from hurl's JSON report."""
+
+import html
+from dataclasses import dataclass
+from datetime import datetime
+
+from .report import call_status, iter_calls
+
+# Phases of a call, with the timing field marking the end of each one. hurl
+# reports curl's timings: microseconds elapsed since the start of the call.
+PHASES = (
+    ("DNS", "name_lookup"),
+    ("Connect", "connect"),
+    ("TLS", "app_connect"),
+    ("Wait", "start_transfer"),
+    ("Transfer", "total"),
+)
+
+# Colors of the phases in the HTML waterfall
+_PHASE_COLORS = ("#009688", "#ff9800", "#9c27b0", "#4caf50", "#2196f3")
+
+# Characters of the phases in the text waterfall
+_PHASE_CHARS = ("d", "c", "s", "w", "t")
+
+# Width of the text waterfall, in characters
+TEXT_WATERFALL_WIDTH = 40
+
+
+@dataclass
+class CallTiming:
+    """Timing breakdown of one HTTP call."""
+
+    entry: int
+    method: str
+    url: str
+    status: object
+    offset: int
+    phases: list
+
+    @property
+    def total(self):
+        """Duration of the call in microseconds."""
+        return sum(self.phases)
+
+
+def call_phases(timings):
+    """Split curl's cumulative timings into the duration of each phase.
+
+    A phase that did not happen (no TLS on plain HTTP, no DNS lookup or
+    connection on a reused connection) is reported as zero: each timestamp
+    is clamped to the previous one.
+
+    Returns:
+        list: Duration of each of PHASES in microseconds
+    """
+    phases = []
+    previous = 0
+    for _, field in PHASES:
+        point = max(int(timings.get(field) or 0), previous)
+        phases.append(point - previous)
+        previous = point
+    return phases
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def collect_timings(report):
+    """Return the CallTiming of every call in a report, in execution order.
+
+    Calls are placed on a common time line using their begin_call time, or
+    one after the other when hurl did not report it.
+    """
+    timings = []
+    begins = []
+    for result in report or []:
+        for entry, call in iter_calls(result):
+            call_timings = call.get("timings")
+            if not call_timings:
+                continue
+            request = call.get("request", {})
+            timings.append(CallTiming(
+                entry=entry.get("index", len(timings) + 1),
+                method=request.get("method", ""),
+                url=request.get("url", ""),
+                status=call_status(call),
+                offset=0,
+                phases=call_phases(call_timings),
+            ))
+            begins.append(_parse_time(call_timings.get("begin_call")))
+    if timings and None not in begins:
+        start = min(begins)
+        for timing, begin in zip(timings, begins):
+            timing.offset = int((begin - start).total_seconds() * 1_000_000)
+    else:
+        elapsed = 0
+        for timing in timings:
+            timing.offset = elapsed
+            elapsed += timing.total
+    return timings
+
+
+def _ms(value):
+    return f"{value / 1000:.2f}"
+
+
+def format_timings(timings):
+    """Render the timing breakdown and its waterfall as (text, html)."""
+    span = max((t.offset + t.total for t in timings), default=0) or 1
+    columns = ("#", "Request", "Status") + tuple(name for name, _ in PHASES) + ("Total",)
+
+    cells = [
+        [str(t.entry), f"{t.method} {t.url}", str(t.status if t.status is not None else "-")]
+        + [_ms(duration) for duration in t.phases]
+        + [_ms(t.total)]
+        for t in timings
+    ]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip()]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() for r in cells]
+    text = "Timings (ms)\n" + "".join(line + "\n" for line in lines) + "\n"
+    for t in timings:
+        start = round(t.offset / span * TEXT_WATERFALL_WIDTH)
+        bar = ""
+        elapsed = t.offset
+        for char, duration in zip(_PHASE_CHARS, t.phases):
+            elapsed += duration
+            end = round(elapsed / span * TEXT_WATERFALL_WIDTH)
+            bar += char * max(0, end - start - len(bar))
+        text += f"{t.entry:>3} |{' ' * start}{bar}".rstrip() + "\n"
+    text += "    " + ", ".join(
+        f"{char}={name}" for char, (name, _) in zip(_PHASE_CHARS, PHASES)
+    ) + "\n"
+
+    header = "".join(f"<th>{c}</th>" for c in columns) + "<th>Waterfall</th>"
+    rows = []
+    for t, row in zip(timings, cells):
+        segments = [
+            f"<div style='display:inline-block;height:10px;width:{100 * t.offset / span:.2f}%'></div>"
+        ]
+        for (name, _), color, duration in zip(PHASES, _PHASE_COLORS, t.phases):
+            if duration:
+                segments.append(
+                    f"<div title='{name}: {_ms(duration)} ms' style='display:inline-block;"
+                    f"height:10px;background:{color};width:{100 * duration / span:.2f}%'></div>"
+                )
+        rows.append(
+            "<tr>" + "".join(f"<td>{html.escape(v)}</td>" for v in row)
+            + "<td style='width:30%;min-width:200px'><div style='white-space:nowrap;"
+            f"font-size:0'>{''.join(segments)}</div></td></tr>"
+        )
+    legend = " ".join(
+        f"<span style='color:{color}'>&#9632;</span> {name}"
+        for (name, _), color in zip(PHASES, _PHASE_COLORS)
+    )
+    markup = (
+        f"<b>Timings (ms)</b><table><tr>{header}</tr>{''.join(rows)}</table>"
+        f"<div>{legend}</div>"
+    )
+    return text, markup
@@ -0,0 +1,113 @@
+"""Session variables shared between cells."""
+
+import json
+import re
+
+# Hurl variable names
+VARIABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_-]*$")
+
+# Sentinel for VariableStore.clear
+_MISSING = object()
+
+
+def format_value(value):
+    """Render a variable value the way hurl expects it on the command line."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float, str)):
+        return str(value)
+    # Lists and objects cannot be hurl variables; pass their JSON text
+    return json.dumps(value)
+
+
+class VariableStore:
+    """Variables captured by previous cells or set with %%vars.
+
+    Every cell is executed with the current variables, so a value such as an
+    auth token captured once can be referenced as {{token}} in later cells
+    without re-running the request that produced it.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def items(self):
+        """Return (name, value) pairs sorted by name."""
+        return sorted(self._values.items())
+
+    def as_dict(self, names=None):
+        """Return a copy of the variables, optionally only of the given names."""
+        if names is None:
+            return dict(self._values)
+        return {name: self._values[name] for name in names if name in self._values}
+
+    def set(self, name, value):
+        """Set a variable.
+
+        Raises:
+            ValueError: If name is not a valid Hurl variable name
+        """
+        if not VARIABLE_NAME.match(name):
+            raise ValueError(f"Invalid variable name: {name!r}")
+        self._values[name] = value
+
+    def clear(self, names=None):
+        """Remove the given variables, or all of them.
+
+        Returns:
+            int: Number of variables removed
+        """
+        if not names:
+            count = len(self._values)
+            self._values.clear()
+            return count
+        return sum(self._values.pop(name, _MISSING) is not _MISSING for name in names)
+
+    def update_from_report(self, captures):
+        """Store captured (name, value) pairs.
+
+        Returns:
+            list: Names of the variables that were captured
+        """
+        names = []
+        for name, value in captures:
+            self._values[name] = value
+            names.append(name)
+        return names
+
+    def command_args(self, variables_file):
+        """Write the variables for hurl and return the matching arguments.
+
+        Single-line values go to variables_file; values spanning several
+        lines cannot be expressed there and are passed with --variable.
+
+        Args:
+            variables_file: Path of the file to write
+
+        Returns:
+            list: Arguments to add to the hurl command line
+        """
+        if not self._values:
+            return []
+        args = []
+        lines = []
+        for name, value in self._values.items():
+            text = format_value(value)
+            if "\n" in text or "\r" in text:
+                args.extend(["--variable", f"{name}={text}"])
+            else:
+                lines.append(f"{name}={text}\n")
+        if lines:
+            with open(variables_file, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+            args = ["--variables-file", str(variables_file)] + args
+        return args
+
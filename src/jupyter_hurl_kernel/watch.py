@@ -0,0 +1,226 @@
+"""Cells re-run at an interval with %%watch."""
+
+import asyncio
+import difflib
+import re
+import time
+from dataclasses import dataclass
+
+from .magics import parse_duration, parse_magic_args
+
+# Output of an iteration kept for the comparison with the next one, per stream
+WATCH_OUTPUT_SIZE = 64 * 1024
+
+# Lines of a diff shown in the watch's display
+MAX_DIFF_LINES = 200
+
+DEFAULT_INTERVAL = 5.0
+
+# Conditions of until= that are not a regular expression
+UNTIL_KEYWORDS = ("success", "failure", "change")
+
+
+@dataclass
+class WatchOptions:
+    """Schedule and stop conditions of a %%watch cell."""
+
+    interval: float = DEFAULT_INTERVAL
+    # 'success', 'failure', 'change', a compiled regex, or None
+    until: object = None
+    # Maximum number of iterations, or None for no limit
+    count: int | None = None
+
+    @property
+    def until_text(self):
+        if isinstance(self.until, re.Pattern):
+            return f"/{self.until.pattern}/"
+        return self.until
+
+
+def parse_watch_args(argument):
+    """Parse the arguments of %%watch, e.g. 'interval=5s until=success count=10'.
+
+    until= is 'success' (the cell passes, e.g. once its asserts hold),
+    'failure', 'change', or a regular expression searched in the output.
+
+    Raises:
+        ValueError: If an argument is invalid
+    """
+    words, params = parse_magic_args(argument)
+    if words:
+        raise ValueError(f"Unexpected %%watch argument: {words[0]!r}")
+    unknown = sorted(set(params) - {"interval", "until", "count"})
+    if unknown:
+        raise ValueError(
+            f"Unknown %%watch option: {unknown[0]!r} (expected interval, until or count)"
+        )
+    options = WatchOptions()
+    if "interval" in params:
+        options.interval = parse_duration(params["interval"])
+        if options.interval <= 0:
+            raise ValueError("The %%watch interval must be positive")
+    if "count" in params:
+        try:
+            options.count = int(params["count"])
+        except ValueError:
+            options.count = 0
+        if options.count <= 0:
+            raise ValueError(f"Invalid count: {params['count']!r} (expected a positive number)")
+    until = params.get("until")
+    if until:
+        if until.lower() in UNTIL_KEYWORDS:
+            options.until = until.lower()
+        else:
+            try:
+                options.until = re.compile(until)
+            except re.error as e:
+                raise ValueError(f"Invalid until= regular expression: {e}") from None
+    return options
+
+
+class Watch:
+    """State of a %%watch cell: its iterations and the latest change.
+
+    Only the output of the previous iteration is kept, to be compared with
+    the next one, so a long watch uses as much memory as its first
+    iteration.
+    """
+
+    def __init__(self, code, hurl_code, options):
+        # The whole cell, for the line numbers of the in-process engine
+        self.code = code
+        # The cell without its magic lines, given to hurl
+        self.hurl_code = hurl_code
+        self.options = options
+        self.iteration = 0
+        self.changes = 0
+        self.started = time.time()
+        self.checked_at = None
+        # Iteration and time of the latest change, and its diff
+        self.changed_at = None
+        self.changed_iteration = None
+        self.diff = []
+        self.returncode = None
+        # Why the watch stopped, None while it runs
+        self.stopped = None
+        self.interrupted = False
+        # The process running the current iteration, if any
+        self.process = None
+        self._previous = None
+        self._loop = None
+        self._stop = None
+
+    @property
+    def summary(self):
+        """First request line of the watched code."""
+        for line in self.code.splitlines():
+            if line.strip() and not line.lstrip().startswith(("#", "%%")):
+                return line.strip()
+        return ""
+
+    def record(self, returncode, output):
+        """Compare the output of an iteration with the previous one.
+
+        Args:
+            returncode: Exit code of the iteration, None if it timed out
+            output: Its (uncoloured) output
+
+        Returns:
+            bool: True if the output or the exit code changed
+        """
+        self.iteration += 1
+        self.checked_at = time.time()
+        current = (returncode, output)
+        changed = current != self._previous
+        if changed:
+            lines = output.splitlines()
+            if self._previous is None:
+                diff = lines
+            else:
+                previous_code, previous_output = self._previous
+                diff = [
+                    line for line in difflib.unified_diff(
+                        previous_output.splitlines(), lines, lineterm="", n=1
+                    )
+                    if not line.startswith(("---", "+++"))
+                ]
+                if returncode != previous_code:
+                    diff.insert(0, f"exit code {_exit_text(previous_code)} -> {_exit_text(returncode)}")
+            if len(diff) > MAX_DIFF_LINES:
+                dropped = len(diff) - MAX_DIFF_LINES
+                diff = diff[:MAX_DIFF_LINES] + [f"... ({dropped} more lines)"]
+            self.diff = diff
+            self.changed_at = self.checked_at
+            self.changed_iteration = self.iteration
+            self.changes += self._previous is not None
+        self._previous = current
+        self.returncode = returncode
+        return changed
+
+    def stop_reason(self, changed, output):
+        """Return why the watch must stop after an iteration, or None."""
+        until = self.options.until
+        if until == "success" and self.returncode == 0:
+            return "the cell succeeded"
+        if until == "failure" and self.returncode != 0:
+            return "the cell failed"
+        if until == "change" and changed and self.iteration > 1:
+            return "the output changed"
+        if isinstance(until, re.Pattern) and until.search(output):
+            return f"the output matched {self.options.until_text}"
+        if self.options.count is not None and self.iteration >= self.options.count:
+            return f"{self.iteration} iterations"
+        return None
+
+    async def sleep(self, seconds):
+        """Wait until the next iteration.
+
+        Returns:
+            bool: False if the watch was interrupted meanwhile
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._stop is None:
+            self._stop = asyncio.Event()
+        if self.interrupted:
+            return False
+        try:
+            await asyncio.wait_for(self._stop.wait(), max(seconds, 0))
+        except asyncio.TimeoutError:
+            pass
+        return not self.interrupted
+
+    def interrupt(self):
+        """Stop the watch. Safe to call from a signal handler or another thread."""
+        self.interrupted = True
+        if self.process is not None:
+            self.process.interrupt()
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def _exit_text(returncode):
+    return "timeout" if returncode is None else str(returncode)
+
+
+def format_watch(watch):
+    """Render the state of a watch, with its latest change, as plain text."""
+    every = f"every {watch.options.interval:g}s"
+    if watch.options.until:
+        every += f" until {watch.options.until_text}"
+    lines = [f"[watch] {watch.summary} ({every})"]
+    if watch.checked_at is not None:
+        checked = time.strftime("%H:%M:%S", time.localtime(watch.checked_at))
+        lines.append(
+            f"iteration {watch.iteration} at {checked}, exit code {_exit_text(watch.returncode)}, "
+            f"{watch.changes} change(s)"
+        )
+    if watch.stopped:
+        lines.append(f"stopped: {watch.stopped}")
+    if watch.changed_iteration is not None:
+        changed = time.strftime("%H:%M:%S", time.localtime(watch.changed_at))
+        if watch.changed_iteration == 1:
+            lines.append(f"output of iteration 1 ({changed}):")
+        else:
+            lines.append(f"changes at iteration {watch.changed_iteration} ({changed}):")
+        lines.extend(watch.diff)
+    return "\n".join(lines)
@@ -0,0 +1,84 @@
+"""Fixtures running the kernel against stand-in hurl binaries."""
+
+import asyncio
+import os
+import stat
+
+import pytest
+
+from jupyter_hurl_kernel.kernel import HurlKernel
+
+FAKE_HURL = """\
+#!/bin/sh
+case "$1" in
+    --version) echo "hurl 6.1.1"; exit 0 ;;
+    --help) echo "--parallel --json --report-json --repeat --test"; exit 0 ;;
+esac
+echo "$@" >> "{log}"
+for argument in "$@"; do
+    case "$argument" in
+        *.hurl) cat "$argument" >> "{files}" ;;
+    esac
+done
+echo "ok"
+"""
+
+
+class RecordingKernel(HurlKernel):
+    """A kernel keeping the messages it sends instead of publishing them."""
+
+    def send_response(self, stream, msg_type, content=None, *args, **kwargs):
+        self.sent.append((msg_type, content))
+
+    def execute(self, code):
+        """Run a cell to completion and return the execute reply."""
+        return asyncio.run(self.do_execute(code, False))
+
+    def stream_text(self, name):
+        return "".join(
+            content["text"] for msg_type, content in self.sent
+            if msg_type == "stream" and content["name"] == name
+        )
+
+
+class FakeBin:
+    """A directory of executables put first in PATH."""
+
+    def __init__(self, path):
+        self.path = path
+        self.log = path / "hurl.log"
+        self.files = path / "hurl-files.log"
+
+    def add(self, name, script):
+        executable = self.path / name
+        executable.write_text(script)
+        executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+
+    @property
+    def hurl_runs(self):
+        return self.log.read_text().splitlines() if self.log.exists() else []
+
+    @property
+    def hurl_files(self):
+        """The .hurl files given to hurl, one after the other."""
+        return self.files.read_text() if self.files.exists() else ""
+
+
+@pytest.fixture
+def fake_bin(tmp_path, monkeypatch):
+    directory = tmp_path / "bin"
+    directory.mkdir()
+    fake = FakeBin(directory)
+    fake.add("hurl", FAKE_HURL.format(log=fake.log, files=fake.files))
+    monkeypatch.setenv("PATH", f"{directory}{os.pathsep}/usr/bin{os.pathsep}/bin")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    return fake
+
+
+@pytest.fixture
+def kernel(fake_bin):
+    kernel = RecordingKernel()
+    kernel.sent = []
+    return kernel
+
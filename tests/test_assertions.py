@@ -0,0 +1,127 @@
+"""Tests of the pass/fail summary of %%test cells."""
+
+import json
+
+from jupyter_hurl_kernel.assertions import collect_results, format_results, split_errors
+from jupyter_hurl_kernel.parser import parse
+
+CELL = """\
+GET https://example.org/health
+HTTP 200
+
+GET https://example.org/users
+HTTP 200
+[Asserts]
+jsonpath "$.count" == 3
+
+GET https://example.org/users/1
+HTTP 200
+"""
+
+STDERR = """\
+error: Assert failure
+  --> cell.hurl:7:0
+   |
+   | GET https://example.org/users
+ 7 | jsonpath "$.count" == 3
+   |   actual:   integer <2>
+   |   expected: integer <3>
+   |
+
+cell.hurl: Failure (2 request(s) in 30 ms)
+"""
+
+REPORT = [{
+    "filename": "cell.hurl",
+    "success": False,
+    "entries": [
+        {
+            "index": 1, "line": 1, "time": 12,
+            "calls": [{"request": {"method": "GET", "url": "https://example.org/health"},
+                       "response": {"status": 200}}],
+            "asserts": [{"success": True}],
+        },
+        {
+            "index": 2, "line": 4, "time": 18,
+            "calls": [{"request": {"method": "GET", "url": "https://example.org/users"},
+                       "response": {"status": 200}}],
+            "asserts": [{"success": True}, {"success": False}],
+        },
+    ],
+}]
+
+
+def results():
+    return collect_results(REPORT, STDERR, parse(CELL).entries)
+
+
+def test_errors_are_split_with_their_line():
+    errors = split_errors(STDERR)
+    assert len(errors) == 1
+    line, text = errors[0]
+    assert line == 7
+    assert text.startswith("error: Assert failure")
+    assert "Failure (2 request(s)" not in text
+
+
+def test_error_without_location():
+    assert split_errors("error: Could not resolve host\n") == [
+        (None, "error: Could not resolve host")
+    ]
+
+
+def test_every_entry_gets_its_outcome():
+    first, second, third = results()
+    assert (first.success, first.status, first.duration_ms) == (True, 200, 12)
+    assert (second.success, second.status) == (False, 200)
+    assert second.errors[0].startswith("error: Assert failure")
+    # Not run after the failure
+    assert (third.success, third.status, third.duration_ms) == (None, None, None)
+    assert third.url == "https://example.org/users/1"
+
+
+def test_summary_has_one_line_per_entry_then_the_failures():
+    text, markup = format_results(results(), 0.5)
+    lines = text.splitlines()
+    assert lines[0] == "1 passed, 1 failed, 1 not run (3 entries in 0.50 s)"
+    assert lines[1] == "PASS #1    GET https://example.org/health  200  12 ms"
+    assert lines[2] == "FAIL #2    GET https://example.org/users  200  18 ms"
+    assert lines[3] == "---- #3    GET https://example.org/users/1"
+    assert lines[5] == "#2 GET https://example.org/users:"
+    assert lines[6] == "    error: Assert failure"
+    assert "<details>" in markup and "&quot;$.count&quot;" in markup
+
+
+def test_missing_report_attaches_errors_to_the_first_entry():
+    first, second, third = collect_results(None, "error: Parsing literal\n", parse(CELL).entries)
+    assert first.success is False
+    assert first.errors == ["error: Parsing literal"]
+    assert second.success is None and third.success is None
+
+
+def test_test_cell_reports_failed_entries(kernel, fake_bin, tmp_path):
+    report = tmp_path / "report.json"
+    report.write_text(json.dumps(REPORT))
+    stderr = tmp_path / "stderr.txt"
+    stderr.write_text(STDERR)
+    fake_bin.add("hurl", f"""\
+#!/bin/sh
+case "$1" in
+    --version) echo "hurl 6.1.1"; exit 0 ;;
+    --help) echo "--parallel --json --report-json --repeat --test"; exit 0 ;;
+esac
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--report-json" ]; then
+        mkdir -p "$2"
+        cp "{report}" "$2/report.json"
+    fi
+    shift
+done
+cat "{stderr}" >&2
+exit 4
+""")
+    reply = kernel.execute("%%test\n" + CELL)
+    assert reply["status"] == "error"
+    assert reply["evalue"] == "1 of 3 entries failed"
+    summary, = [content for msg_type, content in kernel.sent if msg_type == "display_data"]
+    assert summary["data"]["text/plain"].startswith("1 passed, 1 failed, 1 not run")
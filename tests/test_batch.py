@@ -0,0 +1,151 @@
+"""Tests of the cells queued with %%batch and run together."""
+
+import json
+
+from jupyter_hurl_kernel.batch import (
+    BatchOutputParser,
+    BatchQueue,
+    apply_report,
+    build_batch_command,
+    format_entry_status,
+    plan_waves,
+    write_batch_files,
+)
+
+
+def queued(tmp_path, *codes):
+    queue = BatchQueue()
+    for code in codes:
+        queue.add(code)
+    entries = queue.take()
+    write_batch_files(entries, tmp_path)
+    return entries
+
+
+def test_queue_numbers_entries_with_distinct_display_ids():
+    queue, other = BatchQueue(), BatchQueue()
+    first, second = queue.add("GET https://a.org\n"), queue.add("GET https://b.org\n")
+    assert (first.number, second.number) == (1, 2)
+    assert first.display_id != second.display_id
+    # A restarted kernel must not update the displays of the previous one
+    assert other.add("GET https://a.org\n").display_id != first.display_id
+    assert queue.take() == [first, second]
+    assert queue.entries == []
+
+
+def test_clear_returns_the_number_of_dropped_entries():
+    queue = BatchQueue()
+    queue.add("GET https://a.org\n")
+    queue.add("GET https://b.org\n")
+    assert queue.clear() == 2
+    assert queue.clear() == 0
+
+
+def test_command_runs_every_file(tmp_path):
+    entries = queued(tmp_path, "GET https://a.org\n", "GET https://b.org\n")
+    files = [entry.filename for entry in entries]
+    assert build_batch_command(entries, 4, "report") == [
+        "hurl", "--test", "--no-color", "--parallel", "--jobs", "4",
+        "--report-json", "report", *files,
+    ]
+    assert "--parallel" not in build_batch_command(entries, 4, "report", parallel=False)
+
+
+def test_errors_are_attributed_to_their_cell(tmp_path):
+    first, second = queued(tmp_path, "GET https://a.org\n", "GET https://b.org\n")
+    updated = []
+    parser = BatchOutputParser([first, second], updated.append)
+    stderr = (
+        f"{first.filename}: Success (1 request(s) in 10 ms)\n"
+        "error: Assert status code\n"
+        f"  --> {second.filename}:2:6\n"
+        "   |\n"
+        "   | HTTP 200\n"
+        "\n"
+        f"{second.filename}: Failure (1 request(s) in 12 ms)\n"
+    )
+    # Chunks do not end on line boundaries
+    parser.feed("stderr", stderr[:30])
+    parser.feed("stderr", stderr[30:])
+    parser.close()
+    assert updated == [first, second]
+    assert (first.success, second.success) == (True, False)
+    assert first.errors == []
+    assert second.errors[0][0] == "error: Assert status code"
+    status = format_entry_status(second)
+    assert status.startswith("[batch #2] Failure")
+    assert "--> cell #2:2:6" in status
+
+
+def test_report_gives_times_and_fails_missing_files(tmp_path):
+    first, second = queued(tmp_path, "GET https://a.org\n", "GET https://b.org\n")
+    report = tmp_path / "report"
+    report.mkdir()
+    (report / "report.json").write_text(json.dumps([{
+        "filename": first.filename, "success": True, "time": 42,
+        "entries": [{"calls": [{}]}, {"calls": [{}, {}]}],
+    }]))
+    assert apply_report([first, second], report)
+    assert (first.success, first.time_ms, first.requests) == (True, 42, 3)
+    # Not in the report, e.g. because hurl could not parse it
+    assert second.success is False
+    assert format_entry_status(first) == "[batch #1] Success (3 request(s), 42 ms)"
+
+
+def test_missing_report_fails_every_entry(tmp_path):
+    entries = queued(tmp_path, "GET https://a.org\n")
+    assert not apply_report(entries, tmp_path / "missing")
+    assert entries[0].success is False
+
+
+def waves_of(*cells):
+    queue = BatchQueue()
+    for captures, references in cells:
+        queue.add("GET https://a.org\n", captures, references)
+    return [[entry.number for entry in wave] for wave in plan_waves(queue.take())]
+
+
+def test_independent_cells_run_in_one_wave():
+    assert waves_of(((), ()), ({"token"}, ()), ((), {"other"})) == [[1, 2, 3]]
+
+
+def test_cells_using_a_capture_run_after_it():
+    assert waves_of(
+        ({"token"}, ()),
+        ((), {"token"}),
+        ({"id"}, {"token"}),
+        ((), {"id"}),
+        ((), ()),
+    ) == [[1, 5], [2, 3], [4]]
+
+
+def test_only_earlier_cells_are_dependencies():
+    # The first cell reads the session's value: the capture waits for it
+    assert waves_of(((), {"token"}), ({"token"}, ())) == [[1], [2]]
+
+
+def test_mutual_references_are_ordered_by_the_queue():
+    # Each cell uses what the other captures: no cycle, the queue decides
+    queue = BatchQueue()
+    first = queue.add("GET https://a.org\n", {"a"}, {"b"})
+    second = queue.add("GET https://b.org\n", {"b"}, {"a"})
+    waves = plan_waves(queue.take())
+    assert waves == [[first], [second]]
+    assert (first.depends_on, second.depends_on) == ([], [1])
+
+
+def test_recaptured_variables_keep_their_order():
+    # The second capture must not overwrite the first before it is used
+    assert waves_of(({"token"}, ()), ((), {"token"}), ({"token"}, ())) == [[1], [2], [3]]
+
+
+def test_dependencies_are_shown_while_queued_and_when_skipped():
+    queue = BatchQueue()
+    queue.add("GET https://a.org\n", {"token"})
+    entry = queue.add("GET https://b.org\n", (), {"token"})
+    plan_waves(queue.entries)
+    assert format_entry_status(entry) == "[batch #2] queued (runs after #1)"
+    entry.skipped = [1]
+    assert format_entry_status(entry) == (
+        "[batch #2] Skipped (depends on #1, which did not succeed)"
+    )
@@ -0,0 +1,124 @@
+"""Tests of the %%bench variants and the statistics comparing them.
+
+Reference values were computed with SciPy (ttest_ind with equal_var=False,
+mannwhitneyu with the asymptotic method and no continuity correction).
+"""
+
+import json
+
+import pytest
+
+from jupyter_hurl_kernel.benchmark import (
+    BenchOutputParser,
+    Variant,
+    compare,
+    confidence_interval,
+    interleaved_order,
+    mann_whitney_u,
+    median,
+    split_variants,
+    stdev,
+    t_quantile,
+    t_sf_two_sided,
+    welch_t_test,
+)
+
+
+def test_variants_share_the_code_before_the_first_marker():
+    variants = split_variants(
+        "# shared setup\n"
+        "# variant: cold\n"
+        "GET https://a.org\n"
+        "#variant:\n"
+        "GET https://b.org"
+    )
+    assert [variant.name for variant in variants] == ["cold", "#2"]
+    assert variants[0].code == "# shared setup\nGET https://a.org\n"
+    assert variants[1].code == "# shared setup\nGET https://b.org\n"
+
+
+def test_interleaving_rotates_the_first_variant():
+    variants = [Variant(name, "", filename=name) for name in "abc"]
+    order = interleaved_order(variants, 3)
+    assert order == ["a", "b", "c", "a", "c", "b", "c", "a", "b"]
+    assert [order[i] for i in (0, 3, 6)] != ["a", "a", "a"]
+
+
+def test_output_parser_skips_warmup_and_failures():
+    variant = Variant("a", "", filename="a.hurl")
+    parser = BenchOutputParser([variant], warmup=1)
+
+    def line(success, total_us):
+        return json.dumps({
+            "filename": "a.hurl", "success": success,
+            "entries": [{"calls": [{"timings": {"total": total_us}}]}],
+        }) + "\n"
+
+    output = line(True, 9000) + line(True, 2000) + line(False, 3000) + line(True, 4000)
+    parser.feed("stdout", output[:50])
+    parser.feed("stdout", output[50:])
+    parser.close()
+    assert variant.seen == 4
+    assert variant.samples == [2.0, 4.0]
+    assert variant.failures == 1
+
+
+def test_descriptive_statistics():
+    assert median([3, 1, 2]) == 2
+    assert median([4, 1, 3, 2]) == 2.5
+    assert stdev([5]) == 0.0
+    assert stdev([2, 4, 4, 4, 5, 5, 7, 9]) == pytest.approx(2.138, abs=1e-3)
+
+
+def test_student_t_distribution():
+    assert t_sf_two_sided(2.0, 10) == pytest.approx(0.0733880347707)
+    assert t_sf_two_sided(0.0, 10) == pytest.approx(1.0)
+    assert t_sf_two_sided(float("inf"), 10) == 0.0
+    assert t_quantile(0.975, 10) == pytest.approx(2.2281388519863)
+    low, high = confidence_interval([1, 2, 3, 4, 5])
+    assert (low, high) == pytest.approx((1.0367568385224, 4.9632431614776))
+    assert confidence_interval([7]) == (7, 7)
+
+
+def test_welch_t_test():
+    t, p = welch_t_test([1, 2, 3, 4, 5], [2, 4, 6, 8, 10])
+    assert t == pytest.approx(-1.8973665961010)
+    assert p == pytest.approx(0.1075311949306)
+
+
+def test_welch_t_test_degenerate_samples():
+    assert welch_t_test([1], [1, 2]) == (0.0, 1.0)
+    assert welch_t_test([3, 3], [3, 3]) == (0.0, 1.0)
+    # No variance at all, but different means: certainly different
+    assert welch_t_test([3, 3], [4, 4]) == (0.0, 0.0)
+
+
+def test_mann_whitney_u():
+    u, p = mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+    assert u == 0.0
+    assert p == pytest.approx(0.0090234388181)
+
+
+def test_mann_whitney_u_with_ties():
+    u, p = mann_whitney_u([1, 2, 2, 3, 4], [2, 3, 3, 5, 6, 7])
+    assert u == 6.0
+    assert p == pytest.approx(0.0941534493788)
+
+
+def test_mann_whitney_u_degenerate_samples():
+    assert mann_whitney_u([], [1, 2]) == (0.0, 1.0)
+    # Every value tied: no evidence of a difference
+    assert mann_whitney_u([1, 1, 1], [1, 1, 1]) == (4.5, 1.0)
+
+
+def test_comparison_verdicts():
+    baseline = Variant("before", "", samples=[10.0 + i % 3 for i in range(30)])
+    slower = Variant("after", "", samples=[20.0 + i % 3 for i in range(30)])
+    same = Variant("same", "", samples=[10.0 + (i + 1) % 3 for i in range(30)])
+    empty = Variant("empty", "", failures=3)
+    rows = compare([baseline, slower, same, empty])
+    assert "verdict" not in rows[0]
+    assert rows[1]["change"] == pytest.approx(10 / 11)
+    assert rows[1]["verdict"].startswith("90.9% slower than before (significant")
+    assert rows[2]["verdict"].startswith("no significant difference with before")
+    assert rows[3] == {"name": "empty", "n": 0, "failures": 3}
@@ -0,0 +1,124 @@
+"""Tests of the on-disk cache of cell results."""
+
+import json
+import os
+import time
+
+from jupyter_hurl_kernel.cache import (
+    ResponseCache,
+    make_key,
+    non_cacheable_methods,
+)
+
+CELL = "GET https://example.org/api\nHTTP 200\n"
+
+
+def store(cache, key, stdout=b"ok", ttl=60):
+    writer = cache.writer(key)
+    writer.sinks["stdout"].write(stdout)
+    writer.commit(0, [], ttl)
+
+
+def test_key_depends_on_code_variables_and_flags():
+    key = make_key(CELL, {"host": "a"}, ["include"])
+    assert key == make_key(CELL, {"host": "a"}, ["include"])
+    assert key != make_key(CELL + "\n", {"host": "a"}, ["include"])
+    assert key != make_key(CELL, {"host": "b"}, ["include"])
+    assert key != make_key(CELL, {"host": "a"}, [])
+    assert make_key(CELL, {}, ["a", "b"]) == make_key(CELL, {}, ["b", "a"])
+    assert make_key(CELL, {"a": 1, "b": 2}, []) == make_key(CELL, {"b": 2, "a": 1}, [])
+
+
+def test_only_safe_methods_are_cached():
+    assert non_cacheable_methods(["GET", "HEAD", "GET"]) == []
+    assert non_cacheable_methods(["GET", "POST", "DELETE", "POST"]) == ["DELETE", "POST"]
+
+
+def test_stored_entry_is_replayed(tmp_path):
+    cache = ResponseCache(tmp_path)
+    assert cache.lookup("key") is None
+    writer = cache.writer("key")
+    writer.sinks["stdout"].write(b"body")
+    writer.commit(0, [{"name": "token", "value": "abc"}], 60)
+    entry = cache.lookup("key")
+    assert entry.returncode == 0
+    assert entry.captures == [{"name": "token", "value": "abc"}]
+    assert entry.stream_path("stdout").read_bytes() == b"body"
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_discarded_writer_leaves_nothing(tmp_path):
+    cache = ResponseCache(tmp_path)
+    writer = cache.writer("key")
+    writer.sinks["stdout"].write(b"partial")
+    writer.discard()
+    assert cache.lookup("key") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_expired_entry_is_a_miss_and_removed(tmp_path):
+    cache = ResponseCache(tmp_path)
+    store(cache, "key", ttl=-1)
+    assert cache.lookup("key") is None
+    assert not (tmp_path / "key").exists()
+
+
+def test_least_recently_used_entries_are_evicted_above_max_size(tmp_path):
+    cache = ResponseCache(tmp_path, max_size=2500)
+    for key in ("a", "b"):
+        store(cache, key, b"x" * 1000)
+    # "a" was stored first, but used last
+    past = time.time() - 100
+    os.utime(tmp_path / "b" / "meta.json", (past, past))
+    store(cache, "c", b"x" * 1000)
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None
+    assert cache.lookup("c") is not None
+    assert cache.stats["evictions"] == 1
+
+
+def test_eviction_drops_expired_entries_first(tmp_path):
+    cache = ResponseCache(tmp_path)
+    store(cache, "old", ttl=60)
+    meta = tmp_path / "old" / "meta.json"
+    meta.write_text(json.dumps({**json.loads(meta.read_text()), "expires": 0}))
+    store(cache, "new")
+    assert [path.name for _, _, path in cache.entries()] == ["new"]
+
+
+def test_clear_removes_every_entry(tmp_path):
+    cache = ResponseCache(tmp_path)
+    store(cache, "a")
+    store(cache, "b")
+    assert cache.clear() == 2
+    assert cache.entries() == []
+
+
+def test_ttl_magic(kernel):
+    kernel.cache_ttl = 0
+    assert kernel._resolve_cache_ttl({}) is None
+    assert kernel._resolve_cache_ttl({"cache": ""}) == 300
+    assert kernel._resolve_cache_ttl({"cache": "ttl=10s"}) == 10
+    assert kernel._resolve_cache_ttl({"cache": "ttl=0"}) is None
+    assert kernel._resolve_cache_ttl({"cache": "off"}) is None
+    kernel.cache_ttl = 60
+    assert kernel._resolve_cache_ttl({}) == 60
+    assert kernel._resolve_cache_ttl({"cache": ""}) == 60
+    assert kernel._resolve_cache_ttl({"cache": "off"}) is None
+
+
+def test_cached_cell_is_not_run_again(kernel, fake_bin):
+    cell = "%%cache ttl=60s\n" + CELL
+    first = kernel.execute(cell)
+    second = kernel.execute(cell)
+    assert first["status"] == second["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+    assert kernel.stream_text("stdout").count("ok") == 2
+
+
+def test_unsafe_methods_are_not_cached(kernel, fake_bin):
+    cell = "%%cache ttl=60s\nPOST https://example.org/api\n"
+    kernel.execute(cell)
+    kernel.execute(cell)
+    assert len(fake_bin.hurl_runs) == 2
+    assert "(not cached: the cell uses POST)" in kernel.stream_text("stderr")
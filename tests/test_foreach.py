@@ -0,0 +1,62 @@
+"""Tests of the cells run for each row of a file with %%foreach."""
+
+import asyncio
+import json
+
+import pytest
+
+from jupyter_hurl_kernel.foreach import ForEachRun, iter_rows, row_format
+from jupyter_hurl_kernel.streaming import ProcessInterrupted
+
+
+def rows(count):
+    return ({"id": str(number)} for number in range(count))
+
+
+def run(foreach):
+    return asyncio.run(asyncio.wait_for(foreach.run(), 5))
+
+
+def test_every_row_is_run_and_written(tmp_path):
+    async def run_row(number, row):
+        return {"success": row["id"] != "3", "exit": 0, "calls": [(200, 1000)]}
+
+    output = tmp_path / "results.jsonl"
+    foreach = ForEachRun(rows(10), run_row, 3, output)
+    run(foreach)
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(result["row"] for result in results) == list(range(1, 11))
+    assert (foreach.stats.passed, foreach.stats.failed) == (9, 1)
+
+
+def test_a_row_that_cannot_run_stops_the_run(tmp_path):
+    started = []
+
+    async def run_row(number, row):
+        started.append(number)
+        raise OSError("hurl: not found")
+
+    foreach = ForEachRun(rows(1000), run_row, 2, tmp_path / "results.jsonl")
+    with pytest.raises(OSError, match="hurl: not found"):
+        run(foreach)
+    assert len(started) < 1000
+
+
+def test_interrupted_rows_are_not_written(tmp_path):
+    async def run_row(number, row):
+        foreach.interrupt()
+        raise ProcessInterrupted()
+
+    output = tmp_path / "results.jsonl"
+    foreach = ForEachRun(rows(100), run_row, 4, output)
+    run(foreach)
+    assert foreach.interrupted
+    assert output.read_text() == ""
+
+
+def test_rows_of_a_csv_file(tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text("id,name\n1,ada\n2,\"grace, h\"\n")
+    assert list(iter_rows(path, row_format(path))) == [
+        {"id": "1", "name": "ada"}, {"id": "2", "name": "grace, h"},
+    ]
@@ -0,0 +1,101 @@
+"""Tests of the latency histogram used by %%load and %%foreach."""
+
+import math
+import random
+
+import pytest
+
+from jupyter_hurl_kernel.histogram import LatencyHistogram
+
+
+def exact_percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * percent / 100)) - 1]
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    assert histogram.mean is None
+    assert histogram.min is None and histogram.max is None
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.percentile(50) == 50
+    assert histogram.percentile(99) == 99
+    assert histogram.percentile(100) == 100
+    assert histogram.percentile(0) == 1
+    assert histogram.mean == 50.5
+
+
+def test_percentiles_stay_within_the_relative_error():
+    generator = random.Random(42)
+    values = [int(generator.lognormvariate(10, 1.5)) + 1 for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for percent in (1, 25, 50, 90, 99, 99.9):
+        expected = exact_percentile(values, percent)
+        assert histogram.percentile(percent) == pytest.approx(expected, rel=2 ** -7)
+    assert histogram.min == min(values)
+    assert histogram.max == max(values)
+    assert histogram.percentile(100) == max(values)
+
+
+def test_memory_does_not_grow_with_samples():
+    histogram = LatencyHistogram()
+    for value in range(1_000_000, 2_000_000, 7):
+        histogram.record(value)
+    # 128 buckets per power of two above 256
+    assert len(histogram.counts) <= 129
+
+
+def test_negative_and_fractional_values():
+    histogram = LatencyHistogram()
+    histogram.record(-5)
+    histogram.record(2.9)
+    assert (histogram.min, histogram.max) == (0, 2)
+
+
+def test_merge_equals_recording_everything():
+    generator = random.Random(7)
+    values = [generator.randrange(1, 10 ** 7) for _ in range(5000)]
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for index, value in enumerate(values):
+        (first if index % 2 else second).record(value)
+    merged = LatencyHistogram().merge(first).merge(second)
+    whole = LatencyHistogram()
+    for value in values:
+        whole.record(value)
+    assert merged.counts == whole.counts
+    assert (merged.count, merged.total, merged.min, merged.max) == (
+        whole.count, whole.total, whole.min, whole.max
+    )
+    assert merged.percentile(95) == whole.percentile(95)
+
+
+def test_merge_of_an_empty_histogram():
+    histogram = LatencyHistogram()
+    histogram.record(10)
+    histogram.merge(LatencyHistogram())
+    assert (histogram.count, histogram.min, histogram.max) == (1, 10, 10)
+    assert LatencyHistogram().merge(histogram).min == 10
+
+
+def test_merge_needs_the_same_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram(8).merge(LatencyHistogram(6))
+
+
+def test_serialization_round_trip():
+    histogram = LatencyHistogram(precision_bits=6)
+    for value in (3, 300, 30000, 30000):
+        histogram.record(value)
+    copy = LatencyHistogram.from_dict(histogram.to_dict())
+    assert copy.precision_bits == 6
+    assert copy.counts == histogram.counts
+    assert copy.percentile(50) == histogram.percentile(50)
+    assert copy.mean == histogram.mean
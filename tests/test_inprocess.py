@@ -0,0 +1,64 @@
+"""Tests of the cells the in-process engine leaves to hurl."""
+
+import pytest
+
+from jupyter_hurl_kernel.inprocess import unsupported
+from jupyter_hurl_kernel.parser import parse
+
+PROXY_VARIABLES = ("http_proxy", "https_proxy", "all_proxy", "no_proxy")
+
+
+@pytest.fixture(autouse=True)
+def no_proxy_environment(monkeypatch):
+    for name in PROXY_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+
+
+def reason(code):
+    return unsupported(code, parse(code), [])
+
+
+def test_simple_cell_runs_in_process():
+    assert reason("GET https://example.org/api\nHTTP 200\n") is None
+
+
+def test_proxy_leaves_the_cell_to_hurl(monkeypatch):
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy.internal:3128")
+    assert reason("GET https://example.org/api\n") == "a proxy (https_proxy)"
+    assert reason("GET http://example.org/api\n") is None
+
+
+def test_no_proxy_hosts_run_in_process(monkeypatch):
+    monkeypatch.setenv("ALL_PROXY", "http://proxy.internal:3128")
+    monkeypatch.setenv("NO_PROXY", "example.org")
+    assert reason("GET https://api.example.org/api\n") is None
+    assert reason("GET https://other.org/api\n") == "a proxy (all_proxy)"
+
+
+def test_templated_host_may_need_a_proxy(monkeypatch):
+    monkeypatch.setenv("HTTP_PROXY", "http://proxy.internal:3128")
+    monkeypatch.setenv("NO_PROXY", "example.org")
+    code = "GET http://{{host}}/api\n"
+    assert unsupported(code, parse(code), ["host"]) == "a proxy (http_proxy)"
+
+
+def test_syntax_errors_leave_the_cell_to_hurl():
+    code = 'GET https://example.org/api\nHTTP 200\n[Asserts]\njsonpth "$.a" == 2\n'
+    assert reason(code) == "a cell with syntax errors"
+
+
+def test_unreadable_asserts_are_checked_by_hurl(kernel, fake_bin):
+    reply = kernel.execute(
+        "%%engine=inprocess\n"
+        "GET https://example.org/api\n"
+        "HTTP 200\n"
+        "[Asserts]\n"
+        'jsonpth "$.a" == 2\n'
+        'jsonpath "$.a" equals 2\n'
+    )
+    assert reply["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+    assert "(run by hurl: a cell with syntax errors is not supported in-process)" in (
+        kernel.stream_text("stderr")
+    )
@@ -0,0 +1,131 @@
+"""Tests of the Hurl parser on valid cells it must accept, and on errors."""
+
+import pytest
+
+from jupyter_hurl_kernel.parser import ParseError, parse, parse_hurl_errors
+
+VALID_CELLS = {
+    "json array body opened on its own line": """\
+POST https://example.org/api
+Content-Type: application/json
+[
+  {"id": 1},
+  {"id": 2}
+]
+HTTP 200
+""",
+    "json array of booleans": """\
+POST https://example.org/api
+[true]
+HTTP 200
+""",
+    "json array of false on several lines": """\
+POST https://example.org/api
+[false,
+ true]
+HTTP 200
+""",
+    "json object body": """\
+POST https://example.org/api
+{
+  "flags": [true, false],
+  "nested": {"list": [1, [2, 3]]}
+}
+HTTP 201
+""",
+    "dateFormat filter": """\
+GET https://example.org/api
+HTTP 200
+[Asserts]
+header "Date" toDate "%a, %d %b %Y %H:%M:%S GMT" dateFormat "%Y" == "2024"
+""",
+    "charsetDecode filter": """\
+GET https://example.org/api
+HTTP 200
+[Captures]
+text: bytes charsetDecode "iso-8859-1"
+""",
+    "section aliases": """\
+GET https://example.org/api
+[Query]
+page: 1
+[Options]
+location: true
+HTTP 200
+[Captures]
+id: jsonpath "$.id"
+[Asserts]
+status == 200
+""",
+}
+
+
+@pytest.mark.parametrize("code", VALID_CELLS.values(), ids=VALID_CELLS.keys())
+def test_valid_cells_have_no_errors(code):
+    assert parse(code).errors == []
+
+
+def test_json_array_is_a_body_not_a_section():
+    entry = parse(VALID_CELLS["json array body opened on its own line"]).entries[0]
+    assert entry.sections == []
+    assert entry.body.kind == "json"
+    assert (entry.body.line, entry.body.end_line) == (2, 5)
+    assert entry.response.status == "200"
+
+
+def test_body_of_booleans_is_json():
+    entry = parse(VALID_CELLS["json array of booleans"]).entries[0]
+    assert entry.body.kind == "json"
+    assert entry.body.text == "[true]"
+
+
+def test_date_format_filter_is_parsed():
+    entry = parse(VALID_CELLS["dateFormat filter"]).entries[0]
+    assert [f.name for f in entry.asserts[0].filters] == ["toDate", "dateFormat"]
+    assert entry.asserts[0].predicate.name == "=="
+
+
+def test_unknown_section_is_reported():
+    errors = parse("GET https://example.org\nHTTP 200\n[Assert]\nstatus == 200\n").errors
+    assert [(e.line, e.message) for e in errors] == [(3, "unknown section [Assert]")]
+
+
+def test_unclosed_section_name_is_reported():
+    errors = parse("GET https://example.org\nHTTP 200\n[Asserts\n").errors
+    assert [e.message for e in errors] == ["expected ']' to close the section name"]
+
+
+def test_unterminated_json_body_is_incomplete():
+    document = parse("POST https://example.org\n[\n  1,\n")
+    assert [e.message for e in document.errors] == ["unterminated JSON body"]
+    assert document.incomplete
+
+
+def test_unknown_predicate_is_reported():
+    errors = parse("GET https://example.org\nHTTP 200\n[Asserts]\nstatus equals 200\n").errors
+    assert [(e.line, e.column, e.message) for e in errors] == [
+        (4, 8, "unknown predicate 'equals'")
+    ]
+
+
+def test_section_order_is_checked():
+    errors = parse("GET https://example.org\n[Asserts]\nstatus == 200\n").errors
+    assert errors[0].message == "[Asserts] must follow an HTTP status line"
+
+
+def test_hurl_errors_are_located():
+    output = (
+        "error: Parsing predicate\n"
+        "  --> cell.hurl:4:8\n"
+        "   |\n"
+        " 4 | status equals 200\n"
+        "   |        ^ expecting a predicate\n"
+        "   |\n"
+    )
+    assert parse_hurl_errors(output) == [
+        ParseError(4, 8, "Parsing predicate: expecting a predicate")
+    ]
+
+
+def test_hurl_errors_without_location_are_ignored():
+    assert parse_hurl_errors("error: something went wrong\n") == []
@@ -0,0 +1,104 @@
+"""Tests of the syntax checks run before a cell."""
+
+JSON_ARRAY_BODY = """\
+POST https://example.org/api
+Content-Type: application/json
+[
+  {"id": 1},
+  {"id": 2}
+]
+HTTP 200
+"""
+
+# Rejected by the kernel's parser; only hurl decides whether it is valid
+SUSPICIOUS = """\
+GET https://example.org/api
+HTTP 200
+[Asserts]
+status equals 200
+"""
+
+
+def test_json_array_body_is_run(kernel, fake_bin):
+    reply = kernel.execute(JSON_ARRAY_BODY)
+    assert reply["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+    assert "Warning" not in kernel.stream_text("stderr")
+
+
+def test_json_boolean_body_is_run(kernel, fake_bin):
+    reply = kernel.execute("POST https://example.org/api\n[true]\nHTTP 200\n")
+    assert reply["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+
+
+def test_parser_errors_only_warn_without_hurlfmt(kernel, fake_bin):
+    reply = kernel.execute(SUSPICIOUS)
+    assert reply["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+    assert "1 possible syntax error(s)" in kernel.stream_text("stderr")
+
+
+def test_errors_confirmed_by_hurlfmt_block_the_cell(kernel, fake_bin):
+    fake_bin.add("hurlfmt", "#!/bin/sh\ncat > /dev/null\necho 'error: Parsing predicate' >&2\nexit 2\n")
+    reply = kernel.execute(SUSPICIOUS)
+    assert reply["status"] == "error"
+    assert reply["ename"] == "HurlSyntaxError"
+    assert fake_bin.hurl_runs == []
+    assert "error: Parsing predicate" in kernel.stream_text("stderr")
+
+
+def test_errors_hurlfmt_accepts_do_not_block_the_cell(kernel, fake_bin):
+    fake_bin.add("hurlfmt", "#!/bin/sh\ncat > /dev/null\nexit 0\n")
+    reply = kernel.execute(SUSPICIOUS)
+    assert reply["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+    assert kernel.stream_text("stderr") == ""
+
+
+def test_preflight_off_skips_the_check(kernel, fake_bin):
+    fake_bin.add("hurlfmt", "#!/bin/sh\ncat > /dev/null\nexit 2\n")
+    reply = kernel.execute("%%preflight off\n" + SUSPICIOUS)
+    assert reply["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+
+
+HURLFMT_ERROR = """\
+error: Parsing predicate
+  --> -:4:8
+   |
+ 4 | status equals 200
+   |        ^ expecting a predicate
+   |
+"""
+
+
+def rejecting_hurlfmt(fake_bin):
+    log = fake_bin.path / "hurlfmt.log"
+    fake_bin.add(
+        "hurlfmt",
+        f"#!/bin/sh\ncat > /dev/null\necho run >> '{log}'\n"
+        f"cat >&2 <<'EOF'\n{HURLFMT_ERROR}EOF\nexit 2\n",
+    )
+    return log
+
+
+def test_hurlfmt_verdict_is_cached(kernel, fake_bin):
+    log = rejecting_hurlfmt(fake_bin)
+    kernel.execute(SUSPICIOUS)
+    reply = kernel.execute(SUSPICIOUS)
+    assert reply["ename"] == "HurlSyntaxError"
+    assert log.read_text().splitlines() == ["run"]
+    kernel.execute(SUSPICIOUS + "status < 300\n")
+    assert log.read_text().splitlines() == ["run", "run"]
+
+
+def test_diagnostics_are_located_by_hurlfmt(kernel, fake_bin):
+    rejecting_hurlfmt(fake_bin)
+    kernel.execute(SUSPICIOUS)
+    displays = [content for msg_type, content in kernel.sent if msg_type == "display_data"]
+    diagnostics = displays[-1]["data"]["application/json"]["diagnostics"]
+    assert diagnostics == [{
+        "line": 4, "column": 8,
+        "message": "Parsing predicate: expecting a predicate", "severity": "error",
+    }]
@@ -0,0 +1,97 @@
+"""Tests of the rich rendering of response bodies."""
+
+import json
+
+from jupyter_hurl_kernel.rendering import RichOutput, indent_xml
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+        self.displayed = []
+
+    def send(self, name, text):
+        self.sent.append((name, text))
+
+    def display(self, data, metadata):
+        self.displayed.append((data, metadata))
+
+
+def rich(**kwargs):
+    recorder = Recorder()
+    return RichOutput(recorder.send, recorder.display, **kwargs), recorder
+
+
+def test_json_body_is_rendered_as_a_tree():
+    output, recorder = rich()
+    output("stdout", '{"items": ')
+    output("stdout", '[1, 2, "]"]}\n')
+    assert recorder.sent == []
+    assert output.finish() == ""
+    data, metadata = recorder.displayed[0]
+    assert data["application/json"] == {"items": [1, 2, "]"]}
+    assert metadata["application/json"]["expanded"] is False
+
+
+def test_json_lines_stream_as_they_arrive():
+    output, recorder = rich()
+    lines = [json.dumps({"n": n, "text": 'a " quote } ] \\ end'}) + "\n" for n in range(1000)]
+    output("stdout", lines[0])
+    assert recorder.sent == []
+    output("stdout", lines[1])
+    assert "".join(text for _, text in recorder.sent) == lines[0] + lines[1]
+    for line in lines[2:]:
+        output("stdout", line)
+        assert recorder.sent[-1] == ("stdout", line)
+    assert output.finish() == ""
+    assert recorder.displayed == []
+
+
+def test_second_value_in_the_same_chunk_is_released():
+    output, recorder = rich()
+    output("stdout", '[1]\n[2]\n')
+    assert recorder.sent == [("stdout", "[1]\n[2]\n")]
+
+
+def test_plain_text_is_not_held():
+    output, recorder = rich()
+    output("stdout", "hello")
+    assert recorder.sent == [("stdout", "hello")]
+
+
+def test_body_beyond_max_size_is_streamed():
+    output, recorder = rich(max_size=100)
+    output("stdout", "[" + "1, " * 20)
+    assert recorder.sent == []
+    output("stdout", "1, " * 20)
+    assert recorder.sent and recorder.sent[0][1].startswith("[1, ")
+    output("stdout", "1]")
+    assert output.finish() == ""
+    assert recorder.displayed == []
+
+
+def test_large_json_is_pruned_and_spilled(tmp_path):
+    output, recorder = rich(page_size=200, spill_dir=tmp_path)
+    body = json.dumps(list(range(1000)))
+    output("stdout", body)
+    notice = output.finish()
+    assert "values are not shown" in notice
+    value = recorder.displayed[0][0]["application/json"]
+    assert value[-1].endswith("more items")
+    with open(output.spill_path) as f:
+        assert f.read() == body
+
+
+def test_xml_is_indented_with_its_prefixes():
+    text, complete = indent_xml('<a:root xmlns:a="u"><b>t</b><c/></a:root>')
+    assert complete
+    assert text == '<a:root xmlns:a="u">\n  <b>t</b>\n  <c/>\n</a:root>'
+
+
+def test_html_is_previewed_in_a_sandbox():
+    output, recorder = rich()
+    output("stdout", "<!doctype html><html><script>alert(1)</script></html>")
+    output.finish()
+    markup = recorder.displayed[0][0]["text/html"]
+    assert markup.startswith('<iframe sandbox=""')
+    assert "<script>" not in markup
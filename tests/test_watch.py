@@ -0,0 +1,29 @@
+"""Tests of the cells re-run with %%watch."""
+
+import asyncio
+
+WATCHED = """\
+%%watch interval=1s count=1
+GET https://example.org/api
+HTTP 200
+"""
+
+
+def test_watch_gives_hurl_the_cell_without_magic_lines(kernel, fake_bin):
+    reply = kernel.execute(WATCHED)
+    assert reply["status"] == "ok"
+    assert len(fake_bin.hurl_runs) == 1
+    assert fake_bin.hurl_files == "GET https://example.org/api\nHTTP 200\n"
+
+
+def test_background_watch_gives_hurl_the_cell_without_magic_lines(kernel, fake_bin):
+    async def run():
+        reply = await kernel.do_execute("%%background\n" + WATCHED, False)
+        job, = kernel._jobs.jobs
+        await job.task
+        return reply, job
+
+    reply, job = asyncio.run(run())
+    assert reply["status"] == "ok"
+    assert job.status == "succeeded"
+    assert fake_bin.hurl_files == "GET https://example.org/api\nHTTP 200\n"